@@ -1,15 +1,13 @@
 import streamlit as st
-from persona_input import persona_input_tab
-from evaluate_dialogue import evaluate_dialogue_tab
-from dialogue_list import dialogue_list_tab
-from own_dialogue_list import upload_and_evaluate_tab, own_dialogue_list_tab
 
+# 탭 모듈(pandas/openpyxl/저장소 등)은 해당 메뉴를 고를 때 불러옵니다.
+# 사이드바가 먼저 그려지고, 처음 실행 때는 고른 탭에 필요한 모듈만 읽습니다.
 st.set_page_config(page_title="응급실 문진 대화 생성 TOOL", layout="wide")
 
 # 상위 섹션
 section = st.sidebar.radio(
     "SECTION",
-    ["생성한 대화", "자체 대화"],
+    ["생성한 대화", "자체 대화", "분석"],
     index=0,
     key="section_radio"
 )
@@ -26,13 +24,16 @@ if section == "생성한 대화":
     )
 
     if sub == "1. 환자 페르소나 및 대화 생성":
+        from persona_input import persona_input_tab
         persona_input_tab()
     elif sub == "2. 생성 대화 평가":
+        from evaluate_dialogue import evaluate_dialogue_tab
         evaluate_dialogue_tab()
     elif sub == "3. 전체 대화 확인 및 저장":
+        from dialogue_list import dialogue_list_tab
         dialogue_list_tab()
 
-else:  # "자체 대화"
+elif section == "자체 대화":
     st.sidebar.markdown("### [ 자체 대화 ]")
     sub = st.sidebar.radio(
         "메뉴",
@@ -42,6 +43,24 @@ else:  # "자체 대화"
     )
 
     if sub == "1. 대화 업로드 및 평가":
+        from own_dialogue_list import upload_and_evaluate_tab
         upload_and_evaluate_tab()
     elif sub == "2. 전체 대화 확인 및 저장":
+        from own_dialogue_list import own_dialogue_list_tab
         own_dialogue_list_tab()
+
+else:  # "분석"
+    st.sidebar.markdown("### [ 분석 ]")
+    sub = st.sidebar.radio(
+        "메뉴",
+        ["1. 평가 분석",
+         "2. 생성 지표"],
+        key="analytics_submenu"
+    )
+
+    if sub == "1. 평가 분석":
+        from evaluation_dashboard import evaluation_dashboard_tab
+        evaluation_dashboard_tab()
+    elif sub == "2. 생성 지표":
+        from telemetry_dashboard import telemetry_dashboard_tab
+        telemetry_dashboard_tab()
@@ -0,0 +1,95 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from utils import generate_conversation, save_conversation_json, load_all_dialogues
+from persona_sampler import cell_key, count_existing
+from telemetry import set_queue_wait
+
+DEFAULT_CONCURRENCY = 4
+MAX_CONCURRENCY = 32
+
+
+def assign_variants(personas, dialogues):
+    """
+    페르소나별 variant(응답 캐시 키의 일부)를 배정합니다.
+    같은 셀의 첫 항목은 이미 저장된 대화 수, 이후 항목은 1씩 증가한 값을 받으므로
+    중단된 배치를 다시 돌리면 캐시를 재사용하고, 같은 셀을 여러 개 만들면 서로 다른 대화가 생성됩니다.
+    """
+    existing = count_existing(dialogues)
+    variants = []
+    for persona in personas:
+        key = cell_key(persona)
+        variants.append(existing[key])
+        existing[key] += 1
+    return variants
+
+def _run_one(generate, index, persona, variant, use_cache, submitted):
+    started = time.perf_counter()
+    queue_wait = started - submitted
+    set_queue_wait(queue_wait)
+    try:
+        result = generate(persona, variant=variant, use_cache=use_cache)
+        error = None
+    except Exception as e:
+        result = None
+        error = f"{type(e).__name__}: {e}"
+    return {
+        "index": index,
+        "persona": persona,
+        "result": result,
+        "error": error,
+        "queue_wait": queue_wait,
+        "elapsed": time.perf_counter() - started,
+    }
+
+
+def generate_batch(personas, concurrency=DEFAULT_CONCURRENCY, on_progress=None,
+                   generate=generate_conversation, save=save_conversation_json,
+                   use_cache=True, variants=None):
+    """
+    여러 페르소나에 대해 대화를 동시에 생성합니다.
+
+    - concurrency: 동시에 진행할 API 요청 수 (1 ~ MAX_CONCURRENCY)
+    - on_progress(done, total, item): 항목 하나가 끝날 때마다 호출
+    - save(result): 생성이 끝난 항목을 바로 저장 (None이면 저장하지 않음)
+    - use_cache: False면 응답 캐시를 읽지 않고 새로 생성
+    - variants: 항목별 캐시 variant (None이면 assign_variants로 배정)
+
+    개별 항목의 실패는 배치를 멈추지 않고 item["error"]에 기록됩니다.
+    저장은 호출한 스레드에서 완료 순서대로 한 건씩 수행되므로 save 함수는 스레드 안전할 필요가 없습니다.
+    """
+    personas = list(personas)
+    total = len(personas)
+    concurrency = max(1, min(int(concurrency), MAX_CONCURRENCY))
+    if variants is None:
+        variants = assign_variants(personas, load_all_dialogues())
+
+    items = [None] * total
+    done = 0
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="dialogue-gen") as pool:
+        futures = [
+            pool.submit(_run_one, generate, i, p, variants[i], use_cache, time.perf_counter())
+            for i, p in enumerate(personas)
+        ]
+        for future in as_completed(futures):
+            item = future.result()
+            if item["error"] is None and save is not None:
+                try:
+                    save(item["result"])
+                except Exception as e:
+                    item["error"] = f"저장 실패 - {type(e).__name__}: {e}"
+            items[item["index"]] = item
+            done += 1
+            if on_progress is not None:
+                on_progress(done, total, item)
+
+    failed = [it for it in items if it["error"] is not None]
+    return {
+        "total": total,
+        "succeeded": total - len(failed),
+        "failed": failed,
+        "items": items,
+        "elapsed": time.perf_counter() - started,
+    }
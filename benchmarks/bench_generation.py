@@ -0,0 +1,118 @@
+"""
+로컬 대체 백엔드(FakeBackend)로 생성 → 저장 경로의 처리량을 측정합니다. 네트워크가 필요 없습니다.
+
+예)
+  python benchmarks/bench_generation.py
+  python benchmarks/bench_generation.py --count 400 --concurrency 1 8 32 --latency 0.3 --rate-limit-rate 0.05
+  python benchmarks/bench_generation.py --store sqlite > bench_output.txt
+
+동시 실행 수별로 분당 대화 수, 항목별 지연 시간 p50/p95, 실패 수,
+저장 1건당 평균 시간, 대화 1건당 저장 용량과 입력 토큰 중 프롬프트 캐시 비율을 출력합니다.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LLM_CACHE_DISABLED", "1")
+
+import utils
+from batch_generation import generate_batch
+from dialogue_store import open_store
+from llm_backend import FakeBackend, set_backend
+
+PERSONA = {
+    "age": "15세 이상",
+    "gender": "남성",
+    "main_category": "심혈관",
+    "middle_category": "흉통",
+    "ktas_level": 2
+}
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+def store_bytes(directory):
+    return sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+
+def run_level(args, concurrency):
+    set_backend(FakeBackend(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed
+    ))
+    with tempfile.TemporaryDirectory() as tmp:
+        store = open_store(os.path.join(tmp, "dialogues.jsonl"), backend=args.store)
+        save_times = []
+
+        def save(result):
+            started = time.perf_counter()
+            store.add(result)
+            save_times.append(time.perf_counter() - started)
+
+        report = generate_batch(
+            [dict(PERSONA) for _ in range(args.count)],
+            concurrency=concurrency,
+            save=save,
+            use_cache=False,
+            variants=list(range(args.count))
+        )
+        stored = store.count()
+        size = store_bytes(tmp)
+        # 대체 백엔드가 system 프롬프트의 "<age> / <gender> ..." 틀이 아니라 요청한 페르소나로 대화를 만들었는지
+        for chunk in store.iter_query():
+            for record in chunk:
+                text = " ".join(turn["utterance"] for turn in record["dialogue"])
+                assert PERSONA["gender"] in text and PERSONA["middle_category"] in text, text
+
+    latencies = [it["elapsed"] for it in report["items"] if it["error"] is None]
+    usages = [it["result"].get("generation", {}).get("usage", {}) for it in report["items"] if it["error"] is None]
+    prompt_tokens = sum(u.get("prompt_tokens", 0) for u in usages)
+    cached_tokens = sum(u.get("cached_tokens", 0) for u in usages)
+    return {
+        "concurrency": concurrency,
+        "per_min": report["succeeded"] / report["elapsed"] * 60 if report["elapsed"] else 0.0,
+        "p50": percentile(latencies, 0.5),
+        "p95": percentile(latencies, 0.95),
+        "failed": len(report["failed"]),
+        "save_ms": statistics.mean(save_times) * 1000 if save_times else 0.0,
+        "bytes_per_dialogue": size / stored if stored else 0.0,
+        "cached_rate": cached_tokens / prompt_tokens if prompt_tokens else 0.0,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="대화 생성 처리량 벤치마크 (FakeBackend)")
+    parser.add_argument("--count", type=int, default=200, help="동시 실행 수별 생성 개수")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--latency", type=float, default=0.2, help="요청당 평균 지연(초)")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="429 주입 비율")
+    parser.add_argument("--store", choices=["jsonl", "sqlite"], default="jsonl")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    # 벤치마크에서는 429 백오프를 짧게
+    utils.RATE_LIMIT_BACKOFF = min(utils.RATE_LIMIT_BACKOFF, args.latency)
+
+    print(f"backend=fake count={args.count} latency={args.latency}s store={args.store} "
+          f"error_rate={args.error_rate} rate_limit_rate={args.rate_limit_rate}")
+    print(f"{'concurrency':>11} {'dialogues/min':>14} {'p50(s)':>8} {'p95(s)':>8} {'failed':>7} {'save(ms)':>9} {'bytes/dlg':>10} {'cached':>7}")
+    for concurrency in args.concurrency:
+        r = run_level(args, concurrency)
+        print(f"{r['concurrency']:>11} {r['per_min']:>14.1f} {r['p50']:>8.3f} {r['p95']:>8.3f} "
+              f"{r['failed']:>7} {r['save_ms']:>9.2f} {r['bytes_per_dialogue']:>10.0f} {r['cached_rate']:>7.0%}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+발화 검색 색인(dialogue_search.SearchIndex)의 색인 생성 시간과 검색 지연 시간을 측정합니다. 네트워크가 필요 없습니다.
+
+예)
+  python benchmarks/bench_search.py
+  python benchmarks/bench_search.py --count 100000 --store sqlite --repeat 50
+  python benchmarks/bench_search.py --count 5000 --check
+
+임시 저장소에 FakeBackend와 같은 형식의 대화 --count개를 넣은 뒤, 첫 검색(색인 생성), 검색어별 지연 시간
+중앙값/p95(페르소나 조건/화자 조건 포함), 대화를 조금 추가한 뒤의 검색(바뀐 대화만 반영) 시간을 출력합니다.
+--check는 모든 검색 결과를 저장소 전체를 훑는 단순 검색과 비교합니다.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dialogue_search import SearchIndex, dialogue_turns, normalize, parse_query
+from dialogue_store import open_store
+from llm_backend import _fake_dialogue
+from persona_sampler import GENDERS, KTAS_LEVELS
+
+MIDDLE_CATEGORIES = ["흉통", "호흡곤란", "복통", "두통", "발열", "어지러움", "요통", "구토"]
+QUERIES = [
+    ("흉통", {}, None),
+    ("흉통", {"ktas_level": [1, 2]}, "CHATGPT"),
+    ("식은 땀", {"gender": "여성"}, None),
+    ("열", {}, None),
+    ("어지러 혈압약", {}, "CHATGPT"),
+    ("페니실린", {"ktas_level": [1]}, "CHATGPT"),
+    ("없어요", {}, None),
+    ("없는검색어", {}, None),
+]
+
+def fake_records(count, seed):
+    rng = random.Random(seed)
+    records = []
+    for _ in range(count):
+        persona = {
+            "age": rng.choice(["15세 이상", "15세 미만"]),
+            "gender": rng.choice(GENDERS),
+            "main_category": "테스트",
+            "middle_category": rng.choice(MIDDLE_CATEGORIES),
+            "ktas_level": rng.choice(KTAS_LEVELS),
+        }
+        records.append({"persona": persona, "dialogue": _fake_dialogue(rng, persona)})
+    return records
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round((len(values) - 1) * q)))]
+
+def brute_force(store, query, filters, speaker):
+    terms = parse_query(query)
+    found = set()
+    for chunk in store.iter_query({k: v for k, v in filters.items()}):
+        for record in chunk:
+            texts = [normalize(text) for _, who, text in dialogue_turns(record.get("dialogue")) if not speaker or who == speaker]
+            if all(any(term in text for text in texts) for term in terms):
+                found.add(record["id"])
+    return found
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="발화 검색 색인 벤치마크")
+    parser.add_argument("--count", type=int, default=100000, help="대화 수")
+    parser.add_argument("--store", choices=["jsonl", "sqlite"], default="jsonl")
+    parser.add_argument("--repeat", type=int, default=20, help="검색어별 반복 횟수")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--check", action="store_true", help="결과를 단순 검색과 비교")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = open_store(os.path.join(tmp, "dialogues.jsonl"), backend=args.store)
+        records = fake_records(args.count, args.seed)
+        started = time.perf_counter()
+        for start in range(0, len(records), 5000):
+            store.add_many(records[start:start + 5000])
+        print(f"store={args.store} dialogues={args.count} (저장 {time.perf_counter() - started:.1f}초)")
+
+        index = SearchIndex(store)
+        started = time.perf_counter()
+        index.search("흉통")
+        print(f"첫 검색(색인 생성): {(time.perf_counter() - started) * 1000:.0f}ms, 발화 {len(index._turn_doc):,}개")
+
+        print(f"{'검색어':>12} {'조건':>28} {'결과':>7} {'p50(ms)':>8} {'p95(ms)':>8}")
+        failures = []
+        for query, filters, speaker in QUERIES:
+            times = []
+            for _ in range(args.repeat):
+                result = index.search(query, filters, speaker=speaker)
+                times.append(result["elapsed"] * 1000)
+            label = ", ".join([f"{k}={v}" for k, v in filters.items()] + ([f"speaker={speaker}"] if speaker else [])) or "-"
+            print(f"{query:>12} {label:>28} {result['count']:>7} {statistics.median(times):>8.2f} {percentile(times, 0.95):>8.2f}")
+            if args.check and result["ids"] != brute_force(store, query, filters, speaker):
+                failures.append(query)
+
+        more = fake_records(100, args.seed + 1)
+        store.add_many(more)
+        started = time.perf_counter()
+        result = index.search("흉통")
+        print(f"대화 100개 추가 후 검색: {(time.perf_counter() - started) * 1000:.1f}ms (결과 {result['count']})")
+        store.delete_many(store.ids()[:50])
+        started = time.perf_counter()
+        result = index.search("흉통")
+        print(f"대화 50개 삭제 후 검색: {(time.perf_counter() - started) * 1000:.1f}ms (결과 {result['count']})")
+        if args.check:
+            for query, filters, speaker in QUERIES:
+                if index.search(query, filters, speaker=speaker)["ids"] != brute_force(store, query, filters, speaker):
+                    failures.append(f"{query} (추가/삭제 후)")
+            print("검증: " + ("FAIL " + ", ".join(failures) if failures else "단순 검색과 일치"))
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+세션 여러 개가 같은 목록 화면을 다시 그릴 때(rerun)의 저장소 읽기 시간을, 공유 읽기 캐시
+(dialogue_cache.SharedStoreCache)를 쓸 때와 저장소를 바로 읽을 때로 나눠 측정합니다. 네트워크가 필요 없습니다.
+
+예)
+  python benchmarks/bench_shared_cache.py
+  python benchmarks/bench_shared_cache.py --count 100000 --store sqlite --sessions 20 --reruns 10
+
+rerun 한 번 = 조회 조건에 맞는 대화 수(count) + 현재 페이지(query). 세션마다 조회 조건/페이지가 조금씩 다르고,
+--write-every번째 rerun마다 평가 하나를 저장해 캐시가 비워지는 경우도 섞습니다.
+캐시가 들고 있는 메모리(tracemalloc)는 세션 수와 관계없이 캐시 항목 수에만 비례합니다.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_search import fake_records
+from dialogue_cache import SharedStoreCache
+from dialogue_store import open_store
+
+VIEWS = [
+    ({}, 0),
+    ({"ktas_level": [1, 2]}, 0),
+    ({"ktas_level": [1, 2]}, 20),
+    ({"evaluated": False, "prescreen": True}, 0),
+]
+
+def rerun(store, session, step):
+    filters, offset = VIEWS[(session + step) % len(VIEWS)]
+    started = time.perf_counter()
+    total = store.count(filters)
+    page = store.query(filters, limit=20, offset=offset)
+    return time.perf_counter() - started, total, len(page)
+
+def simulate(store, args):
+    times = []
+    writes = 0
+    for step in range(args.reruns):
+        for session in range(args.sessions):
+            elapsed, _, _ = rerun(store, session, step)
+            times.append(elapsed * 1000)
+        if args.write_every and (step + 1) % args.write_every == 0:
+            key = store.ids()[step]
+            store.update_evaluation(key, {"question": "그렇다", "realism": 4, "evaluator": f"bench{step}"})
+            writes += 1
+    return times, writes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="공유 읽기 캐시 벤치마크")
+    parser.add_argument("--count", type=int, default=50000, help="대화 수")
+    parser.add_argument("--store", choices=["jsonl", "sqlite"], default="jsonl")
+    parser.add_argument("--sessions", type=int, default=20, help="동시에 보는 세션 수")
+    parser.add_argument("--reruns", type=int, default=10, help="세션마다 다시 그리는 횟수")
+    parser.add_argument("--write-every", type=int, default=5, help="이 횟수의 rerun마다 평가 하나 저장 (0이면 안 함)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = open_store(os.path.join(tmp, "dialogues.jsonl"), backend=args.store)
+        records = fake_records(args.count, args.seed)
+        for start in range(0, len(records), 5000):
+            store.add_many(records[start:start + 5000])
+        store.count({"prescreen": True})
+        print(f"store={args.store} dialogues={args.count} sessions={args.sessions} reruns={args.reruns} write_every={args.write_every}")
+
+        print(f"{'':>10} {'rerun p50(ms)':>14} {'p95(ms)':>9} {'합계(s)':>8}")
+        direct, _ = simulate(store, args)
+        print(f"{'직접 읽기':>10} {statistics.median(direct):>14.2f} {sorted(direct)[int(len(direct) * 0.95)]:>9.2f} {sum(direct) / 1000:>8.2f}")
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        cache = SharedStoreCache(store)
+        cached, writes = simulate(cache, args)
+        held = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        print(f"{'공유 캐시':>10} {statistics.median(cached):>14.2f} {sorted(cached)[int(len(cached) * 0.95)]:>9.2f} {sum(cached) / 1000:>8.2f}")
+        stats = cache.stats()
+        hit_rate = stats["hits"] / max(1, stats["hits"] + stats["misses"])
+        print(f"캐시: 항목 {stats['entries']}개, 적중률 {hit_rate:.0%}, 평가 저장 {writes}번, 들고 있는 메모리 {held / 1024:.0f}KiB")
+
+        # 캐시를 거친 결과가 저장소와 같은지 (쓰기 직후 포함)
+        for filters, offset in VIEWS:
+            assert cache.count(filters) == store.count(filters)
+            assert [r["id"] for r in cache.query(filters, limit=20, offset=offset)] == \
+                [r["id"] for r in store.query(filters, limit=20, offset=offset)]
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
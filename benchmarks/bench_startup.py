@@ -0,0 +1,120 @@
+"""
+새 프로세스에서 `import utils` 시간과 앱 첫 실행(기본 메뉴를 그릴 때까지) 시간을 측정합니다.
+
+예)
+  python benchmarks/bench_startup.py
+  python benchmarks/bench_startup.py --repeat 10 --max-utils-ms 150 --max-app-ms 3000
+
+각 측정은 새 파이썬 프로세스에서 수행하므로 매번 콜드 스타트이고, 중앙값/최댓값과 함께
+그 시점까지 불러온 무거운 모듈(pandas, numpy, openai 등)을 출력합니다.
+중앙값이 한도를 넘거나 불러오지 않아야 할 모듈이 보이면 종료 코드 1로 끝나므로 CI에서 회귀 검사로 쓸 수 있습니다.
+앱은 빈 임시 작업 디렉터리(KTAS 엑셀과 컴파일된 계층 구조만 복사)에서 streamlit AppTest로 실행합니다.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from category_table import EXCEL_PATH, hierarchy_path
+
+HEAVY_MODULES = ["pandas", "numpy", "pyarrow", "openai", "openpyxl", "streamlit"]
+# 배치 작업자도 utils를 쓰므로 streamlit도 불러오면 안 됨
+UTILS_FORBIDDEN = HEAVY_MODULES
+# 기본 메뉴(페르소나 및 대화 생성)에 필요 없는 모듈
+APP_FORBIDDEN = ["pandas", "numpy", "pyarrow", "openai", "openpyxl"]
+
+UTILS_SNIPPET = """
+import json, sys, time
+started = time.perf_counter()
+import utils
+elapsed = time.perf_counter() - started
+print(json.dumps({"ms": elapsed * 1000, "modules": [m for m in %(heavy)r if m in sys.modules]}))
+"""
+
+APP_SNIPPET = """
+import json, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(%(app)r, default_timeout=120).run()
+elapsed = time.perf_counter() - started
+modules = [m for m in %(heavy)r if m in sys.modules]
+print(json.dumps({"ms": elapsed * 1000, "modules": modules, "errors": [e.message for e in at.exception]}))
+"""
+
+def run_snippet(snippet, cwd, env):
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", snippet], cwd=cwd, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip() or f"종료 코드 {proc.returncode}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["wall_ms"] = wall * 1000
+    return result
+
+def measure(name, snippet, cwd, env, repeat):
+    runs = [run_snippet(snippet, cwd, env) for _ in range(repeat)]
+    return {
+        "name": name,
+        "median": statistics.median(r["ms"] for r in runs),
+        "max": max(r["ms"] for r in runs),
+        "wall": statistics.median(r["wall_ms"] for r in runs),
+        "modules": sorted({m for r in runs for m in r["modules"]}),
+        "errors": sorted({e for r in runs for e in r.get("errors", [])}),
+    }
+
+def app_workdir(tmp):
+    # 저장소/캐시는 비어 있고 KTAS 엑셀과 컴파일된 계층 구조만 있는 작업 디렉터리
+    os.makedirs(os.path.join(tmp, "data"))
+    for path in (EXCEL_PATH, hierarchy_path(EXCEL_PATH)):
+        source = os.path.join(ROOT, path)
+        if os.path.exists(source):
+            shutil.copy2(source, os.path.join(tmp, path))
+    return tmp
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="앱/utils 시작 시간 벤치마크")
+    parser.add_argument("--repeat", type=int, default=5, help="항목별 측정 횟수 (매번 새 프로세스)")
+    parser.add_argument("--max-utils-ms", type=float, default=None, help="`import utils` 중앙값 한도(ms)")
+    parser.add_argument("--max-app-ms", type=float, default=None, help="앱 첫 실행 중앙값 한도(ms)")
+    parser.add_argument("--skip-app", action="store_true", help="`import utils`만 측정")
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    env.pop("OPENAI_API_KEY", None)
+    checks = []
+    with tempfile.TemporaryDirectory() as tmp:
+        results = [measure("import utils", UTILS_SNIPPET % {"heavy": HEAVY_MODULES}, tmp, env, args.repeat)]
+        checks.append((results[-1], args.max_utils_ms, UTILS_FORBIDDEN))
+        if not args.skip_app:
+            snippet = APP_SNIPPET % {"app": os.path.join(ROOT, "app.py"), "heavy": HEAVY_MODULES}
+            results.append(measure("app cold start", snippet, app_workdir(tmp), env, args.repeat))
+            checks.append((results[-1], args.max_app_ms, APP_FORBIDDEN))
+
+    print(f"repeat={args.repeat} python={sys.version.split()[0]}")
+    print(f"{'target':>15} {'median(ms)':>11} {'max(ms)':>9} {'process(ms)':>12}  heavy modules")
+    for r in results:
+        print(f"{r['name']:>15} {r['median']:>11.1f} {r['max']:>9.1f} {r['wall']:>12.1f}  {', '.join(r['modules']) or '-'}")
+
+    failures = []
+    for r, limit, forbidden in checks:
+        if limit is not None and r["median"] > limit:
+            failures.append(f"{r['name']}: 중앙값 {r['median']:.1f}ms > 한도 {limit:.1f}ms")
+        loaded = [m for m in r["modules"] if m in forbidden]
+        if loaded:
+            failures.append(f"{r['name']}: 불러오지 않아야 할 모듈 {', '.join(loaded)}")
+        for error in r["errors"]:
+            failures.append(f"{r['name']}: 예외 {error}")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
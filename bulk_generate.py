@@ -0,0 +1,169 @@
+"""
+Streamlit 없이 KTAS 카테고리 표를 기준으로 대화를 대량 생성합니다.
+
+예)
+  python bulk_generate.py --mode quota --quota 2 --concurrency 8
+  python bulk_generate.py --mode weighted --samples 500 --quota 3 --weights weights.json --seed 1
+  python bulk_generate.py --mode grid --ages "15세 미만" --ktas 1 2 --dry-run
+  python bulk_generate.py --mode quota --quota 2 --queue --workers 4   # 작업 큐에 기록하고 작업자 4개로 처리
+  python bulk_generate.py --resume 3f2a9c1e0b7d                        # 중단된 작업을 이어서 처리
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from category_table import EXCEL_PATH, load_hierarchy
+from persona_sampler import GENDERS, KTAS_LEVELS, PLAN_MODES, expand_cells, count_existing, build_plan, summarize_plan
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="KTAS 카테고리 기반 응급실 문진 대화 대량 생성")
+    parser.add_argument("--mode", choices=PLAN_MODES, default="quota", help="grid: 셀당 1개, quota: 셀당 --quota개, weighted: 가중 샘플링")
+    parser.add_argument("--quota", type=int, default=1, help="셀(나이×대분류×중분류×성별×KTAS)당 목표 대화 수")
+    parser.add_argument("--samples", type=int, help="weighted 모드에서 새로 생성할 대화 수")
+    parser.add_argument("--weights", help="weighted 모드 가중치 JSON 파일 (예: {\"ktas_level\": {\"1\": 3}})")
+    parser.add_argument("--ages", nargs="+", help="나이 필터 (예: \"15세 미만\")")
+    parser.add_argument("--genders", nargs="+", choices=GENDERS, help="성별 필터")
+    parser.add_argument("--ktas", nargs="+", type=int, choices=KTAS_LEVELS, help="KTAS 레벨 필터")
+    parser.add_argument("--main-categories", nargs="+", help="대분류 필터")
+    parser.add_argument("--concurrency", type=int, default=4, help="동시 API 요청 수")
+    parser.add_argument("--no-cache", action="store_true", help="응답 캐시를 읽지 않고 모두 새로 생성")
+    parser.add_argument("--seed", type=int, help="weighted 모드 난수 시드")
+    parser.add_argument("--excel", default=EXCEL_PATH, help="KTAS 카테고리 엑셀 경로")
+    parser.add_argument("--dry-run", action="store_true", help="계획만 출력하고 생성하지 않음")
+    parser.add_argument("--near-duplicates", choices=["flag", "reject", "off"], help="거의 같은 대화 처리 (기본값: 환경변수 NEAR_DUPLICATE_POLICY 또는 flag)")
+    parser.add_argument("--metrics-out", help="실행이 끝나면 Prometheus 텍스트 형식의 지표를 이 경로에 저장")
+    parser.add_argument("--queue", action="store_true", help="계획을 작업 큐(job_queue)에 기록하고 큐에서 처리 (중단 후 --resume으로 이어서)")
+    parser.add_argument("--resume", metavar="JOB_ID", help="작업 큐의 이 작업을 이어서 처리 (계획은 새로 만들지 않음)")
+    parser.add_argument("--workers", type=int, default=1, help="--queue/--resume에서 함께 실행할 작업자 프로세스 수")
+    return parser.parse_args(argv)
+
+def make_plan(args, dialogues):
+    hierarchy = load_hierarchy(args.excel)
+    cells = expand_cells(
+        hierarchy,
+        ages=args.ages,
+        genders=args.genders,
+        levels=args.ktas,
+        main_categories=args.main_categories
+    )
+    weights = None
+    if args.weights:
+        with open(args.weights, "r", encoding="utf-8") as f:
+            weights = json.load(f)
+    plan = build_plan(
+        cells,
+        mode=args.mode,
+        quota=args.quota,
+        samples=args.samples,
+        weights=weights,
+        existing=count_existing(dialogues),
+        seed=args.seed
+    )
+    return cells, plan
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.near_duplicates:
+        # utils를 처음 불러오기 전에 지정해야 적용됨
+        os.environ["NEAR_DUPLICATE_POLICY"] = args.near_duplicates
+
+    if args.resume:
+        return run_queue(args, args.resume)
+
+    from utils import load_all_dialogues
+    dialogues = load_all_dialogues()
+    cells, plan = make_plan(args, dialogues)
+
+    print(f"셀 {len(cells)}개, 생성 계획 {len(plan)}개", file=sys.stderr)
+    print(f"KTAS 레벨별: {summarize_plan(plan)}", file=sys.stderr)
+    if args.dry_run or not plan:
+        return 0
+
+    from batch_generation import generate_batch, assign_variants
+    if args.queue:
+        from job_queue import JobQueue
+        job_id = JobQueue().create_job(
+            plan, assign_variants(plan, dialogues), label=f"bulk_generate {args.mode}", use_cache=not args.no_cache
+        )
+        print(f"작업 {job_id}: 항목 {len(plan)}개 기록 (중단되면 --resume {job_id})", file=sys.stderr)
+        return run_queue(args, job_id)
+
+    def on_progress(done, total, item):
+        p = item["persona"]
+        status = f"실패 ({item['error']})" if item["error"] else "완료"
+        print(f"[{done}/{total}] {p['age']} / {p['gender']} / {p['middle_category']} / KTAS {p['ktas_level']}: {status}", file=sys.stderr)
+
+    report = generate_batch(plan, concurrency=args.concurrency, on_progress=on_progress, use_cache=not args.no_cache)
+    print(f"성공 {report['succeeded']}/{report['total']}, 실패 {len(report['failed'])}, 소요 {report['elapsed']:.1f}초", file=sys.stderr)
+
+    similar = sum(1 for it in report["items"] if it["result"] and it["result"].get("near_duplicates"))
+    rejected = sum(1 for it in report["failed"] if "NearDuplicateError" in it["error"])
+    print(f"거의 같은 대화: 저장 후 표시 {similar}, 저장 거부 {rejected}", file=sys.stderr)
+    print_stats(args)
+    return 1 if report["failed"] else 0
+
+def run_queue(args, job_id):
+    """작업 큐의 job_id를 이 프로세스와 (--workers-1)개의 작업자 프로세스로 처리합니다."""
+    from job_queue import JobQueue, run_worker
+    queue = JobQueue()
+    job = queue.job(job_id)
+    if job is None:
+        print(f"작업 {job_id}이(가) 없습니다.", file=sys.stderr)
+        return 2
+
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "job_queue.py"),
+               "work", "--job", job_id, "--concurrency", str(args.concurrency)]
+    helpers = [subprocess.Popen(command) for _ in range(max(0, args.workers - 1))]
+
+    def on_progress(event):
+        p = event["persona"]
+        detail = f" ({event['error']})" if event["error"] else ""
+        print(f"[#{event['idx']}] {p['age']} / {p['gender']} / {p['middle_category']} / KTAS {p['ktas_level']}: {event['status']}{detail}", file=sys.stderr)
+
+    report = run_worker(queue, job_id=job_id, concurrency=args.concurrency, on_progress=on_progress)
+    for helper in helpers:
+        helper.wait()
+
+    counts = queue.job(job_id)["counts"]
+    print(
+        f"작업 {job_id}: 완료 {counts['done']}/{job['total']}, 실패 {counts['failed']}, "
+        f"남음 {counts['pending'] + counts['leased'] + counts['saving']} (이 프로세스: 완료 {report['done']}, "
+        f"복구 {report['recovered']}, 소요 {report['elapsed']:.1f}초)",
+        file=sys.stderr
+    )
+    if counts["failed"]:
+        print(f"실패한 항목 다시 시도: python job_queue.py retry {job_id} && python bulk_generate.py --resume {job_id}", file=sys.stderr)
+    print_stats(args)
+    return 1 if counts["failed"] else 0
+
+def print_stats(args):
+    # 이 프로세스의 캐시/검증/토큰 통계 (작업자 프로세스는 각자 출력)
+    from utils import response_cache
+    stats = response_cache.stats()
+    print(f"응답 캐시: 적중 {stats['hits']}, 미스 {stats['misses']}", file=sys.stderr)
+
+    from dialogue_validation import validation_stats
+    vstats = validation_stats()
+    print(
+        f"응답 검증: 로컬 보정 {vstats.get('repaired', 0)}, 재요청 후 통과 {vstats.get('retried', 0)}, "
+        f"실패 {vstats.get('failed', 0)}, 총 재요청 {vstats.get('retries', 0)}회",
+        file=sys.stderr
+    )
+
+    from llm_backend import usage_stats
+    ustats = usage_stats()
+    print(
+        f"토큰: 요청 {ustats.get('requests', 0)}건, 입력 {ustats.get('prompt_tokens', 0)} "
+        f"(프롬프트 캐시 {ustats.get('cached_tokens', 0)}, {ustats['cached_rate']:.0%}), 출력 {ustats.get('completion_tokens', 0)}",
+        file=sys.stderr
+    )
+
+    if args.metrics_out:
+        from telemetry import telemetry
+        telemetry.write_prometheus(args.metrics_out)
+        print(f"지표 저장: {args.metrics_out}", file=sys.stderr)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Streamlit 없이 저장된 대화를 LLM으로 일괄 자동 평가합니다 (llm_judge).
+
+예)
+  python bulk_judge.py --concurrency 8
+  python bulk_judge.py --source own --limit 500
+  python bulk_judge.py --ktas 1 2 --force --no-cache
+  python bulk_judge.py --prescreen all   # 사전 검사에 걸린 대화도 채점 (기본: 통과한 대화만)
+"""
+import argparse
+import sys
+
+from persona_sampler import KTAS_LEVELS
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="평가 문항 기반 LLM 일괄 자동 평가")
+    parser.add_argument("--source", choices=["generated", "own"], default="generated", help="generated: 생성한 대화, own: 자체 대화")
+    parser.add_argument("--ktas", nargs="+", type=int, choices=KTAS_LEVELS, help="KTAS 레벨 필터 (생성한 대화)")
+    parser.add_argument("--unevaluated", action="store_true", help="사람 평가가 없는 대화만")
+    parser.add_argument(
+        "--prescreen", choices=["passed", "flagged", "all"], default="passed",
+        help="사전 검사 결과 필터 (기본: 통과한 대화만 채점)"
+    )
+    parser.add_argument("--limit", type=int, help="최대 채점 대화 수")
+    parser.add_argument("--concurrency", type=int, default=4, help="동시 API 요청 수")
+    parser.add_argument("--force", action="store_true", help="이미 자동 평가한 대화도 다시 채점")
+    parser.add_argument("--no-cache", action="store_true", help="응답 캐시를 읽지 않고 모두 새로 채점")
+    parser.add_argument("--dry-run", action="store_true", help="채점할 대화 수만 출력")
+    return parser.parse_args(argv)
+
+def open_source(source):
+    from dialogue_store import open_store
+    if source == "own":
+        from own_dialogue_list import OWN_DATA_PATH, OWN_DB_PATH, OWN_LEGACY_DATA_PATH
+        return open_store(OWN_DATA_PATH, db_path=OWN_DB_PATH, legacy_path=OWN_LEGACY_DATA_PATH)
+    from utils import DATA_PATH, DB_PATH, LEGACY_DATA_PATH
+    return open_store(DATA_PATH, db_path=DB_PATH, legacy_path=LEGACY_DATA_PATH)
+
+def main(argv=None):
+    args = parse_args(argv)
+    from llm_judge import JUDGE_EVALUATOR, judge_batch, pending
+
+    store = open_source(args.source)
+    filters = {
+        "ktas_level": args.ktas or None,
+        "evaluated": False if args.unevaluated else None,
+        "prescreen": {"passed": True, "flagged": False, "all": None}[args.prescreen],
+    }
+    records = pending(store.query, filters, limit=args.limit, force=args.force)
+    print(f"평가자 {JUDGE_EVALUATOR}: 채점할 대화 {len(records)}개", file=sys.stderr)
+    if args.dry_run or not records:
+        return 0
+
+    def on_progress(done, total, item):
+        if item["error"]:
+            status = f"실패 ({item['error']})"
+        else:
+            ev = item["evaluation"]
+            status = f"적절성 {ev['question']}, 현실성 {ev['realism']}, 확신도 {ev['confidence']:.2f}" + (" (검토 필요)" if ev["review"] else "")
+        print(f"[{done}/{total}] 대화 {item['id'] + 1}: {status}", file=sys.stderr)
+
+    report = judge_batch(
+        records,
+        store.update_evaluation,
+        concurrency=args.concurrency,
+        on_progress=on_progress,
+        use_cache=not args.no_cache
+    )
+    print(
+        f"성공 {report['succeeded']}/{report['total']}, 실패 {len(report['failed'])}, 검토 필요 {report['review']}, "
+        f"캐시 {report['cache_hits']}, 소요 {report['elapsed']:.1f}초",
+        file=sys.stderr
+    )
+
+    from llm_backend import usage_stats
+    ustats = usage_stats()
+    print(
+        f"토큰: 요청 {ustats.get('requests', 0)}건, 입력 {ustats.get('prompt_tokens', 0)} "
+        f"(프롬프트 캐시 {ustats.get('cached_tokens', 0)}, {ustats['cached_rate']:.0%}), 출력 {ustats.get('completion_tokens', 0)}",
+        file=sys.stderr
+    )
+    return 1 if report["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+KTAS 카테고리 엑셀(나이/대분류/중분류)과 그 계층 구조.
+
+엑셀을 읽는 데는 pandas/openpyxl이 필요하고 느리므로, 계층 구조는 엑셀 옆의
+{이름}.hierarchy.json으로 한 번 컴파일해 두고 load_hierarchy()가 그 파일을 읽습니다.
+파일에는 원본의 크기/SHA-256이 함께 들어 있어 원본이 바뀌면 자동으로 다시 컴파일합니다.
+컴파일된 파일은 엑셀과 함께 저장소에 커밋해 두므로, 새로 받은 체크아웃/컨테이너에서도 엑셀을 읽지 않습니다
+(체크아웃마다 달라지는 수정 시각은 쓰지 않음).
+
+    python category_table.py [엑셀 경로]   # 엑셀을 고친 뒤 다시 컴파일 (결과 파일도 함께 커밋)
+"""
+import hashlib
+import json
+import os
+import sys
+
+EXCEL_PATH = "./data/GT_KTAS카테고리_분류.xlsx"
+AGE_GROUPS = ["15세 이상", "15세 미만"]
+# 계층 구조 파일 형식이 바뀌면 올림 (이전 형식 파일은 다시 컴파일)
+HIERARCHY_FORMAT = 1
+
+_loaded = {}
+
+def load_category_table(path: str = EXCEL_PATH) -> "pd.DataFrame":
+    import pandas as pd
+
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"엑셀 파일을 찾을 수 없습니다: {path}")
+
+    df = pd.read_excel(path, usecols=["나이", "대분류", "중분류"])
+    df = df.astype(str).apply(lambda s: s.str.strip())
+
+    return df
+
+def build_hierarchy(df: "pd.DataFrame"):
+    """
+    { "15세 이상": {"물질오용": [...], "정신건강": [...]}, "15세 미만": {...} }
+    """
+    tree = {}
+    for age_val, dfa in df.groupby("나이"):
+        if age_val not in AGE_GROUPS:
+            continue
+        main_map = {}
+        for main_val, dfm in dfa.groupby("대분류"):
+            mids = sorted(dfm["중분류"].dropna().unique().tolist())
+            main_map[main_val] = mids
+        tree[age_val] = main_map
+    return tree
+
+# ---------- 컴파일된 계층 구조 ----------
+def hierarchy_path(path: str = EXCEL_PATH) -> str:
+    return os.path.splitext(path)[0] + ".hierarchy.json"
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _write_artifact(path, hierarchy, size, sha256):
+    artifact = hierarchy_path(path)
+    data = {
+        "format": HIERARCHY_FORMAT,
+        "source": os.path.basename(path),
+        "size": size,
+        "sha256": sha256,
+        "hierarchy": hierarchy,
+    }
+    tmp_path = f"{artifact}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, artifact)
+    except OSError:
+        # 읽기 전용 위치면 저장하지 않고 이번 프로세스에서만 사용
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def compile_hierarchy(path: str = EXCEL_PATH):
+    """엑셀에서 계층 구조를 만들어 hierarchy_path(path)에 저장하고 돌려줍니다."""
+    hierarchy = build_hierarchy(load_category_table(path))
+    _write_artifact(path, hierarchy, os.path.getsize(path), _sha256(path))
+    return hierarchy
+
+def load_hierarchy(path: str = EXCEL_PATH):
+    """
+    build_hierarchy(load_category_table(path))와 같은 결과를 돌려줍니다. pandas를 불러오지 않습니다.
+      - 컴파일된 파일의 크기/SHA-256이 원본과 같으면 그대로 사용 (엑셀이 작아 해시는 1ms도 걸리지 않음)
+      - 원본이 없고 컴파일된 파일만 있으면 그 파일을 사용
+      - 그 외에는 엑셀을 읽어 다시 컴파일
+    같은 프로세스에서는 원본이 바뀌지 않는 한 한 번만 읽습니다. 돌려받은 dict는 수정하지 마세요.
+    """
+    try:
+        stat = os.stat(path)
+        key = (path, stat.st_size, stat.st_mtime_ns)
+    except FileNotFoundError:
+        stat = None
+        key = (path, None, None)
+    if key in _loaded:
+        return _loaded[key]
+
+    try:
+        with open(hierarchy_path(path), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("format") != HIERARCHY_FORMAT:
+            data = None
+    except (OSError, ValueError):
+        data = None
+
+    if stat is None:
+        if data is None:
+            raise FileNotFoundError(f"엑셀 파일을 찾을 수 없습니다: {path}")
+        hierarchy = data["hierarchy"]
+    elif data is not None and data["size"] == stat.st_size and data["sha256"] == _sha256(path):
+        hierarchy = data["hierarchy"]
+    else:
+        hierarchy = compile_hierarchy(path)
+
+    _loaded[key] = hierarchy
+    return hierarchy
+
+if __name__ == "__main__":
+    source = sys.argv[1] if len(sys.argv) > 1 else EXCEL_PATH
+    tree = compile_hierarchy(source)
+    print(f"{hierarchy_path(source)}: {sum(len(mids) for mains in tree.values() for mids in mains.values())}개 중분류")
@@ -0,0 +1,88 @@
+"""
+여러 브라우저 세션이 함께 쓰는 대화 저장소 읽기 캐시.
+
+  - Streamlit은 모듈을 프로세스에 한 번만 불러오므로, 모듈 수준에서 감싼 저장소 하나를 모든 세션이 공유
+    (세션마다 st.session_state에 목록을 복사해 두지 않음)
+  - count/query/ids/get 결과를 (메서드, 인자)마다 하나만 두고, 저장소 version()이 바뀌면 한꺼번에 버림
+    (다른 세션/프로세스의 쓰기도 version으로 알아챔). 캐시 항목 수는 MAX_ENTRIES로 제한 (오래 안 쓴 것부터 버림)
+  - copy-on-write: 캐시에는 공유 레코드 하나만 두고 꺼낼 때마다 얕은 복사본을 돌려줌. 세션이 고친 값은
+    그 세션의 복사본에만 남고, 저장은 저장소의 쓰기 메서드로만 (중첩된 dialogue/evaluations는 고치지 말 것)
+  - 쓰기와 나머지 메서드(iter_query, version 등)는 그대로 저장소로 넘김
+"""
+import threading
+from collections import OrderedDict
+
+MAX_ENTRIES = 64
+# 이보다 많은 레코드를 돌려주는 query(limit 없는 전체 조회 등)는 캐시에 두지 않음
+MAX_CACHED_ROWS = 500
+
+def _freeze(value):
+    # filters 같은 인자를 캐시 키로 쓸 수 있게 (dict/list/set → 해시 가능한 값)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(v)) for key, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value)
+    return value
+
+def _copy(value):
+    if isinstance(value, dict):
+        return dict(value)
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+class SharedStoreCache:
+    """저장소(JsonlDialogueStore/SqliteDialogueStore)를 감싸 같은 메서드를 제공하는 프로세스 공유 읽기 캐시."""
+
+    def __init__(self, store, max_entries=MAX_ENTRIES):
+        self.store = store
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._version = None
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+    def _cached(self, name, *args, cacheable=None, **kwargs):
+        version = self.store.version()
+        key = (name, _freeze(args), _freeze(kwargs))
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _copy(self._entries[key])
+            self.misses += 1
+        # 저장소 읽기는 잠금 밖에서 (다른 세션의 읽기를 막지 않음)
+        value = getattr(self.store, name)(*args, **kwargs)
+        if cacheable is None or cacheable(value):
+            with self._lock:
+                # 읽는 사이에 다른 호출이 새 version을 보고 캐시를 비웠으면 넣지 않음
+                if version == self._version:
+                    self._entries[key] = value
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+        return _copy(value)
+
+    def query(self, filters=None, limit=None, offset=0):
+        return self._cached("query", filters, limit=limit, offset=offset, cacheable=lambda rows: len(rows) <= MAX_CACHED_ROWS)
+
+    def count(self, filters=None):
+        return self._cached("count", filters)
+
+    def ids(self):
+        return self._cached("ids")
+
+    def get(self, dialogue_id):
+        return self._cached("get", dialogue_id)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,123 @@
+"""
+대화 저장소를 CSV / JSONL / Parquet 파일로 내보냅니다.
+
+  - 저장소를 청크 단위(iter_query)로 읽어 파일에 바로 쓰므로 전체 표를 메모리에 만들지 않음
+  - 만든 파일은 EXPORT_DIR에 (이름, 형식, 저장소 version, 조회 조건)별로 남겨 두고,
+    저장소가 바뀌지 않았으면 다시 만들지 않음
+  - JSONL은 저장된 레코드(턴 구조 그대로), Parquet은 턴 하나가 한 행인 학습용 표
+  - pandas/pyarrow는 해당 형식을 처음 내보낼 때 불러옴
+"""
+import hashlib
+import json
+import os
+import threading
+
+EXPORT_DIR = os.environ.get("EXPORT_DIR", "data/exports")
+CHUNK_SIZE = 500
+
+FORMATS = {
+    "CSV": {"ext": "csv", "mime": "text/csv"},
+    "JSONL": {"ext": "jsonl", "mime": "application/x-ndjson"},
+    "Parquet": {"ext": "parquet", "mime": "application/vnd.apache.parquet"},
+}
+
+TURN_COLUMNS = [
+    "id", "source", "age", "gender", "main_category", "middle_category", "ktas_level",
+    "turn", "speaker", "utterance", "question_score", "realism_score", "evaluators",
+]
+
+_lock = threading.Lock()
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def turn_rows(record):
+    """레코드 하나를 턴마다 한 행인 dict 목록으로 펼칩니다. 턴 구조가 아닌 대화는 한 행."""
+    persona = record.get("persona") or {}
+    evaluation = record.get("evaluation") or {}
+    base = {
+        "id": record["id"],
+        "source": record.get("source") or "생성",
+        "age": persona.get("age"),
+        "gender": persona.get("gender"),
+        "main_category": persona.get("main_category"),
+        "middle_category": persona.get("middle_category"),
+        "ktas_level": _int(persona.get("ktas_level")),
+        "question_score": _int(evaluation.get("question")),
+        "realism_score": _int(evaluation.get("realism")),
+        "evaluators": ", ".join(name for name in record.get("evaluations") or {} if name),
+    }
+    dialogue = record.get("dialogue")
+    if not isinstance(dialogue, list):
+        text = dialogue if isinstance(dialogue, str) else json.dumps(dialogue, ensure_ascii=False)
+        return [dict(base, turn=1, speaker=None, utterance=text)]
+    rows = []
+    for i, turn in enumerate(dialogue, start=1):
+        if not isinstance(turn, dict):
+            turn = {"utterance": turn}
+        utterance = turn.get("utterance", turn.get("content", turn.get("text")))
+        rows.append(dict(
+            base,
+            turn=_int(turn.get("turn")) or i,
+            speaker=turn.get("speaker", turn.get("role")),
+            utterance=utterance if isinstance(utterance, str) else json.dumps(utterance, ensure_ascii=False),
+        ))
+    return rows
+
+# ---------- 형식별 쓰기 ----------
+def _write_csv(path, chunks, to_row):
+    import pandas as pd
+
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        header = True
+        for chunk in chunks:
+            pd.DataFrame([to_row(rec) for rec in chunk]).to_csv(f, header=header, index=False)
+            header = False
+
+def _write_jsonl(path, chunks, to_row):
+    with open(path, "w", encoding="utf-8") as f:
+        for chunk in chunks:
+            f.write("".join(json.dumps(rec, ensure_ascii=False) + "\n" for rec in chunk))
+
+def _write_parquet(path, chunks, to_row):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()), ("source", pa.string()), ("age", pa.string()), ("gender", pa.string()),
+        ("main_category", pa.string()), ("middle_category", pa.string()), ("ktas_level", pa.int64()),
+        ("turn", pa.int64()), ("speaker", pa.string()), ("utterance", pa.string()),
+        ("question_score", pa.int64()), ("realism_score", pa.int64()), ("evaluators", pa.string()),
+    ])
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in chunks:
+            rows = [row for rec in chunk for row in turn_rows(rec)]
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+
+_WRITERS = {"CSV": _write_csv, "JSONL": _write_jsonl, "Parquet": _write_parquet}
+
+def export(store, fmt, filters=None, to_row=None, name="dialogues"):
+    """
+    store에서 filters에 맞는 대화를 fmt(FORMATS의 키) 파일로 내보내고 경로를 돌려줍니다.
+    to_row(레코드) → dict는 CSV 한 행을 만드는 함수입니다.
+    같은 name/fmt/조건에 저장소 version도 같으면 이전에 만든 파일을 그대로 돌려줍니다.
+    """
+    version = store.version()
+    key = json.dumps([name, fmt, str(version), filters or {}], ensure_ascii=False, sort_keys=True, default=str)
+    prefix = f"{name}-{fmt.lower()}-"
+    path = os.path.join(EXPORT_DIR, f"{prefix}{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}.{FORMATS[fmt]['ext']}")
+    with _lock:
+        if os.path.exists(path):
+            return path
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        _WRITERS[fmt](tmp_path, store.iter_query(filters, chunk_size=CHUNK_SIZE), to_row)
+        os.replace(tmp_path, path)
+        # 같은 이름/형식의 이전 파일은 더 쓰이지 않으므로 정리
+        for old in os.listdir(EXPORT_DIR):
+            if old.startswith(prefix) and os.path.join(EXPORT_DIR, old) != path and not old.endswith(".tmp"):
+                os.remove(os.path.join(EXPORT_DIR, old))
+        return path
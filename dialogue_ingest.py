@@ -0,0 +1,238 @@
+"""
+업로드한 자체 대화 CSV/XLSX를 청크 단위로 읽어 저장소에 바로 넣습니다.
+
+  - 인코딩과 구분자는 파일 앞/중간/끝의 작은 샘플로 한 번만 판별
+  - CSV는 pandas C 엔진으로 chunk_rows 행씩, XLSX는 openpyxl read_only 모드로 한 행씩 읽음
+  - 대화 셀은 청크마다 json.loads 한 번으로 파싱하고, 실패한 청크만 셀 단위로 다시 파싱
+  - 행 단위 오류(열 개수 불일치, 빈 대화, JSON 파싱 실패)는 건너뛰거나 원문으로 저장하고 보고서에 남김
+  - 내용 해시(dialogue_hash)가 이미 저장된 대화와 파일 안의 중복은 건너뛰어 새 대화만 추가
+  - 새 대화는 청크마다 한 번에 사전 검사(prescreen)해 결과와 함께 저장
+"""
+import codecs
+import json
+import os
+import re
+import warnings
+import pandas as pd
+from dialogue_store import dialogue_hash
+from prescreen import prescreen_many
+
+DIALOGUE_COLUMNS = ["dialogue", "생성한 대화", "대화", "챗GPT와 대화한 내용", "contents"]
+# euc-kr은 cp949의 부분집합이라 cp949로 함께 처리
+ENCODINGS = ["utf-8", "cp949", "latin1"]
+DELIMITERS = [",", "\t", ";", "|"]
+SAMPLE_BYTES = 64 * 1024
+CHUNK_ROWS = 2000
+
+_BAD_LINE_RE = re.compile(r"Skipping line (\d+): (.*)")
+
+class IngestError(Exception):
+    """파일 형식을 알 수 없거나 대화 컬럼이 없는 경우."""
+
+def _file_size(file):
+    pos = file.tell()
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    file.seek(pos)
+    return size
+
+def _samples(file, size):
+    """파일 앞/중간/끝에서 SAMPLE_BYTES씩. 중간과 끝 샘플은 멀티바이트 문자가 잘리지 않도록 첫 줄바꿈 뒤부터."""
+    samples = []
+    for start in sorted({0, max(0, size // 2 - SAMPLE_BYTES // 2), max(0, size - SAMPLE_BYTES)}):
+        file.seek(start)
+        sample = file.read(SAMPLE_BYTES)
+        if start:
+            sample = sample[sample.find(b"\n") + 1:]
+        samples.append(sample)
+    file.seek(0)
+    return samples
+
+def sniff_encoding(samples):
+    if samples[0].startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    for enc in ENCODINGS:
+        try:
+            for sample in samples:
+                # 샘플 끝에서 잘린 문자는 오류로 보지 않음 (final=False)
+                codecs.getincrementaldecoder(enc)().decode(sample, final=False)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    return "latin1"
+
+def sniff_delimiter(header_line):
+    """헤더 줄에 가장 많이 나오는 구분자 (대화 셀 안의 쉼표에 흔들리지 않도록 헤더만 봄)."""
+    counts = {d: header_line.count(d) for d in DELIMITERS}
+    best = max(counts, key=counts.get)
+    return best if counts[best] else ","
+
+def is_excel(name, sample):
+    return sample.startswith(b"PK\x03\x04") or (name or "").lower().endswith(".xlsx")
+
+def find_dialogue_column(columns):
+    for cand in DIALOGUE_COLUMNS:
+        if cand in columns:
+            return cand
+    raise IngestError("업로드한 파일에서 대화 컬럼을 찾지 못했습니다. 예: 'dialogue', '생성한 대화', '대화'")
+
+def _looks_like_json(cell):
+    s = cell.strip()
+    return (s[:1], s[-1:]) in (("{", "}"), ("[", "]"))
+
+def parse_dialogues(cells):
+    """
+    대화 셀 목록을 [(값, 오류 또는 None)]으로 바꿉니다. JSON처럼 보이지 않는 셀은 원문 그대로입니다.
+    JSON 셀들은 하나의 배열로 묶어 한 번에 파싱하고, 실패하면 셀 단위로 다시 파싱해 문제 있는 행을 찾습니다.
+    """
+    results = [(cell, None) for cell in cells]
+    json_idx = [i for i, cell in enumerate(cells) if _looks_like_json(cell)]
+    if not json_idx:
+        return results
+    try:
+        parsed = json.loads("[" + ",".join(cells[i] for i in json_idx) + "]")
+    except ValueError:
+        parsed = None
+    if parsed is not None and len(parsed) == len(json_idx):
+        for i, value in zip(json_idx, parsed):
+            results[i] = (value, None)
+        return results
+    for i in json_idx:
+        try:
+            results[i] = (json.loads(cells[i]), None)
+        except ValueError as e:
+            results[i] = (cells[i], f"JSON 파싱 실패: {e}")
+    return results
+
+def sniff_format(file, name=""):
+    """
+    파일의 앞/중간/끝 샘플만 보고 {"excel", "encoding", "sep", "size"}를 판별합니다.
+    CSV가 아니면 encoding/sep은 None이고, 판별 후 파일 위치는 처음으로 돌아갑니다.
+    """
+    size = _file_size(file)
+    samples = _samples(file, size)
+    if is_excel(name, samples[0]):
+        return {"excel": True, "encoding": None, "sep": None, "size": size}
+    encoding = sniff_encoding(samples)
+    header_line = samples[0].decode(encoding, errors="replace").splitlines()[:1]
+    return {"excel": False, "encoding": encoding, "sep": sniff_delimiter(header_line[0] if header_line else ""), "size": size}
+
+# ---------- 청크 읽기 ----------
+def _csv_chunks(file, size, encoding, sep, column, chunk_rows):
+    reader = pd.read_csv(
+        file, encoding=encoding, sep=sep, engine="c", dtype=str, keep_default_na=False,
+        chunksize=chunk_rows, on_bad_lines="warn"
+    )
+    with reader:
+        while True:
+            # 열 개수가 맞지 않는 줄은 ParserWarning으로 알려 주므로 청크마다 모아 보고
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter("always", pd.errors.ParserWarning)
+                try:
+                    chunk = next(reader)
+                except StopIteration:
+                    return
+            bad_lines = [
+                (int(m[1]), m[2].strip())
+                for w in caught for m in _BAD_LINE_RE.finditer(str(w.message))
+            ]
+            yield chunk[column].tolist(), bad_lines, min(1.0, file.tell() / size) if size else 1.0
+
+def _excel_chunks(workbook, rows, column_idx, total_rows, chunk_rows):
+    try:
+        cells, read = [], 0
+        for row in rows:
+            read += 1
+            value = row[column_idx] if column_idx < len(row) else None
+            cells.append("" if value is None else str(value))
+            if len(cells) >= chunk_rows:
+                yield cells, [], min(1.0, read / total_rows) if total_rows else 0.0
+                cells = []
+        if cells:
+            yield cells, [], 1.0
+    finally:
+        workbook.close()
+
+def read_dialogue_chunks(file, name="", chunk_rows=CHUNK_ROWS):
+    """
+    file(seek 가능한 바이너리 파일)에서 대화 셀을 청크 단위로 읽는 반복자를 돌려줍니다.
+    형식 판별과 대화 컬럼 확인은 바로 수행하므로(실패 시 IngestError) 저장소를 비우기 전에 부르면 됩니다.
+    반복자는 (대화 셀 목록, [(건너뛴 줄 번호, 사유)], 진행률 0~1)을 냅니다.
+    """
+    fmt = sniff_format(file, name)
+    if fmt["excel"]:
+        from openpyxl import load_workbook
+        try:
+            workbook = load_workbook(file, read_only=True, data_only=True)
+        except Exception as e:
+            raise IngestError(f"엑셀 파일을 읽지 못했습니다: {e}")
+        sheet = workbook.active
+        rows = sheet.iter_rows(values_only=True)
+        header = ["" if v is None else str(v).strip() for v in next(rows, ())]
+        try:
+            column_idx = header.index(find_dialogue_column(header))
+        except IngestError:
+            workbook.close()
+            raise
+        total_rows = max(0, (sheet.max_row or 0) - 1)
+        return _excel_chunks(workbook, rows, column_idx, total_rows, chunk_rows)
+
+    encoding, sep = fmt["encoding"], fmt["sep"]
+    try:
+        columns = list(pd.read_csv(file, encoding=encoding, sep=sep, engine="c", nrows=0).columns)
+    except Exception as e:
+        raise IngestError(f"파일을 읽지 못했습니다 (인코딩={encoding}, 구분자={sep!r}): {e}")
+    finally:
+        file.seek(0)
+    stripped = [str(c).strip() for c in columns]
+    column = columns[stripped.index(find_dialogue_column(stripped))]
+    return _csv_chunks(file, fmt["size"], encoding, sep, column, chunk_rows)
+
+def ingest(chunks, add_many, known_hashes=None, on_progress=None):
+    """
+    read_dialogue_chunks()의 청크를 자체 대화 레코드로 바꿔 청크마다 add_many(records)로 저장합니다.
+    known_hashes(저장소의 content_hashes())에 있는 대화와 파일 안에서 앞서 나온 대화는 건너뛰므로,
+    이미 있는 대화의 평가는 그대로 남고 새 대화만 추가됩니다. 새 레코드에는 content_hash와 사전 검사 결과를 함께 저장합니다.
+    on_progress(진행률, 보고서)는 청크마다 불립니다. 읽는 도중 오류가 나면 그때까지 저장한 채로 멈춥니다.
+
+    반환: {"rows": 읽은 행 수, "saved": 새로 저장한 대화 수, "existing": 이미 있던 대화 수,
+           "duplicates": 파일 안 중복 수, "flagged": 사전 검사를 통과하지 못한 새 대화 수,
+           "errors": [{"row", "line", "error"}], "aborted": bool}
+    (row는 데이터 행 번호(1부터), line은 CSV 파일의 줄 번호)
+    """
+    known = set(known_hashes or ())
+    seen = set()
+    report = {"rows": 0, "saved": 0, "existing": 0, "duplicates": 0, "flagged": 0, "errors": [], "aborted": False}
+    try:
+        for cells, bad_lines, progress in chunks:
+            for line, reason in bad_lines:
+                report["errors"].append({"row": None, "line": line, "error": f"열 개수가 맞지 않아 건너뜀 ({reason})"})
+            records = []
+            for value, error in parse_dialogues(cells):
+                report["rows"] += 1
+                if isinstance(value, str) and not value.strip():
+                    report["errors"].append({"row": report["rows"], "line": None, "error": "대화가 비어 있어 건너뜀"})
+                    continue
+                if error:
+                    report["errors"].append({"row": report["rows"], "line": None, "error": f"{error} (원문으로 저장)"})
+                content_hash = dialogue_hash(value)
+                if content_hash in seen:
+                    report["duplicates"] += 1
+                    continue
+                seen.add(content_hash)
+                if content_hash in known:
+                    report["existing"] += 1
+                    continue
+                records.append({"dialogue": value, "source": "업로드", "evaluation": {}, "content_hash": content_hash})
+            if records:
+                for record, result in zip(records, prescreen_many(records)):
+                    record["prescreen"] = result
+                    report["flagged"] += not result["passed"]
+                add_many(records)
+                report["saved"] += len(records)
+            if on_progress:
+                on_progress(progress, report)
+    except Exception as e:
+        report["errors"].append({"row": None, "line": None, "error": f"파일 읽기 중단: {e}"})
+        report["aborted"] = True
+    return report
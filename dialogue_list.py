@@ -1,44 +1,60 @@
 import streamlit as st
 import pandas as pd
-from utils import load_all_dialogues
+from utils import query_dialogues, count_dialogues, near_duplicates, search_index, export_dialogues
+from list_controls import (
+    filter_controls, page_controls, near_duplicate_controls, near_duplicate_label, export_controls,
+    search_controls, search_match_label
+)
 import json
 
+def _to_row(entry, groups=None, search=None):
+    conv_str = json.dumps(entry.get("dialogue", {}), ensure_ascii=False)
+
+    evals = entry.get("evaluation", {})
+    question = evals.get("question", "")
+    realism = evals.get("realism", "")
+    # 여러 평가자가 평가했으면 모두 표시 (점수는 가장 최근 평가)
+    evaluator = ", ".join(name for name in entry.get("evaluations") or {} if name) or evals.get("evaluator", "")
+
+    persona = entry.get("persona", {})
+
+    row = {
+        "대화 출처": "생성",
+        "생성한 대화": conv_str,
+        "평가자": evaluator,
+        "대화의 적절성": question,
+        "대화의 현실성": realism,
+        "나이": persona.get("age", ""),
+        "성별": persona.get("gender", ""),
+        "대분류": persona.get("main_category", ""),
+        "중분류": persona.get("middle_category", ""),
+        "KTAS 레벨": persona.get("ktas_level", "")
+    }
+    if groups is not None:
+        row["유사 묶음"] = near_duplicate_label(groups, entry["id"])
+    if search:
+        row["검색 일치 발화"] = search_match_label(entry, *search)
+    return row
+
 def dialogue_list_tab():
     st.header("[전체 대화 확인 및 저장]")
 
-    data = load_all_dialogues()
-    rows = []
-
-    for entry in data:
-        conv_str = json.dumps(entry.get("dialogue", {}), ensure_ascii=False)
-
-        evals = entry.get("evaluation", {})
-        question = evals.get("question", "")
-        realism = evals.get("realism", "")
-        evaluator = evals.get("evaluator", "")    
-
-        persona = entry.get("persona", {})
-
-        rows.append({
-            "대화 출처": "생성",
-            "생성한 대화": conv_str,
-            "평가자": evaluator,
-            "대화의 적절성": question,
-            "대화의 현실성": realism,
-            "나이": persona.get("age", ""),
-            "성별": persona.get("gender", ""),
-            "대분류": persona.get("main_category", ""),
-            "중분류": persona.get("middle_category", ""),
-            "KTAS 레벨": persona.get("ktas_level", "")
-        })
-
-    df = pd.DataFrame(rows)
+    filters = filter_controls("gen_list")
+    filters, query, speaker = search_controls(search_index, "gen_list", filters, count_dialogues)
+    total = count_dialogues(filters)
+    limit, offset = page_controls(total, "gen_list")
+    if not total:
+        st.info("조회 조건에 맞는 대화가 없습니다.")
+        return
+
+    groups = near_duplicate_controls(near_duplicates, "gen_list")
+    search = (query, speaker) if query else None
+    df = pd.DataFrame([_to_row(entry, groups, search) for entry in query_dialogues(filters, limit=limit, offset=offset)])
     st.dataframe(df, use_container_width=True)
 
-    csv = df.to_csv(index=False).encode("utf-8-sig")
-    st.download_button(
-        "CSV 파일로 내보내기",
-        csv,
-        file_name="생성_응급실_문진_대화_데이터.csv",
-        mime="text/csv"
-    )
\ No newline at end of file
+    # 내보내기 (조회 조건에 맞는 전체 행, 버튼을 누를 때 생성)
+    export_controls(
+        "gen_list",
+        lambda fmt: export_dialogues(fmt, filters, to_row=_to_row),
+        "생성_응급실_문진_대화_데이터"
+    )
@@ -0,0 +1,360 @@
+"""
+발화 전문 검색: 발화의 문자 2-gram(bigram) 역색인으로 검색어가 들어 있는 대화를 찾습니다.
+
+  - 형태소 분석 없이 한글 문자 bigram으로 색인 (소문자로 바꾸고 공백은 지움: "가슴 통증" = "가슴통증")
+  - 검색어는 공백으로 나눈 단어마다 bigram 목록의 교집합으로 후보 발화를 찾고, 3글자 이상이면 실제 포함 여부를 확인
+    한 글자 단어는 그 글자가 들어 있는 bigram들의 합집합, 여러 단어는 모두 들어 있는 대화(AND)
+  - 화자(간호사 I / 환자 CHATGPT)로 발화를 좁히고, 페르소나 조건(나이/성별/대분류/중분류/KTAS)으로 대화를 좁힘
+  - 색인은 처음 검색할 때 numpy로 한 번에 만들고(정렬된 bigram → 발화 번호 목록, CSR), 이후 추가된 대화는
+    작은 dict에 따로 쌓았다가 충분히 커지거나 삭제된 대화가 많아지면 다시 합침
+  - 저장소 version이 바뀌면 store.changes(cursor)로 그 뒤에 추가/삭제된 대화만 반영 (near_duplicates.DialogueIndex와 같은 방식)
+  - numpy는 처음 검색할 때 불러옴
+"""
+import re
+import threading
+import time
+from array import array
+
+from dialogue_store import read_records
+from dialogue_validation import SPEAKERS
+
+FACETS = ["age", "gender", "main_category", "middle_category", "ktas_level"]
+# 추가 색인(delta)의 발화 수가 이 값과 기본 색인의 COMPACT_RATIO배 중 큰 값을 넘으면 다시 합침
+COMPACT_MIN_TURNS = 50_000
+COMPACT_RATIO = 0.2
+# 삭제된 발화가 이 비율을 넘으면 다시 합침
+DEAD_RATIO = 0.3
+# 2-gram 코드: 앞 글자 << 21 | 뒤 글자 (유니코드 코드 포인트는 21비트)
+_SHIFT = 21
+_CHAR_MASK = (1 << _SHIFT) - 1
+_SPEAKER_CODES = {s: i for i, s in enumerate(SPEAKERS)}
+
+def normalize(text):
+    return "".join(str(text).lower().split())
+
+def parse_query(query):
+    """검색어를 정규화한 단어 목록으로 (중복 제거, 순서 유지)."""
+    return list(dict.fromkeys(t for t in (normalize(word) for word in (query or "").split()) if t))
+
+def dialogue_turns(dialogue):
+    """대화에서 [(턴 위치, 화자, 발화)]. 턴 목록이 아니면 전체를 화자 없는 발화 하나로 봅니다."""
+    if isinstance(dialogue, dict):
+        dialogue = dialogue.get("dialogue", list(dialogue.values()))
+    if not isinstance(dialogue, list):
+        return [(0, None, "" if dialogue is None else str(dialogue))]
+    turns = []
+    for i, turn in enumerate(dialogue):
+        if isinstance(turn, dict):
+            text = turn.get("utterance") or turn.get("content") or turn.get("text")
+            turns.append((i, turn.get("speaker"), str(text) if text is not None else " ".join(str(v) for v in turn.values())))
+        elif turn is not None:
+            turns.append((i, None, str(turn)))
+    return turns
+
+def _term_pattern(term):
+    # 원문에서 공백을 무시하고 대소문자 구분 없이 찾는 정규식
+    return re.compile(r"\s*".join(re.escape(ch) for ch in term), re.IGNORECASE)
+
+def highlight_turns(record, query, speaker=None, mark=("【", "】")):
+    """
+    record의 발화 중 검색어가 들어 있는 발화의 [(턴 위치, 화자, 일치 부분을 mark로 감싼 발화)].
+    검색 결과를 화면에 보여 줄 때 현재 페이지의 레코드에만 씁니다.
+    """
+    patterns = [_term_pattern(term) for term in parse_query(query)]
+    if not patterns:
+        return []
+    found = []
+    for i, who, text in dialogue_turns(record.get("dialogue")):
+        if speaker and who != speaker:
+            continue
+        if not any(p.search(text) for p in patterns):
+            continue
+        for p in patterns:
+            text = p.sub(lambda m: f"{mark[0]}{m.group(0)}{mark[1]}", text)
+        found.append((i, who, text))
+    return found
+
+def _view(values, dtype):
+    # array.array를 numpy 배열로 복사 (버퍼를 빌린 채로 두면 이후 append가 BufferError)
+    import numpy as np
+    return np.frombuffer(values, dtype=dtype).copy() if len(values) else np.zeros(0, dtype=dtype)
+
+def _grams(text):
+    return {(ord(a) << _SHIFT) | ord(b) for a, b in zip(text, text[1:])}
+
+def _compile(texts):
+    """
+    발화 목록(정규화)에서 (정렬된 bigram, 각 bigram의 시작 위치, 발화 번호 목록, 이어 붙인 코드 포인트, 발화별 시작 위치).
+    발화 원문은 코드 포인트 배열로만 들고 있음 (한글은 uint16, 발화마다 str로 두는 것보다 훨씬 작음)
+    """
+    import numpy as np
+
+    lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+    text_starts = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+    chars = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32)
+    chars = chars.astype(np.uint16) if not len(chars) or int(chars.max()) < 1 << 16 else chars.copy()
+    codes = chars.astype(np.uint64)
+    owner = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+    empty = np.zeros(0, dtype=np.uint64), np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32), chars, text_starts
+    if len(codes) < 2:
+        return empty
+    # 같은 발화 안의 이웃한 두 글자만 (발화 경계를 넘는 bigram 제외)
+    same = owner[:-1] == owner[1:]
+    grams = ((codes[:-1] << np.uint64(_SHIFT)) | codes[1:])[same]
+    turns = owner[:-1][same]
+    if not len(grams):
+        return empty
+    # (bigram, 발화) 쌍을 하나의 정렬 키로: bigram 42비트 뒤에 발화 번호
+    # (np.unique는 해시 방식이라 이 크기에서는 정렬 후 이웃 비교보다 훨씬 느림)
+    bits = max(1, int(len(texts)).bit_length())
+    if 2 * _SHIFT + bits <= 64:
+        keys = (grams << np.uint64(bits)) | turns.astype(np.uint64)
+        keys.sort()
+        keys = keys[np.append(True, keys[1:] != keys[:-1])]
+        grams, turns = keys >> np.uint64(bits), (keys & np.uint64((1 << bits) - 1)).astype(np.int32)
+    else:
+        order = np.lexsort((turns, grams))
+        grams, turns = grams[order], turns[order]
+        keep = np.ones(len(grams), dtype=bool)
+        keep[1:] = (grams[1:] != grams[:-1]) | (turns[1:] != turns[:-1])
+        grams, turns = grams[keep], turns[keep].astype(np.int32)
+    starts = np.flatnonzero(np.append(True, grams[1:] != grams[:-1]))
+    return grams[starts], np.append(starts, len(grams)).astype(np.int64), turns, chars, text_starts
+
+class SearchIndex:
+    """
+    대화 저장소에 대한 발화 bigram 역색인. 여러 세션이 함께 쓰므로 검색/갱신은 잠금 안에서 합니다.
+    search()가 돌려주는 ids는 저장소 query()의 filters["ids"]로 넘겨 나머지 조건/페이지와 함께 조회합니다.
+    """
+
+    def __init__(self, store):
+        self._store = store
+        self._lock = threading.Lock()
+        self._version = None
+        self._cursor = None
+        self._clear()
+
+    def _clear(self):
+        # 발화/대화 단위 배열은 추가될 때마다 덧붙이고, 검색할 때 numpy로 복사 없이 봄
+        # 기본 색인에 들어간 발화 원문은 _base의 코드 포인트 배열로, 그 뒤에 추가된 발화만 str 목록으로 둠
+        self._delta_texts = []
+        self._turn_doc = array("i")
+        self._speaker = array("b")
+        self._doc_ids = []
+        self._doc_pos = {}
+        self._doc_turns = {}
+        self._alive = bytearray()
+        self._facet_codes = {name: array("i") for name in FACETS}
+        self._facet_values = {name: {} for name in FACETS}
+        self._base = None
+        self._base_turns = 0
+        self._delta = {}
+        self._dead_turns = 0
+
+    # ---------- 색인 갱신 ----------
+    def _facet_code(self, name, value):
+        values = self._facet_values[name]
+        value = "" if value is None else str(value)
+        code = values.get(value)
+        if code is None:
+            code = values[value] = len(values)
+        return code
+
+    def _append(self, record):
+        pos = len(self._doc_ids)
+        self._doc_ids.append(record["id"])
+        self._doc_pos[record["id"]] = pos
+        self._alive.append(1)
+        persona = record.get("persona") or {}
+        for name in FACETS:
+            self._facet_codes[name].append(self._facet_code(name, persona.get(name)))
+        first = len(self._turn_doc)
+        for _, who, text in dialogue_turns(record.get("dialogue")):
+            self._delta_texts.append(normalize(text))
+            self._speaker.append(_SPEAKER_CODES.get(who, -1))
+        self._turn_doc.extend([pos] * (self._base_turns + len(self._delta_texts) - first))
+        self._doc_turns[pos] = (first, len(self._turn_doc))
+
+    def _add_delta(self, start):
+        for turn in range(start, len(self._turn_doc)):
+            for gram in _grams(self._delta_texts[turn - self._base_turns]):
+                self._delta.setdefault(gram, []).append(turn)
+
+    def _remove(self, key):
+        pos = self._doc_pos.pop(key, None)
+        if pos is not None and self._alive[pos]:
+            self._alive[pos] = 0
+            first, end = self._doc_turns.pop(pos)
+            self._dead_turns += end - first
+
+    def _all_texts(self):
+        texts = []
+        if self._base is not None and self._base_turns:
+            chars, starts = self._base[3], self._base[4]
+            joined = chars.tobytes().decode("utf-16-le" if chars.dtype.itemsize == 2 else "utf-32-le")
+            texts = [joined[a:b] for a, b in zip(starts[:-1].tolist(), starts[1:].tolist())]
+        return texts + self._delta_texts
+
+    def _compact(self):
+        """삭제된 대화를 빼고 모든 발화로 기본 색인을 다시 만듭니다 (추가 색인은 비움)."""
+        all_texts = self._all_texts()
+        if self._dead_turns:
+            keep_docs = [pos for pos, alive in enumerate(self._alive) if alive]
+            texts, turn_doc, speaker, doc_turns = [], array("i"), array("b"), {}
+            for new_pos, pos in enumerate(keep_docs):
+                first, end = self._doc_turns[pos]
+                doc_turns[new_pos] = (len(texts), len(texts) + end - first)
+                texts.extend(all_texts[first:end])
+                turn_doc.extend([new_pos] * (end - first))
+                speaker.extend(self._speaker[first:end])
+            all_texts, self._turn_doc, self._speaker, self._doc_turns = texts, turn_doc, speaker, doc_turns
+            self._doc_ids = [self._doc_ids[pos] for pos in keep_docs]
+            self._doc_pos = {key: pos for pos, key in enumerate(self._doc_ids)}
+            self._alive = bytearray([1] * len(keep_docs))
+            for name in FACETS:
+                codes = self._facet_codes[name]
+                self._facet_codes[name] = array("i", [codes[pos] for pos in keep_docs])
+            self._dead_turns = 0
+        self._base = _compile(all_texts)
+        self._base_turns = len(all_texts)
+        self._delta_texts = []
+        self._delta = {}
+
+    def _sync(self):
+        version = self._store.version()
+        if version == self._version:
+            return
+        changes = self._store.changes(self._cursor)
+        if changes["reset"]:
+            self._clear()
+        for key in changes["deleted"]:
+            self._remove(key)
+        start = len(self._turn_doc)
+        missing = [key for key in changes["added"] if key not in self._doc_pos]
+        for record in read_records(self._store, missing):
+            self._append(record)
+        delta_turns = len(self._delta_texts)
+        if self._base is None or delta_turns > max(COMPACT_MIN_TURNS, COMPACT_RATIO * self._base_turns) \
+                or self._dead_turns > DEAD_RATIO * max(1, len(self._turn_doc)):
+            self._compact()
+        else:
+            self._add_delta(start)
+        self._cursor = changes["cursor"]
+        self._version = version
+
+    # ---------- 검색 ----------
+    def _postings(self, gram):
+        import numpy as np
+
+        vocab, offsets, turns = self._base[:3]
+        i = int(np.searchsorted(vocab, gram))
+        base = turns[offsets[i]:offsets[i + 1]] if i < len(vocab) and int(vocab[i]) == gram else turns[:0]
+        delta = self._delta.get(gram)
+        return base if not delta else np.concatenate([base, np.array(delta, dtype=np.int32)])
+
+    def _char_postings(self, ch):
+        # 한 글자 단어: 그 글자로 시작하거나 끝나는 모든 bigram의 합집합
+        import numpy as np
+
+        vocab, offsets, turns = self._base[:3]
+        code = np.uint64(ord(ch))
+        hit = np.flatnonzero(((vocab >> np.uint64(_SHIFT)) == code) | ((vocab & np.uint64(_CHAR_MASK)) == code))
+        parts = [turns[offsets[i]:offsets[i + 1]] for i in hit]
+        parts += [np.array(v, dtype=np.int32) for g, v in self._delta.items() if (g >> _SHIFT) == ord(ch) or (g & _CHAR_MASK) == ord(ch)]
+        if not parts:
+            return turns[:0]
+        matched = np.zeros(self._base_turns + len(self._delta_texts), dtype=bool)
+        for part in parts:
+            matched[part] = True
+        return np.flatnonzero(matched).astype(np.int32)
+
+    def _candidates(self, term):
+        """term의 bigram이 모두 들어 있는 발화 번호 (3글자 이상이면 실제 포함 여부는 _contains로 확인)."""
+        import numpy as np
+
+        if len(term) == 1:
+            return self._char_postings(term)
+        postings = sorted((self._postings(gram) for gram in _grams(term)), key=len)
+        found = postings[0]
+        for other in postings[1:]:
+            if not len(found):
+                break
+            found = np.intersect1d(found, other, assume_unique=True)
+        return found
+
+    def _contains(self, found, term):
+        """발화 번호 배열 found의 각 발화에 term이 들어 있는지 (기본 색인 발화는 코드 포인트 배열에서 한꺼번에)."""
+        import numpy as np
+
+        chars, starts = self._base[3], self._base[4]
+        hit = np.zeros(len(found), dtype=bool)
+        base = found < self._base_turns
+        idx = np.flatnonzero(base)
+        codes = [ord(ch) for ch in term]
+        if len(idx) and max(codes) <= np.iinfo(chars.dtype).max:
+            # 후보 발화마다 term이 시작할 수 있는 모든 위치를 펼친 뒤, 첫 글자부터 차례로 맞는 위치만 남김
+            first = starts[found[idx]]
+            counts = np.maximum(starts[found[idx] + 1] - first - len(codes) + 1, 0)
+            ends = np.cumsum(counts)
+            pos = np.arange(int(ends[-1])) + np.repeat(first - (ends - counts), counts)
+            for j, code in enumerate(codes):
+                pos = pos[chars[pos + j] == code]
+            matched = np.zeros(len(idx), dtype=bool)
+            matched[np.searchsorted(starts[found[idx]], pos, side="right") - 1] = True
+            hit[idx] = matched
+        for i in np.flatnonzero(~base).tolist():
+            hit[i] = term in self._delta_texts[int(found[i]) - self._base_turns]
+        return hit
+
+    def _facet_mask(self, filters):
+        import numpy as np
+
+        mask = np.frombuffer(bytes(self._alive), dtype=np.uint8).astype(bool)
+        for name in FACETS:
+            value = (filters or {}).get(name)
+            if value is None or value == []:
+                continue
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            wanted = [self._facet_values[name][str(v)] for v in values if str(v) in self._facet_values[name]]
+            codes = _view(self._facet_codes[name], np.int32)
+            mask &= np.isin(codes, wanted)
+        return mask
+
+    def search(self, query, filters=None, speaker=None):
+        """
+        query의 모든 단어가 (speaker의) 발화에 들어 있고 filters의 페르소나 조건에 맞는 대화를 찾습니다.
+        반환: {"ids": 대화 ID 집합, "count", "facets": {페르소나 항목: {값: 대화 수}}, "elapsed": 초}
+        검색어가 비어 있으면 None.
+        """
+        import numpy as np
+
+        terms = parse_query(query)
+        if not terms:
+            return None
+        started = time.perf_counter()
+        with self._lock:
+            self._sync()
+            turn_doc = _view(self._turn_doc, np.int32)
+            speakers = _view(self._speaker, np.int8)
+            docs = self._facet_mask(filters)
+            for term in terms:
+                # 화자/대화 조건으로 먼저 좁힌 뒤 실제 포함 여부 확인 (확인이 가장 비쌈)
+                turns = self._candidates(term)
+                if speaker:
+                    turns = turns[speakers[turns] == SPEAKERS.index(speaker)]
+                turns = turns[docs[turn_doc[turns]]]
+                if len(term) > 2 and len(turns):
+                    turns = turns[self._contains(turns, term)]
+                matched = np.zeros(len(docs), dtype=bool)
+                matched[turn_doc[turns]] = True
+                docs &= matched
+                if not docs.any():
+                    break
+            positions = np.flatnonzero(docs)
+            facets = {}
+            for name in FACETS:
+                labels = {code: value for value, code in self._facet_values[name].items()}
+                counts = np.bincount(_view(self._facet_codes[name], np.int32)[positions], minlength=len(labels))
+                facets[name] = {labels[code]: int(n) for code, n in enumerate(counts) if n}
+            ids = set(map(self._doc_ids.__getitem__, positions.tolist()))
+        return {"ids": ids, "count": len(ids), "facets": facets, "elapsed": time.perf_counter() - started}
@@ -0,0 +1,494 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from array import array
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: 프로세스 간 잠금 없이 스레드 잠금만 사용
+    fcntl = None
+
+STORE_BACKEND = os.environ.get("DIALOGUE_STORE_BACKEND", "jsonl")
+PERSONA_FILTERS = ["age", "gender", "main_category", "middle_category"]
+# 사람 평가와 LLM 자동 평가의 점수(0~10)가 이만큼 이상 다르면 검토 대상
+REVIEW_SCORE_GAP = 2
+
+class EvaluationConflict(Exception):
+    """평가 폼을 불러온 뒤 같은 평가자의 평가가 다른 곳에서 먼저 저장된 경우."""
+
+    def __init__(self, dialogue_id, evaluator, expected_version, current):
+        super().__init__(
+            f"대화 {dialogue_id}의 '{evaluator}' 평가가 이미 갱신되었습니다 "
+            f"(예상 버전 {expected_version}, 현재 버전 {(current or {}).get('version', 0)})."
+        )
+        self.current = current
+
+def _versioned(evaluation):
+    # 버전 관리 이전에 저장된 평가는 버전 0
+    return dict(evaluation, version=evaluation.get("version", 0)) if evaluation else {}
+
+def normalize_evaluations(record):
+    """
+    레코드의 평가를 {"evaluations": {평가자: 평가}, "evaluation": 가장 최근 평가} 형태로 맞춥니다.
+    예전 레코드처럼 evaluation 하나만 있으면 그 평가자의 평가로 옮깁니다.
+    """
+    evaluations = {name: _versioned(e) for name, e in (record.get("evaluations") or {}).items()}
+    latest = _versioned(record.get("evaluation") or {})
+    if latest and not evaluations:
+        evaluations[latest.get("evaluator") or ""] = latest
+    record = dict(record, evaluations=evaluations)
+    if not evaluations:
+        record.pop("evaluation", None)
+    elif not latest:
+        record["evaluation"] = max(evaluations.values(), key=lambda e: e.get("updated_at") or 0)
+    return record
+
+def next_evaluation(record, evaluation, expected_version=None, dialogue_id=None):
+    """
+    record에 저장할 새 평가(version, updated_at 포함)를 만듭니다.
+    expected_version이 그 평가자의 현재 버전과 다르면 EvaluationConflict.
+    """
+    evaluator = evaluation.get("evaluator") or ""
+    current = (record.get("evaluations") or {}).get(evaluator)
+    version = (current or {}).get("version", 0)
+    if expected_version is not None and expected_version != version:
+        raise EvaluationConflict(dialogue_id, evaluator, expected_version, current)
+    return dict(evaluation, version=version + 1, updated_at=time.time())
+
+def _normalized(value):
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, list):
+        return [_normalized(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _normalized(v) for k, v in value.items()}
+    return value
+
+def dialogue_hash(dialogue):
+    """공백과 키 순서 차이를 무시한 대화 내용의 해시. 업로드한 대화가 이미 있는지 판별할 때 씁니다."""
+    text = json.dumps(_normalized(dialogue), ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def is_judge(evaluation):
+    """LLM 자동 평가(llm_judge)가 저장한 평가인지. 자동 평가에는 judge(모델 이름) 필드가 있습니다."""
+    return bool(evaluation.get("judge"))
+
+def _score_gap(a, b, key):
+    try:
+        return abs(float(a.get(key)) - float(b.get(key)))
+    except (TypeError, ValueError):
+        return 0
+
+def needs_review(record):
+    """
+    사람이 검토해야 하는 대화인지.
+      - 자동 평가가 review(확신도 낮음)로 표시했는데 아직 사람 평가가 없거나
+      - 사람 평가와 자동 평가의 적절성/현실성 점수가 REVIEW_SCORE_GAP 이상 다른 경우
+    """
+    evaluations = [e for name, e in (record.get("evaluations") or {}).items() if name]
+    judges = [e for e in evaluations if is_judge(e)]
+    humans = [e for e in evaluations if not is_judge(e)]
+    for judge in judges:
+        if judge.get("review") and not humans:
+            return True
+        if any(_score_gap(judge, h, key) >= REVIEW_SCORE_GAP for h in humans for key in ("question", "realism")):
+            return True
+    return False
+
+def match_filters(record, filters):
+    """
+    filters 예: {"age": "15세 미만", "ktas_level": [1, 2], "evaluated": False, "evaluator": "kim", "review": True, "prescreen": True}
+    값이 None이거나 빈 리스트인 조건은 무시합니다. evaluator는 여러 평가자 중 한 명이라도 일치하면 통과합니다.
+    evaluated는 사람 평가만 셉니다 (LLM 자동 평가만 있으면 미평가). review는 needs_review()입니다.
+    prescreen은 사전 검사(prescreen.py) 통과 여부입니다. ids는 대화 ID 집합(set)으로, 발화 검색 결과로 좁힐 때 씁니다
+    (빈 집합이면 아무것도 통과하지 않음).
+    """
+    persona = record.get("persona") or {}
+    evaluations = record.get("evaluations") or {}
+    evaluators = {name for name in evaluations if name}
+    for key, value in (filters or {}).items():
+        if value is None or value == []:
+            continue
+        if key == "ids":
+            if record.get("id") not in value:
+                return False
+        elif key in PERSONA_FILTERS:
+            if str(persona.get(key, "")) != str(value):
+                return False
+        elif key == "ktas_level":
+            levels = value if isinstance(value, (list, tuple, set)) else [value]
+            if str(persona.get("ktas_level", "")) not in {str(v) for v in levels}:
+                return False
+        elif key == "evaluator":
+            if value not in evaluators:
+                return False
+        elif key == "evaluated":
+            if any(not is_judge(evaluations[name]) for name in evaluators) != bool(value):
+                return False
+        elif key == "review":
+            if needs_review(record) != bool(value):
+                return False
+        elif key == "prescreen":
+            if bool((record.get("prescreen") or {}).get("passed")) != bool(value):
+                return False
+        else:
+            raise ValueError(f"알 수 없는 필터입니다: {key}")
+    return True
+
+def read_records(store, ids, bulk=1000):
+    """ids의 레코드 목록 (그사이 지워진 ID는 뺌). bulk개보다 많으면 저장소를 한 번 훑고, 적으면 하나씩 읽습니다."""
+    if len(ids) > bulk:
+        wanted = set(ids)
+        return [rec for chunk in store.iter_query() for rec in chunk if rec["id"] in wanted]
+    return [rec for rec in (store.get(key) for key in ids) if rec is not None]
+
+def open_store(path, db_path=None, legacy_path=None, backend=None):
+    """
+    backend("jsonl" 또는 "sqlite", 기본값은 환경변수 DIALOGUE_STORE_BACKEND)에 맞는 저장소를 엽니다.
+    sqlite 저장소는 비어 있을 때 한 번, JSONL 저장소(와 그 이전의 JSON 파일)의 내용을 가져옵니다.
+    """
+    backend = backend or STORE_BACKEND
+    jsonl = JsonlDialogueStore(path, legacy_path=legacy_path)
+    if backend == "jsonl":
+        return jsonl
+    if backend == "sqlite":
+        from sqlite_store import SqliteDialogueStore
+        return SqliteDialogueStore(db_path or os.path.splitext(path)[0] + ".db", import_from=jsonl)
+    raise ValueError(f"알 수 없는 저장소 종류입니다: {backend}")
+
+class JsonlDialogueStore:
+    """
+    한 줄에 이벤트 하나를 덧붙이는(append-only) JSONL 대화 저장소.
+
+      {"op": "init", "token": "...", "next_id": 12} # 첫 줄: 파일을 새로 쓸 때마다 바뀌는 식별자와 다음 ID
+      {"op": "put", "id": 0, "record": {...}}       # 대화 추가
+      {"op": "eval", "id": 0, "evaluation": {...}}  # 평가자 한 명의 평가 추가/갱신
+      {"op": "prescreen", "id": 0, "prescreen": {...}}  # 사전 검사 결과 기록 (예전 대화, 규칙 변경)
+      {"op": "del", "id": 0}                        # 삭제
+
+    저장/평가/삭제는 파일 끝에 한 줄을 쓰는 것으로 끝나고, 읽기는 마지막으로 읽은 위치 이후만 이어서 읽습니다.
+    쓰기는 {path}.lock 파일 잠금 안에서 최신 상태를 다시 읽은 뒤 수행하므로 여러 프로세스가 동시에 써도
+    ID가 겹치거나 평가가 사라지지 않습니다.
+    죽은 이벤트가 쌓이면 살아있는 레코드만 남기도록 파일을 다시 씁니다(compaction, 원자적 교체).
+    legacy_path에 기존 JSON 배열 파일이 있으면 처음 열 때 한 번만 JSONL로 옮깁니다.
+    ID는 한 번 쓰면 대화를 지워도 다시 쓰지 않습니다. 파일을 다시 쓸 때 지금까지의 최대 ID + 1을 첫 줄의
+    next_id로 남겨, 끝에 있던 대화를 지운 뒤 compaction 해도 다음 대화가 같은 ID를 받지 않습니다.
+    """
+
+    def __init__(self, path, legacy_path=None, compact_min_events=1000, compact_ratio=2.0):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.compact_min_events = compact_min_events
+        self.compact_ratio = compact_ratio
+        self._lock = threading.RLock()
+        self._lock_file = None
+        self._lock_depth = 0
+        # changes()용 추가/삭제 기록 (ID, 삭제는 ~ID). 위치가 곧 cursor이고, 파일을 처음부터 다시 읽어도 이어짐
+        self._change_log = array("q")
+        self._reloading = False
+        self._reset()
+
+    # ---------- 내부 상태 ----------
+    def _reset(self):
+        self._records = {}
+        self._revs = {}
+        self._next_id = 0
+        self._events = 0
+        self._offset = 0
+        self._token = None
+
+    def _apply(self, event):
+        op = event.get("op")
+        rid = event.get("id")
+        if op == "put":
+            if not self._reloading and rid not in self._records:
+                self._change_log.append(rid)
+            self._records[rid] = normalize_evaluations(dict(event.get("record", {}), id=rid))
+            self._revs[rid] = self._events
+            self._next_id = max(self._next_id, rid + 1)
+        elif op == "eval":
+            rec = self._records.get(rid)
+            if rec is not None:
+                evaluation = _versioned(event.get("evaluation", {}))
+                rec["evaluations"] = dict(rec.get("evaluations") or {}, **{evaluation.get("evaluator") or "": evaluation})
+                rec["evaluation"] = evaluation
+                self._revs[rid] = self._events
+        elif op == "prescreen":
+            rec = self._records.get(rid)
+            if rec is not None:
+                rec["prescreen"] = event.get("prescreen")
+        elif op == "del":
+            if not self._reloading and rid in self._records:
+                self._change_log.append(~rid)
+            self._records.pop(rid, None)
+            self._revs.pop(rid, None)
+        self._events += 1
+
+    def _refresh(self):
+        if not os.path.exists(self.path):
+            self._migrate_legacy()
+        if not os.path.exists(self.path):
+            self._change_log.extend(~rid for rid in self._records)
+            self._reset()
+            return
+
+        before = None
+        with open(self.path, "rb") as f:
+            # 첫 줄의 token이 바뀌었으면 다른 곳에서 compaction 된 것이므로 처음부터 다시 읽음
+            header = json.loads(f.readline() or b"{}")
+            token = header.get("token")
+            if token != self._token:
+                before = self._records
+                self._reset()
+                self._token = token
+                self._next_id = header.get("next_id", 0)
+                self._offset = f.tell()
+            f.seek(self._offset)
+            chunk = f.read()
+        # 쓰는 중인 마지막 줄(개행 없음)은 다음에 읽음
+        end = chunk.rfind(b"\n") + 1
+        self._reloading = before is not None
+        try:
+            for line in chunk[:end].splitlines():
+                if line.strip():
+                    self._apply(json.loads(line))
+        finally:
+            self._reloading = False
+        self._offset += end
+        if before is not None:
+            # 다시 읽기 전후의 ID만 비교해 기록 (ID를 다시 쓰지 않으므로 남은 ID의 내용은 그대로)
+            self._change_log.extend(~rid for rid in before if rid not in self._records)
+            self._change_log.extend(rid for rid in self._records if rid not in before)
+
+    @contextmanager
+    def _writing(self):
+        """스레드 잠금 + 프로세스 간 파일 잠금. 안에서 _refresh()를 불러 최신 상태에서 쓰기를 시작합니다."""
+        with self._lock:
+            if self._lock_depth == 0 and fcntl is not None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._lock_file = open(f"{self.path}.lock", "a")
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and self._lock_file is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    def _append(self, events):
+        if not os.path.exists(self.path):
+            self._write_all(self.path, [])
+            self._refresh()
+        data = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in events).encode("utf-8")
+        with open(self.path, "ab") as f:
+            end = f.tell()
+            f.write(data)
+        if end == self._offset:
+            # 잠금 안에서 파일 끝까지 읽은 상태이므로 방금 쓴 줄은 다시 읽지 않고 바로 반영
+            for event in events:
+                self._apply(event)
+            self._offset += len(data)
+        else:
+            self._refresh()
+        self._maybe_compact()
+
+    def _write_all(self, path, records, next_id=0):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        next_id = max([next_id] + [rec["id"] + 1 for rec in records])
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"op": "init", "token": uuid.uuid4().hex, "next_id": next_id}) + "\n")
+            for rec in records:
+                body = {k: v for k, v in rec.items() if k != "id"}
+                f.write(json.dumps({"op": "put", "id": rec["id"], "record": body}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _migrate_legacy(self):
+        if not self.legacy_path or not os.path.exists(self.legacy_path):
+            return
+        with self._writing():
+            if os.path.exists(self.path) or not os.path.exists(self.legacy_path):
+                return
+            with open(self.legacy_path, "r", encoding="utf-8") as f:
+                legacy = json.load(f)
+            self._write_all(self.path, [dict(rec, id=i) for i, rec in enumerate(legacy)])
+            os.replace(self.legacy_path, f"{self.legacy_path}.migrated")
+
+    def _maybe_compact(self):
+        if self._events >= self.compact_min_events and self._events > self.compact_ratio * len(self._records):
+            self.compact()
+
+    # ---------- 공개 API ----------
+    def load(self):
+        with self._lock:
+            self._refresh()
+            return [dict(rec) for rec in self._records.values()]
+
+    def ids(self):
+        with self._lock:
+            self._refresh()
+            return list(self._records.keys())
+
+    def get(self, dialogue_id):
+        with self._lock:
+            self._refresh()
+            rec = self._records.get(dialogue_id)
+            return dict(rec) if rec is not None else None
+
+    def query(self, filters=None, limit=None, offset=0):
+        with self._lock:
+            self._refresh()
+            matched = [rec for rec in self._records.values() if match_filters(rec, filters)]
+        end = None if limit is None else offset + limit
+        return [dict(rec) for rec in matched[offset:end]]
+
+    def iter_query(self, filters=None, chunk_size=500):
+        """query()와 같은 순서의 결과를 chunk_size개씩 나눠 냅니다 (내보내기처럼 전체를 훑을 때)."""
+        with self._lock:
+            self._refresh()
+            matched = [rec for rec in self._records.values() if match_filters(rec, filters)]
+        for start in range(0, len(matched), chunk_size):
+            yield [dict(rec) for rec in matched[start:start + chunk_size]]
+
+    def count(self, filters=None):
+        with self._lock:
+            self._refresh()
+            if not filters:
+                return len(self._records)
+            return sum(1 for rec in self._records.values() if match_filters(rec, filters))
+
+    def version(self):
+        """저장소 내용이 바뀔 때마다 달라지는 값 (캐시 무효화용)."""
+        with self._lock:
+            self._refresh()
+            return f"{self._token}:{self._offset}"
+
+    def changes(self, cursor=None):
+        """
+        cursor 이후 추가/삭제된 대화 ID: {"cursor", "reset", "added", "deleted"} (평가 변경은 포함하지 않음).
+        ID는 다시 쓰지 않으므로 같은 ID의 내용은 바뀌지 않습니다. cursor가 없으면 reset=True와 함께 지금 있는
+        모든 ID를 added로 돌려주므로, 받는 쪽은 처음부터 만듭니다. 다른 곳에서 파일을 다시 써도(compaction) 이어집니다.
+        cursor는 이 저장소 객체 안에서만 유효합니다.
+        """
+        with self._lock:
+            self._refresh()
+            if cursor is None:
+                return {"cursor": len(self._change_log), "reset": True, "added": list(self._records), "deleted": []}
+            log = self._change_log[cursor:]
+            added = [rid for rid in log if rid >= 0 and rid in self._records]
+            deleted = [~rid for rid in log if rid < 0]
+            return {"cursor": cursor + len(log), "reset": False, "added": added, "deleted": deleted}
+
+    def evaluations(self):
+        """
+        평가가 있는 레코드의 [{"id", "rev", "persona", "evaluations"}] 목록.
+        rev는 그 레코드가 추가/평가될 때마다 바뀌는 값이라 바뀐 레코드만 다시 계산할 수 있습니다.
+        """
+        with self._lock:
+            self._refresh()
+            return [
+                {"id": rid, "rev": (self._token, self._revs[rid]), "persona": rec.get("persona") or {},
+                 "evaluations": list(rec["evaluations"].values())}
+                for rid, rec in self._records.items() if rec.get("evaluations")
+            ]
+
+    def content_hashes(self):
+        """저장된 모든 대화의 dialogue_hash 집합."""
+        with self._lock:
+            self._refresh()
+            return {rec.get("content_hash") or dialogue_hash(rec.get("dialogue")) for rec in self._records.values()}
+
+    def add(self, record):
+        with self._writing():
+            self._refresh()
+            rid = self._next_id
+            body = {k: v for k, v in record.items() if k != "id"}
+            self._append([{"op": "put", "id": rid, "record": body}])
+            return rid
+
+    def add_many(self, records):
+        """여러 레코드를 한 번의 잠금과 쓰기로 추가하고 새 ID 목록을 돌려줍니다."""
+        with self._writing():
+            self._refresh()
+            ids = list(range(self._next_id, self._next_id + len(records)))
+            if records:
+                self._append([
+                    {"op": "put", "id": rid, "record": {k: v for k, v in record.items() if k != "id"}}
+                    for rid, record in zip(ids, records)
+                ])
+            return ids
+
+    def update_evaluation(self, dialogue_id, evaluation, expected_version=None):
+        """
+        evaluation["evaluator"]의 평가를 추가/갱신하고 새 버전 번호를 돌려줍니다 (대화가 없으면 None).
+        다른 평가자의 평가는 그대로 남습니다. expected_version이 현재 버전과 다르면 EvaluationConflict.
+        """
+        with self._writing():
+            self._refresh()
+            rec = self._records.get(dialogue_id)
+            if rec is None:
+                return None
+            entry = next_evaluation(rec, evaluation, expected_version, dialogue_id)
+            self._append([{"op": "eval", "id": dialogue_id, "evaluation": entry}])
+            return entry["version"]
+
+    def update_prescreen(self, results):
+        """{대화 ID: 사전 검사 결과}를 기록하고 기록한 대화 수를 돌려줍니다 (그사이 지워진 대화는 건너뜀)."""
+        with self._writing():
+            self._refresh()
+            events = [
+                {"op": "prescreen", "id": rid, "prescreen": result}
+                for rid, result in results.items() if rid in self._records
+            ]
+            if events:
+                self._append(events)
+            return len(events)
+
+    def delete(self, dialogue_id):
+        with self._writing():
+            self._refresh()
+            if dialogue_id not in self._records:
+                return False
+            self._append([{"op": "del", "id": dialogue_id}])
+            return True
+
+    def delete_many(self, dialogue_ids):
+        with self._writing():
+            self._refresh()
+            events = [{"op": "del", "id": rid} for rid in dialogue_ids if rid in self._records]
+            if events:
+                self._append(events)
+            return len(events)
+
+    def delete_last(self):
+        with self._writing():
+            self._refresh()
+            if not self._records:
+                return False
+            return self.delete(next(reversed(self._records)))
+
+    def replace_all(self, records):
+        # 새 레코드도 이전에 쓴 적 없는 ID부터 매김
+        with self._writing():
+            self._refresh()
+            start = self._next_id
+            self._write_all(self.path, [dict(rec, id=start + i) for i, rec in enumerate(records)], next_id=start)
+            # 새 token을 보고 처음부터 다시 읽음 (이전 ID와 비교해 삭제도 기록)
+            self._refresh()
+
+    def compact(self):
+        with self._writing():
+            self._refresh()
+            if not os.path.exists(self.path):
+                return
+            self._write_all(self.path, list(self._records.values()), next_id=self._next_id)
+            self._refresh()
@@ -0,0 +1,110 @@
+import json
+
+SPEAKERS = {"I", "CHATGPT"}
+MAX_PREAMBLE = 40
+
+class StreamAbort(Exception):
+    """스트리밍 중 출력이 명백히 잘못되어 요청을 조기에 중단할 때 발생합니다."""
+
+class TurnStreamParser:
+    """
+    스트리밍으로 들어오는 대화 JSON 배열을 조각 단위로 읽어,
+    turn 객체가 닫힐 때마다 파싱/검증해 돌려줍니다.
+
+    다음과 같은 경우 StreamAbort를 발생시킵니다.
+      - '[' 앞에 JSON이 아닌 머리말이 있음 (```json 코드펜스는 허용)
+      - speaker가 "I"/"CHATGPT"가 아님 (대소문자 무시)
+      - turn이 1로 시작하지 않거나, 줄어들거나, 2 이상 건너뜀
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.turns = []
+        self._pos = 0
+        self._started = False
+        self._closed = False
+        self._obj_start = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def _check_preamble(self):
+        head = self.text.lstrip()
+        if head.startswith("```"):
+            newline = head.find("\n")
+            if newline == -1:
+                if len(head) > MAX_PREAMBLE:
+                    raise StreamAbort("코드펜스 머리말이 너무 깁니다.")
+                return None
+            head = head[newline + 1:].lstrip()
+        if not head:
+            return None
+        if head[0] != "[":
+            raise StreamAbort(f"JSON 배열이 아닌 머리말로 시작합니다: {head[:20]!r}")
+        return len(self.text) - len(head)
+
+    def _validate(self, turn):
+        if not isinstance(turn, dict) or not {"turn", "speaker", "utterance"} <= turn.keys():
+            raise StreamAbort(f"turn 객체 형식이 아닙니다: {turn!r}")
+        if str(turn["speaker"]).upper() not in SPEAKERS:
+            raise StreamAbort(f"잘못된 speaker입니다: {turn['speaker']!r}")
+        try:
+            number = int(turn["turn"])
+        except (TypeError, ValueError):
+            raise StreamAbort(f"turn 번호가 정수가 아닙니다: {turn['turn']!r}")
+        prev = int(self.turns[-1]["turn"]) if self.turns else 0
+        if not self.turns and number != 1:
+            raise StreamAbort(f"첫 turn 번호가 1이 아닙니다: {number}")
+        if number < prev or number > prev + 1:
+            raise StreamAbort(f"turn 번호가 단조 증가하지 않습니다: {prev} → {number}")
+
+    def feed(self, chunk):
+        """새 조각을 넣고, 이번에 완성된 turn 객체 리스트를 돌려줍니다."""
+        self.text += chunk
+        if not self._started:
+            start = self._check_preamble()
+            if start is None:
+                return []
+            self._started = True
+            self._pos = start + 1
+
+        completed = []
+        text = self.text
+        i = self._pos
+        while i < len(text) and not self._closed:
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                if self._depth == 0:
+                    self._obj_start = i
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        turn = json.loads(text[self._obj_start:i + 1])
+                    except ValueError as e:
+                        raise StreamAbort(f"turn 객체를 파싱하지 못했습니다: {e}")
+                    self._validate(turn)
+                    self.turns.append(turn)
+                    completed.append(turn)
+            elif self._depth == 0:
+                if ch == "]":
+                    self._closed = True
+                elif not ch.isspace() and ch != ",":
+                    raise StreamAbort(f"turn 객체 사이에 예상하지 못한 문자가 있습니다: {ch!r}")
+            i += 1
+        self._pos = i
+        return completed
+
+    @property
+    def closed(self):
+        return self._closed
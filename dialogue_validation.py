@@ -0,0 +1,178 @@
+import json
+import re
+import threading
+from collections import Counter
+
+SPEAKERS = ["I", "CHATGPT"]
+OPENING_PHRASE = "들어오세요"
+MAX_REPAIR_RETRIES = 2
+
+_FENCE_RE = re.compile(r"^\s*```[a-zA-Z]*\s*\n?|\n?\s*```\s*$")
+_TRAILING_COMMA_RE = re.compile(r",\s*([\]}])")
+_MISSING_COMMA_RE = re.compile(r"}\s*{")
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "„": '"', "‟": '"'})
+
+class DialogueValidationError(Exception):
+    def __init__(self, issues, text=None):
+        super().__init__("; ".join(issues))
+        self.issues = issues
+        self.text = text
+
+# ---------- 통계 ----------
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+def record_outcome(repaired, retries, failed=False):
+    with _stats_lock:
+        _stats["total"] += 1
+        _stats["retries"] += retries
+        if failed:
+            _stats["failed"] += 1
+        elif retries:
+            _stats["retried"] += 1
+        elif repaired:
+            _stats["repaired"] += 1
+        else:
+            _stats["clean"] += 1
+
+def validation_stats():
+    """
+    clean: 그대로 통과, repaired: 로컬 보정 후 통과, retried: 재요청 후 통과, failed: 재요청 한도 초과
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    total = stats.get("total", 0)
+    stats["repair_rate"] = stats.get("repaired", 0) / total if total else 0.0
+    stats["retry_rate"] = stats.get("retried", 0) / total if total else 0.0
+    return stats
+
+# ---------- 파싱/보정 ----------
+def strip_code_fences(text):
+    return _FENCE_RE.sub("", text.strip())
+
+def _repair_text(text):
+    text = text.translate(_SMART_QUOTES)
+    text = _TRAILING_COMMA_RE.sub(r"\1", text)
+    text = _MISSING_COMMA_RE.sub("},{", text)
+    start = text.find("[")
+    if start == -1:
+        # 배열 괄호 없이 객체만 나열된 경우
+        start = text.find("{")
+        if start == -1:
+            return text
+        text = "[" + text[start:]
+        start = 0
+    text = text[start:]
+    end = text.rfind("]")
+    if end == -1 or text.rfind("}") > end:
+        # 잘린 응답: 마지막으로 완성된 객체까지만 사용
+        last = text.rfind("}")
+        text = text[:last + 1] + "]" if last != -1 else text
+    else:
+        text = text[:end + 1]
+    return text
+
+def parse_dialogue_text(text):
+    """
+    코드펜스를 벗기고 JSON으로 파싱합니다. 실패하면 흔한 결함(스마트 따옴표, 끝 쉼표,
+    객체 사이 쉼표 누락, 배열 앞뒤 잡문, 잘린 끝부분)을 로컬에서 고친 뒤 다시 시도합니다.
+    (dialogue, repaired) 를 돌려줍니다.
+    """
+    stripped = strip_code_fences(text)
+    try:
+        return json.loads(stripped), stripped != text.strip()
+    except ValueError as e:
+        first_error = e
+    try:
+        return json.loads(_repair_text(stripped)), True
+    except ValueError:
+        raise DialogueValidationError([f"JSON 파싱 실패: {first_error}"], text)
+
+def normalize_turns(dialogue):
+    """
+    speaker 대소문자("Chatgpt" → "CHATGPT")와 문자열 turn 번호를 맞추고,
+    speaker가 I/CHATGPT를 번갈아 가는데 turn 번호만 어긋난 경우 번호를 다시 매깁니다.
+    (turns, repaired) 를 돌려줍니다.
+    """
+    if isinstance(dialogue, dict):
+        for key in ("dialogue", "conversation", "turns"):
+            if isinstance(dialogue.get(key), list):
+                dialogue = dialogue[key]
+                break
+    if not isinstance(dialogue, list):
+        return dialogue, False
+
+    repaired = False
+    turns = []
+    for item in dialogue:
+        if not isinstance(item, dict):
+            turns.append(item)
+            continue
+        item = dict(item)
+        speaker = str(item.get("speaker", "")).strip()
+        if speaker.upper() in SPEAKERS and speaker != speaker.upper():
+            item["speaker"] = speaker.upper()
+            repaired = True
+        if isinstance(item.get("turn"), str) and item["turn"].strip().isdigit():
+            item["turn"] = int(item["turn"])
+            repaired = True
+        turns.append(item)
+
+    alternating = all(
+        isinstance(t, dict) and t.get("speaker") == SPEAKERS[i % 2]
+        for i, t in enumerate(turns)
+    )
+    if alternating and any(t.get("turn") != i // 2 + 1 for i, t in enumerate(turns)):
+        for i, t in enumerate(turns):
+            t["turn"] = i // 2 + 1
+        repaired = True
+    return turns, repaired
+
+def validate_turns(turns):
+    """프롬프트가 요구하는 대화 규칙 위반 목록을 돌려줍니다. 빈 리스트면 통과입니다."""
+    if not isinstance(turns, list) or not turns:
+        return ["대화가 비어 있지 않은 JSON 배열이 아닙니다."]
+
+    issues = []
+    for i, t in enumerate(turns):
+        if not isinstance(t, dict) or not {"turn", "speaker", "utterance"} <= t.keys():
+            issues.append(f"{i + 1}번째 항목에 turn/speaker/utterance 키가 없습니다.")
+            continue
+        if t["speaker"] not in SPEAKERS:
+            issues.append(f"{i + 1}번째 항목의 speaker가 \"I\" 또는 \"CHATGPT\"가 아닙니다: {t['speaker']!r}")
+        if not isinstance(t["utterance"], str) or not t["utterance"].strip():
+            issues.append(f"{i + 1}번째 항목의 utterance가 비어 있습니다.")
+    if issues:
+        return issues
+
+    first = turns[0]
+    if first["turn"] != 1 or first["speaker"] != "I" or OPENING_PHRASE not in first["utterance"]:
+        issues.append("첫 발화는 turn 1, speaker \"I\"의 \"환자 분 들어오세요\" 형태여야 합니다.")
+
+    # 같은 turn 번호는 I → CHATGPT 한 쌍, 번호는 1씩 증가 (마지막 turn은 I 한 줄만 있어도 허용)
+    for i in range(0, len(turns), 2):
+        expected = i // 2 + 1
+        pair = turns[i:i + 2]
+        if [t["speaker"] for t in pair] != SPEAKERS[:len(pair)] or any(t["turn"] != expected for t in pair):
+            issues.append(f"turn {expected}이(가) I/CHATGPT 한 쌍으로 구성되어 있지 않거나 번호가 어긋납니다.")
+            break
+    return issues
+
+def validate_and_repair(text):
+    """
+    응답 텍스트 → (turns, repaired). 고칠 수 없는 위반이 있으면 DialogueValidationError.
+    """
+    dialogue, repaired_text = parse_dialogue_text(text)
+    turns, repaired_turns = normalize_turns(dialogue)
+    issues = validate_turns(turns)
+    if issues:
+        raise DialogueValidationError(issues, text)
+    return turns, repaired_text or repaired_turns
+
+def retry_instruction(issues):
+    lines = "\n".join(f"- {issue}" for issue in issues)
+    return (
+        "The previous output violated the rules:\n"
+        f"{lines}\n"
+        "Fix only these problems and output the complete corrected JSON array, with no other text."
+    )
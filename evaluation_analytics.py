@@ -0,0 +1,174 @@
+import re
+import threading
+import pandas as pd
+from rubric import APPROPRIATENESS_QUESTIONS, REALISM_QUESTIONS, RATING_VALUES
+
+# 평가 레코드의 문항별 키: appropriate_q_{id}_{i}, realism_q_{id}_{i}
+_RATING_KEY_RE = re.compile(r"^(appropriate|realism)_q_.+_(\d+)$")
+
+PERSONA_COLUMNS = ["age", "gender", "main_category", "middle_category", "ktas_level"]
+SCORE_COLUMNS = ["question_score", "realism_score"]
+QUESTION_COLUMNS = (
+    [f"appropriate_{i}" for i in range(len(APPROPRIATENESS_QUESTIONS))]
+    + [f"realism_{i}" for i in range(len(REALISM_QUESTIONS))]
+)
+QUESTION_LABELS = dict(zip(
+    QUESTION_COLUMNS,
+    [("적절성", q) for q, _ in APPROPRIATENESS_QUESTIONS] + [("현실성", q) for q, _ in REALISM_QUESTIONS]
+))
+FRAME_COLUMNS = ["id", "evaluator"] + PERSONA_COLUMNS + SCORE_COLUMNS + QUESTION_COLUMNS
+
+def evaluation_rows(item):
+    """저장소의 평가 항목 하나({"id", "persona", "evaluations"})를 평가자별 행 목록으로 바꿉니다."""
+    rows = []
+    persona = item.get("persona") or {}
+    for evaluation in item.get("evaluations") or []:
+        row = {
+            "id": item["id"],
+            "evaluator": evaluation.get("evaluator") or "",
+            "question_score": evaluation.get("question"),
+            "realism_score": evaluation.get("realism"),
+        }
+        row.update({col: persona.get(col) for col in PERSONA_COLUMNS})
+        for key, value in evaluation.items():
+            m = _RATING_KEY_RE.match(key)
+            if m and value in RATING_VALUES:
+                row[f"{m[1]}_{m[2]}"] = RATING_VALUES[value]
+        rows.append(row)
+    return rows
+
+class EvaluationFrame:
+    """
+    저장소의 모든 평가를 (대화, 평가자) 한 행, 문항 한 열의 DataFrame으로 모읍니다.
+    문항 값은 그렇다=1, 보통이다=0, 그렇지 않다=-1입니다.
+
+    저장소 version이 그대로면 이전 결과를 돌려주고, 바뀌었으면 rev가 달라진 레코드만
+    다시 변환합니다. 분석 결과도 version별로 한 번만 계산합니다.
+    """
+
+    def __init__(self, load_version, load_items):
+        self._load_version = load_version
+        self._load_items = load_items
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._version = None
+        self._frame = pd.DataFrame(columns=FRAME_COLUMNS)
+        self._results = {}
+        self.rebuilt = 0
+
+    def frame(self):
+        version = self._load_version()
+        with self._lock:
+            if version != self._version:
+                rows = {}
+                rebuilt = 0
+                for item in self._load_items():
+                    cached = self._rows.get(item["id"])
+                    if cached is None or cached[0] != item["rev"]:
+                        cached = (item["rev"], evaluation_rows(item))
+                        rebuilt += 1
+                    rows[item["id"]] = cached
+                self._rows = rows
+                self._frame = pd.DataFrame(
+                    [row for _, item_rows in rows.values() for row in item_rows],
+                    columns=FRAME_COLUMNS
+                )
+                self._version = version
+                self._results = {}
+                self.rebuilt = rebuilt
+            return self._frame
+
+    def result(self, name, func, *args):
+        """func(frame, *args)를 현재 version에 대해 한 번만 계산합니다."""
+        df = self.frame()
+        key = (name,) + args
+        with self._lock:
+            if key not in self._results:
+                self._results[key] = func(df, *args)
+            return self._results[key]
+
+# ---------- 분석 ----------
+def question_agreement(df):
+    """문항별 응답 수, 그렇다/보통이다/그렇지 않다 비율, 평균(-1~1)."""
+    q = df[QUESTION_COLUMNS].astype(float)
+    n = q.notna().sum()
+    result = pd.DataFrame({
+        "영역": [QUESTION_LABELS[c][0] for c in QUESTION_COLUMNS],
+        "문항": [QUESTION_LABELS[c][1] for c in QUESTION_COLUMNS],
+        "응답 수": n,
+        "그렇다": q.eq(1).sum() / n,
+        "보통이다": q.eq(0).sum() / n,
+        "그렇지 않다": q.eq(-1).sum() / n,
+        "평균": q.mean(),
+    }, index=QUESTION_COLUMNS)
+    return result
+
+def score_summary(df, by):
+    """by(예: ktas_level, main_category)별 적절성/현실성 점수의 건수, 평균, 표준편차, 중앙값."""
+    scores = df[[by] + SCORE_COLUMNS].dropna(subset=SCORE_COLUMNS, how="all")
+    summary = scores.groupby(by, dropna=False)[SCORE_COLUMNS].agg(["count", "mean", "std", "median"])
+    summary.columns = [f"{score}_{stat}" for score, stat in summary.columns]
+    return summary
+
+def score_distribution(df, by, score):
+    """by별 점수(0~10) 분포 (행마다 합이 1인 비율)."""
+    scores = df[[by, score]].dropna()
+    if scores.empty:
+        return pd.DataFrame()
+    return pd.crosstab(scores[by], scores[score].astype(int), normalize="index")
+
+def evaluator_bias(df):
+    """
+    평가자별 평균 점수와 전체 평균과의 차이.
+    같은 대화를 여러 명이 평가한 경우에는 대화별 평균과의 차이(짝 비교 편향)도 계산합니다.
+    """
+    scores = df[["id", "evaluator"] + SCORE_COLUMNS].dropna(subset=SCORE_COLUMNS, how="all")
+    scores = scores[scores["evaluator"] != ""]
+    if scores.empty:
+        return pd.DataFrame()
+    grouped = scores.groupby("evaluator")
+    result = pd.DataFrame({"평가 수": grouped.size()})
+    for score in SCORE_COLUMNS:
+        result[f"{score}_mean"] = grouped[score].mean()
+        result[f"{score}_bias"] = result[f"{score}_mean"] - scores[score].mean()
+
+    shared = scores[scores.groupby("id")["id"].transform("size") >= 2]
+    if not shared.empty:
+        for score in SCORE_COLUMNS:
+            centered = shared[score] - shared.groupby("id")[score].transform("mean")
+            result[f"{score}_paired_bias"] = centered.groupby(shared["evaluator"]).mean()
+    return result.sort_values("평가 수", ascending=False)
+
+def inter_rater_agreement(df):
+    """
+    둘 이상이 평가한 대화에 대해 문항별 관찰 일치율과 Fleiss' kappa를 계산합니다.
+    (대화마다 평가자 수가 달라도 되는 일반화된 식을 사용합니다.)
+    """
+    shared = df[df.groupby("id")["id"].transform("size") >= 2]
+    if shared.empty:
+        return pd.DataFrame()
+
+    long = shared.melt(id_vars="id", value_vars=QUESTION_COLUMNS, var_name="question", value_name="rating").dropna()
+    # (대화, 문항)별 범주 빈도 n_ij
+    counts = long.groupby(["question", "id"])["rating"].value_counts().unstack(fill_value=0)
+    n = counts.sum(axis=1)
+    counts, n = counts[n >= 2], n[n >= 2]
+    if counts.empty:
+        return pd.DataFrame()
+
+    p_i = (counts.pow(2).sum(axis=1) - n) / (n * (n - 1))
+    by_question = p_i.groupby(level="question")
+    observed = by_question.mean()
+    p_j = counts.groupby(level="question").sum().div(n.groupby(level="question").sum(), axis=0)
+    expected = p_j.pow(2).sum(axis=1)
+    kappa = (observed - expected) / (1 - expected).where(expected < 1)
+
+    result = pd.DataFrame({
+        "영역": [QUESTION_LABELS[c][0] for c in observed.index],
+        "문항": [QUESTION_LABELS[c][1] for c in observed.index],
+        "대화 수": by_question.size(),
+        "관찰 일치율": observed,
+        "우연 일치율": expected,
+        "Fleiss κ": kappa,
+    })
+    return result.reindex([c for c in QUESTION_COLUMNS if c in result.index])
@@ -0,0 +1,83 @@
+import streamlit as st
+from utils import dialogues_version, load_evaluations
+from own_dialogue_list import own_dialogues_version, load_own_evaluations
+from evaluation_analytics import (
+    EvaluationFrame, question_agreement, score_summary, score_distribution, evaluator_bias, inter_rater_agreement
+)
+
+SOURCES = {
+    "생성한 대화": (dialogues_version, load_evaluations),
+    "자체 대화": (own_dialogues_version, load_own_evaluations),
+}
+GROUP_BY = {"KTAS 레벨": "ktas_level", "대분류": "main_category", "나이": "age", "성별": "gender"}
+SCORE_LABELS = {"question_score": "적절성", "realism_score": "현실성"}
+STAT_LABELS = {"count": "건수", "mean": "평균", "std": "표준편차", "median": "중앙값",
+               "bias": "편향", "paired_bias": "짝 비교 편향"}
+
+@st.cache_resource(show_spinner=False)
+def _evaluation_frames():
+    # 프로세스 전체에서 공유: 저장소가 바뀌지 않았으면 다시 계산하지 않음
+    return {name: EvaluationFrame(*loaders) for name, loaders in SOURCES.items()}
+
+def _korean_columns(df):
+    renamed = {}
+    for col in df.columns:
+        for score, score_label in SCORE_LABELS.items():
+            if isinstance(col, str) and col.startswith(score + "_"):
+                stat = col[len(score) + 1:]
+                renamed[col] = f"{score_label} {STAT_LABELS.get(stat, stat)}"
+    return df.rename(columns=renamed)
+
+def evaluation_dashboard_tab():
+    st.header("[평가 분석]")
+
+    source = st.radio("대상", list(SOURCES), horizontal=True, key="analytics_source")
+    frames = _evaluation_frames()[source]
+    df = frames.frame()
+    if df.empty:
+        st.info("아직 저장된 평가가 없습니다.")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("평가 수", f"{len(df):,}")
+    col2.metric("평가된 대화 수", f"{df['id'].nunique():,}")
+    col3.metric("평가자 수", f"{df.loc[df['evaluator'] != '', 'evaluator'].nunique():,}")
+    st.caption(f"마지막 갱신에서 다시 계산한 레코드 {frames.rebuilt:,}건")
+
+    st.subheader("문항별 응답 비율")
+    agreement = frames.result("question_agreement", question_agreement)
+    st.dataframe(
+        agreement.style.format({"그렇다": "{:.0%}", "보통이다": "{:.0%}", "그렇지 않다": "{:.0%}", "평균": "{:+.2f}"}),
+        use_container_width=True,
+        hide_index=True
+    )
+    st.bar_chart(agreement.set_index("문항")[["그렇다", "보통이다", "그렇지 않다"]])
+
+    st.subheader("점수 분포")
+    group_label = st.selectbox("분류 기준", list(GROUP_BY), key="analytics_group_by")
+    by = GROUP_BY[group_label]
+    summary = frames.result("score_summary", score_summary, by)
+    st.dataframe(_korean_columns(summary).rename_axis(group_label), use_container_width=True)
+    score = st.radio("점수", list(SCORE_LABELS), format_func=SCORE_LABELS.get, horizontal=True, key="analytics_score")
+    distribution = frames.result("score_distribution", score_distribution, by, score)
+    if not distribution.empty:
+        st.bar_chart(distribution.T.rename_axis(f"{SCORE_LABELS[score]} 점수"))
+
+    st.subheader("평가자별 편향")
+    bias = frames.result("evaluator_bias", evaluator_bias)
+    if bias.empty:
+        st.info("평가자 이름이 기록된 평가가 없습니다.")
+    else:
+        st.dataframe(_korean_columns(bias).rename_axis("평가자"), use_container_width=True)
+        st.caption("편향: 평가자 평균 − 전체 평균, 짝 비교 편향: 같은 대화를 평가한 다른 평가자들의 평균과의 차이")
+
+    st.subheader("평가자 간 일치도")
+    irr = frames.result("inter_rater_agreement", inter_rater_agreement)
+    if irr.empty:
+        st.info("둘 이상의 평가자가 평가한 대화가 없습니다.")
+    else:
+        st.dataframe(
+            irr.style.format({"관찰 일치율": "{:.0%}", "우연 일치율": "{:.0%}", "Fleiss κ": "{:.2f}"}),
+            use_container_width=True,
+            hide_index=True
+        )
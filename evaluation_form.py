@@ -0,0 +1,212 @@
+import json
+import streamlit as st
+from rubric import (
+    APPROPRIATENESS_QUESTIONS, REALISM_QUESTIONS, RATING_OPTIONS, DEFAULT_RATING,
+    calculate_score, ratings_map
+)
+from dialogue_store import EvaluationConflict, is_judge
+from prescreen import describe as describe_prescreen
+
+# st.fragment가 없는 이전 버전에서는 일반 함수로 동작 (저장 시 전체 페이지가 다시 실행됨)
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+def evaluator_name_input(key_prefix):
+    """
+    평가 탭 위쪽의 평가자 이름 입력. 탭을 옮겨도 유지되도록 세션에 따로 보관하며,
+    각 대화의 평가 폼은 이 평가자의 평가를 불러오고 저장합니다.
+    """
+    name = st.text_input(
+        "평가자 이름 또는 ID",
+        value=st.session_state.get("evaluator_name", ""),
+        key=f"{key_prefix}evaluator_name",
+        placeholder="예: hong_gildong"
+    ).strip()
+    st.session_state["evaluator_name"] = name
+    return name
+
+def _judge_reasons(name, evaluation):
+    label = f"{name} 근거 (최저 확신도 {evaluation.get('confidence', 0):.0%})"
+    if evaluation.get("review"):
+        label += " · 검토 필요"
+    low = set(evaluation.get("low_confidence") or [])
+    reasons = evaluation.get("reasons") or {}
+    with st.expander(label, expanded=False):
+        for key, reason in reasons.items():
+            group, _, i = key.partition("_q_")
+            questions = APPROPRIATENESS_QUESTIONS if group == "appropriate" else REALISM_QUESTIONS
+            question = questions[int(i.rsplit("_", 1)[1])][0]
+            mark = " ⚠️" if key in low else ""
+            st.markdown(f"- {question} **{evaluation.get(key, '-')}**{mark}: {reason}")
+
+def judge_controls(key_prefix, query, save, filters=None):
+    """
+    'LLM 자동 평가' 영역. filters에 맞는 대화 중 아직 자동 평가가 없는 대화(다시 채점을 고르면 전부)를
+    동시에 채점해 save(id, question, realism, evaluator, ratings=...)로 저장합니다.
+    """
+    from llm_judge import JUDGE_EVALUATOR, REVIEW_CONFIDENCE, DEFAULT_CONCURRENCY, MAX_CONCURRENCY, judge_batch, pending
+
+    with st.expander("LLM 자동 평가", expanded=False):
+        st.caption(
+            f"같은 문항과 척도로 LLM이 채점해 '{JUDGE_EVALUATOR}' 평가자로 저장합니다. "
+            f"확신도가 {REVIEW_CONFIDENCE:.0%} 미만인 문항이 있거나 사람 평가와 점수 차이가 크면 조회 조건의 '검토 필요'에 표시됩니다."
+        )
+        c1, c2, c3 = st.columns(3)
+        with c1:
+            concurrency = st.slider("동시 요청 수", 1, MAX_CONCURRENCY, DEFAULT_CONCURRENCY, key=f"{key_prefix}judge_concurrency")
+        with c2:
+            limit = st.number_input("최대 대화 수", min_value=1, max_value=100000, value=100, step=50, key=f"{key_prefix}judge_limit")
+        with c3:
+            force = st.checkbox("이미 자동 평가한 대화도 다시 채점", key=f"{key_prefix}judge_force")
+
+        if st.button("자동 평가 실행", key=f"{key_prefix}judge_run"):
+            records = pending(query, filters, limit=int(limit), force=force)
+            if not records:
+                st.info("조회 조건에 맞는 대화 중 자동 평가할 대화가 없습니다.")
+                return
+            progress = st.progress(0.0, text=f"0/{len(records)}")
+            report = judge_batch(
+                records,
+                lambda rid, ev: save(rid, ev["question"], ev["realism"], ev["evaluator"], ratings=ev),
+                concurrency=concurrency,
+                on_progress=lambda done, total, item: progress.progress(done / total, text=f"{done}/{total}"),
+                use_cache=not force
+            )
+            progress.empty()
+            st.success(
+                f"{report['succeeded']}/{report['total']}개 대화를 채점했습니다. "
+                f"(검토 필요 {report['review']}개, 캐시 {report['cache_hits']}개, 소요 시간 {report['elapsed']:.1f}초)"
+            )
+            if report["failed"]:
+                st.warning(f"{len(report['failed'])}개 대화는 채점하지 못했습니다.")
+                st.dataframe(
+                    [{"대화": it["id"] + 1, "오류": it["error"]} for it in report["failed"]],
+                    use_container_width=True,
+                    hide_index=True
+                )
+
+def _question_rows(questions, key_fmt, idx, evaluation, widget_prefix):
+    eval_cols = st.columns([0.6, 0.4])
+    with eval_cols[0]:
+        st.markdown("**질문**")
+    with eval_cols[1]:
+        st.markdown("**평가**")
+
+    ratings = []
+    for i, (q, help_text) in enumerate(questions):
+        question_key = key_fmt.format(idx=idx, i=i)
+        current_rating = evaluation.get(question_key, DEFAULT_RATING)
+
+        cols = st.columns([0.6, 0.4])
+        with cols[0]:
+            safe_help = help_text.replace('"', '&quot;').replace("\n", "&#10;")
+            st.markdown(
+                f'<span style="text-decoration: none; color: inherit;">{q}</span><span title="{safe_help}" style="cursor: help; margin-left: 6px;">ⓘ</span>',
+                unsafe_allow_html=True,
+            )
+        with cols[1]:
+            radio_val = st.radio(
+                "",
+                options=RATING_OPTIONS,
+                index=RATING_OPTIONS.index(current_rating),
+                key=f"{widget_prefix}{question_key}_radio",
+                label_visibility="hidden",
+                horizontal=True
+            )
+        ratings.append(radio_val)
+    return ratings
+
+@_fragment
+def dialogue_evaluation_section(entry, idx, save, key_prefix="", anchor_prefix="", code_view=False, evaluator=""):
+    """
+    대화 하나의 내용과 evaluator의 평가 폼을 그립니다.
+    fragment로 실행되므로 "결과 저장"을 눌러도 이 대화 영역만 다시 실행되고,
+    save(idx, question, realism, evaluator, ratings, expected_version)로 이 평가자의 평가 하나만 저장합니다.
+    같은 평가자의 평가가 폼을 불러온 뒤 다른 곳에서 먼저 저장되었으면 덮어쓰지 않고 알려 줍니다.
+    """
+    evaluations = entry.get("evaluations") or {}
+    evaluation = evaluations.get(evaluator, {}) if evaluator else {}
+    widget_prefix = f"{key_prefix}{evaluator}_"
+    version_key = f"{widget_prefix}eval_version_{idx}"
+    conflict_key = f"{widget_prefix}eval_conflict_{idx}"
+    # 이 세션에서 저장한 적이 있으면 그때 받은 버전, 아니면 불러온 평가의 버전을 기준으로 저장
+    expected_version = st.session_state.get(version_key, evaluation.get("version", 0))
+
+    st.markdown(f'<a name="{anchor_prefix}대화-{idx+1}"></a>', unsafe_allow_html=True)
+    st.subheader(f"대화 {idx+1}")
+    prescreen = entry.get("prescreen")
+    if prescreen and not prescreen.get("passed"):
+        st.warning(f"사전 검사 문제: {describe_prescreen(prescreen)}")
+    elif prescreen:
+        st.caption(f"사전 검사 통과: {describe_prescreen(prescreen)}")
+
+    # 2개 컬럼 생성: 왼쪽에 대화 내용, 오른쪽에 평가 항목
+    col1, col2 = st.columns([1, 1])
+
+    with col1:
+        st.markdown("### 대화내용")
+        dlg = entry.get("dialogue", {})
+        if not code_view:
+            st.json(dlg)
+        elif isinstance(dlg, (dict, list)):
+            pretty = json.dumps(dlg, ensure_ascii=False, indent=2)
+            st.code(pretty, language="json")
+        else:
+            st.code(str(dlg))
+
+    with col2:
+        st.markdown("### 평가항목")
+
+        others = [
+            f"{name} (적절성 {e.get('question', '-')}, 현실성 {e.get('realism', '-')})"
+            for name, e in evaluations.items() if name and name != evaluator
+        ]
+        if others:
+            st.caption("다른 평가자: " + " · ".join(others))
+        for name, e in evaluations.items():
+            if name != evaluator and is_judge(e):
+                _judge_reasons(name, e)
+
+        with st.form(f"{key_prefix}eval_form_{idx}"):
+            # 대화의 적절성 평가
+            st.markdown("**대화의 적절성**")
+            appropriate_ratings = _question_rows(APPROPRIATENESS_QUESTIONS, "appropriate_q_{idx}_{i}", idx, evaluation, widget_prefix)
+
+            # 대화의 현실성 평가
+            st.markdown("**대화의 현실성**")
+            realism_ratings = _question_rows(REALISM_QUESTIONS, "realism_q_{idx}_{i}", idx, evaluation, widget_prefix)
+
+            st.caption(f"평가자: {evaluator}" if evaluator else "위쪽에 평가자 이름/ID를 입력하면 저장할 수 있습니다.")
+            submitted = st.form_submit_button("결과 저장")
+
+            if submitted:
+                if not evaluator:
+                    st.error("평가자 이름/ID를 입력해주세요.")
+                else:
+                    try:
+                        version = save(
+                            idx,
+                            calculate_score(appropriate_ratings),
+                            calculate_score(realism_ratings),
+                            evaluator,
+                            ratings=ratings_map(idx, appropriate_ratings, realism_ratings),
+                            expected_version=expected_version
+                        )
+                    except EvaluationConflict:
+                        st.session_state[conflict_key] = True
+                    else:
+                        st.session_state[version_key] = version
+                        st.session_state.pop(conflict_key, None)
+                        st.success(f"평가가 성공적으로 저장되었습니다.")
+
+        if st.session_state.get(conflict_key):
+            st.warning("같은 평가자 이름으로 다른 곳에서 이 대화의 평가를 먼저 저장했습니다. 최신 평가를 불러온 뒤 다시 저장하세요.")
+            if st.button("최신 평가 불러오기", key=f"{widget_prefix}eval_reload_{idx}"):
+                radio_keys = [
+                    f"{widget_prefix}{fmt.format(idx=idx, i=i)}_radio"
+                    for fmt, questions in [("appropriate_q_{idx}_{i}", APPROPRIATENESS_QUESTIONS),
+                                           ("realism_q_{idx}_{i}", REALISM_QUESTIONS)]
+                    for i in range(len(questions))
+                ]
+                for k in radio_keys + [version_key, conflict_key]:
+                    st.session_state.pop(k, None)
+                st.rerun()
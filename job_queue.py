@@ -0,0 +1,440 @@
+"""
+대량 생성 작업 큐 (SQLite). 생성할 페르소나를 작업(job)의 항목으로 먼저 기록해 두고,
+작업자가 항목을 빌려(lease) 생성한 뒤 대화 저장소에 저장하면서 항목별 상태를 남깁니다.
+
+  항목 상태: pending → leased → saving → done
+                        ↘ (실패) pending(재시도 대기) 또는 failed(MAX_ATTEMPTS번 실패/재시도 불가)
+
+  - 항목마다 status, attempts, last_error, output_id(저장된 대화 ID)를 기록
+  - 빌린 항목은 LEASE_SECONDS 동안 그 작업자 것이고, 작업자는 진행 중인 항목의 임대를 계속 연장함
+    작업자가 죽으면 임대가 끝난 항목을 다른 작업자(또는 다시 실행한 작업자)가 이어서 처리
+  - 저장 직전에 saving으로 바꾸고, 저장한 대화에는 job 필드({"id", "item"})를 남김
+    saving 상태로 임대가 끝난 항목은 다시 생성하지 않고 저장소에서 그 대화를 찾아 done으로 처리
+  - 여러 작업자 프로세스가 같은 큐를 함께 처리할 수 있음 (BEGIN IMMEDIATE로 항목을 나눠 빌림)
+    다른 컴퓨터의 작업자는 파일 잠금이 제대로 동작하는 공유 파일 시스템에서만 같은 큐를 쓸 수 있음
+  - 항목별 variant는 작업을 만들 때 정하므로 다시 실행해도 같은 응답 캐시 키를 사용
+
+    python job_queue.py status                    # 작업별 진행 상황
+    python job_queue.py work --job ID --concurrency 8   # 작업자 하나 실행 (여러 개 실행 가능)
+    python job_queue.py retry ID                  # 실패한 항목을 다시 대기 상태로
+"""
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import contextmanager
+
+JOBS_PATH = os.environ.get("JOB_QUEUE_PATH", "data/jobs.db")
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 3
+# 실패한 항목은 RETRY_BACKOFF * 2^(시도 횟수-1)초 뒤에 다시 빌릴 수 있음 (최대 MAX_RETRY_BACKOFF)
+RETRY_BACKOFF = 10.0
+MAX_RETRY_BACKOFF = 600.0
+STATUSES = ["pending", "leased", "saving", "done", "failed"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    label TEXT,
+    created_at REAL NOT NULL,
+    use_cache INTEGER NOT NULL DEFAULT 1,
+    total INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    persona TEXT NOT NULL,
+    variant INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    lease_owner TEXT,
+    lease_expires REAL,
+    available_at REAL NOT NULL DEFAULT 0,
+    output_id INTEGER,
+    updated_at REAL,
+    PRIMARY KEY (job_id, idx)
+);
+CREATE INDEX IF NOT EXISTS idx_job_items_status ON job_items(status, available_at);
+CREATE INDEX IF NOT EXISTS idx_job_items_owner ON job_items(lease_owner);
+"""
+
+# 빌릴 수 있는 항목: 대기 중이면서 재시도 시각이 지났거나, 다른 작업자의 임대가 끝난 항목
+_LEASABLE = "((i.status = 'pending' AND i.available_at <= :now) OR (i.status IN ('leased', 'saving') AND i.lease_expires < :now))"
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+def _backoff(attempts):
+    return min(MAX_RETRY_BACKOFF, RETRY_BACKOFF * 2 ** max(0, attempts - 1))
+
+class JobQueue:
+    def __init__(self, path=JOBS_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._ready = False
+
+    def _setup(self):
+        with self._lock:
+            if self._ready:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with self._open() as conn:
+                conn.executescript(SCHEMA)
+            self._ready = True
+
+    @contextmanager
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _connect(self):
+        if not self._ready:
+            self._setup()
+        return self._open()
+
+    # ---------- 작업 ----------
+    def create_job(self, personas, variants, label="", use_cache=True):
+        """페르소나 목록(과 항목별 variant)으로 작업을 만들고 작업 ID를 돌려줍니다."""
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, label, created_at, use_cache, total) VALUES (?, ?, ?, ?, ?)",
+                (job_id, label, now, int(bool(use_cache)), len(personas))
+            )
+            conn.executemany(
+                "INSERT INTO job_items (job_id, idx, persona, variant, updated_at) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (job_id, i, json.dumps(persona, ensure_ascii=False), variant, now)
+                    for i, (persona, variant) in enumerate(zip(personas, variants))
+                ]
+            )
+        return job_id
+
+    def jobs(self):
+        """[{"id", "label", "created_at", "total", "counts": {상태: 개수}}] (최근 작업부터)."""
+        if not os.path.exists(self.path):
+            # 목록을 보여 주기만 해서는 DB 파일을 만들지 않음
+            return []
+        with self._connect() as conn:
+            jobs = [
+                {"id": jid, "label": label, "created_at": created, "total": total, "counts": dict.fromkeys(STATUSES, 0)}
+                for jid, label, created, total in conn.execute(
+                    "SELECT id, label, created_at, total FROM jobs ORDER BY created_at DESC"
+                )
+            ]
+            by_id = {job["id"]: job for job in jobs}
+            for jid, status, count in conn.execute("SELECT job_id, status, COUNT(*) FROM job_items GROUP BY job_id, status"):
+                by_id[jid]["counts"][status] = count
+        return jobs
+
+    def job(self, job_id):
+        return next((job for job in self.jobs() if job["id"] == job_id), None)
+
+    def items(self, job_id, status=None):
+        sql = (
+            "SELECT idx, persona, variant, status, attempts, last_error, output_id FROM job_items "
+            "WHERE job_id = ?" + (" AND status = ?" if status else "") + " ORDER BY idx"
+        )
+        with self._connect() as conn:
+            rows = conn.execute(sql, (job_id, status) if status else (job_id,)).fetchall()
+        return [
+            {"idx": idx, "persona": json.loads(persona), "variant": variant, "status": st, "attempts": attempts,
+             "last_error": error, "output_id": output_id}
+            for idx, persona, variant, st, attempts, error, output_id in rows
+        ]
+
+    def retry_failed(self, job_id):
+        """실패한 항목을 시도 횟수 0의 대기 상태로 되돌리고 그 개수를 돌려줍니다."""
+        with self._lock, self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE job_items SET status = 'pending', attempts = 0, available_at = 0, updated_at = ? "
+                "WHERE job_id = ? AND status = 'failed'",
+                (time.time(), job_id)
+            )
+            return cur.rowcount
+
+    def next_available(self, job_id=None):
+        """아직 빌릴 수 없는 대기 항목 중 가장 이른 재시도 시각 (없으면 None)."""
+        sql = "SELECT MIN(available_at) FROM job_items WHERE status = 'pending'" + (" AND job_id = ?" if job_id else "")
+        with self._connect() as conn:
+            return conn.execute(sql, (job_id,) if job_id else ()).fetchone()[0]
+
+    # ---------- 작업자 ----------
+    def lease(self, owner, limit, job_id=None, lease_seconds=LEASE_SECONDS):
+        """
+        빌릴 수 있는 항목을 limit개까지 owner에게 빌려주고 돌려줍니다.
+        항목의 recovering은 저장 중(saving)에 임대가 끝난 항목이라 저장소에 이미 저장되었을 수 있다는 뜻입니다.
+        """
+        if limit <= 0:
+            return []
+        now = time.time()
+        job_sql = " AND job_id = :job" if job_id else ""
+        item_job_sql = " AND i.job_id = :job" if job_id else ""
+        params = {"now": now, "job": job_id, "limit": limit, "max": MAX_ATTEMPTS}
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # 생성 중에 임대가 끝나기를 MAX_ATTEMPTS번 반복한 항목은 더 빌려주지 않음 (작업자를 죽이는 항목)
+            conn.execute(
+                "UPDATE job_items SET status = 'failed', lease_owner = NULL, updated_at = :now, "
+                "last_error = COALESCE(last_error, '작업자가 응답하지 않음') "
+                f"WHERE status = 'leased' AND lease_expires < :now AND attempts >= :max{job_sql}",
+                params
+            )
+            rows = conn.execute(
+                "SELECT i.job_id, i.idx, i.persona, i.variant, i.status, i.attempts, j.use_cache "
+                f"FROM job_items i JOIN jobs j ON j.id = i.job_id WHERE {_LEASABLE}{item_job_sql} "
+                "ORDER BY j.created_at, i.idx LIMIT :limit",
+                params
+            ).fetchall()
+            conn.executemany(
+                "UPDATE job_items SET status = 'leased', attempts = attempts + ?, lease_owner = ?, lease_expires = ?, "
+                "updated_at = ? WHERE job_id = ? AND idx = ?",
+                [(0 if status == "saving" else 1, owner, now + lease_seconds, now, jid, idx) for jid, idx, _, _, status, _, _ in rows]
+            )
+        return [
+            {"job_id": jid, "idx": idx, "persona": json.loads(persona), "variant": variant,
+             "attempts": attempts + (0 if status == "saving" else 1), "use_cache": bool(use_cache),
+             "recovering": status == "saving"}
+            for jid, idx, persona, variant, status, attempts, use_cache in rows
+        ]
+
+    def renew(self, owner, keys, lease_seconds=LEASE_SECONDS):
+        """owner가 처리 중인 항목(keys: [(job_id, idx)])의 임대를 연장합니다."""
+        if not keys:
+            return
+        expires = time.time() + lease_seconds
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "UPDATE job_items SET lease_expires = ? WHERE job_id = ? AND idx = ? AND lease_owner = ? "
+                "AND status IN ('leased', 'saving')",
+                [(expires, jid, idx, owner) for jid, idx in keys]
+            )
+
+    def mark_saving(self, owner, key):
+        """저장 직전 표시. 임대를 잃었으면(다른 작업자가 가져감) False이고 결과를 저장하면 안 됩니다."""
+        with self._lock, self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE job_items SET status = 'saving', updated_at = ? "
+                "WHERE job_id = ? AND idx = ? AND lease_owner = ? AND status = 'leased'",
+                (time.time(), key[0], key[1], owner)
+            )
+            return cur.rowcount > 0
+
+    def complete(self, key, output_id):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE job_items SET status = 'done', output_id = ?, last_error = NULL, lease_owner = NULL, "
+                "lease_expires = NULL, updated_at = ? WHERE job_id = ? AND idx = ? AND status != 'done'",
+                (output_id, time.time(), key[0], key[1])
+            )
+
+    def fail(self, owner, key, error, retry=True):
+        """
+        실패를 기록합니다. retry이고 시도 횟수가 MAX_ATTEMPTS 미만이면 재시도 대기(pending), 아니면 failed.
+        돌려주는 값은 새 상태입니다 (임대를 잃었으면 None).
+        """
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT attempts FROM job_items WHERE job_id = ? AND idx = ? AND lease_owner = ? "
+                "AND status IN ('leased', 'saving')",
+                (key[0], key[1], owner)
+            ).fetchone()
+            if row is None:
+                return None
+            status = "pending" if retry and row[0] < MAX_ATTEMPTS else "failed"
+            conn.execute(
+                "UPDATE job_items SET status = ?, last_error = ?, available_at = ?, lease_owner = NULL, "
+                "lease_expires = NULL, updated_at = ? WHERE job_id = ? AND idx = ?",
+                (status, error, now + _backoff(row[0]), now, key[0], key[1])
+            )
+            return status
+
+    def release(self, owner):
+        """owner가 빌린 채 생성 중인 항목을 대기 상태로 돌려놓습니다 (작업자를 멈출 때, 시도 횟수도 되돌림)."""
+        with self._lock, self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE job_items SET status = 'pending', attempts = MAX(0, attempts - 1), lease_owner = NULL, "
+                "lease_expires = NULL, updated_at = ? WHERE lease_owner = ? AND status = 'leased'",
+                (time.time(), owner)
+            )
+            return cur.rowcount
+
+def find_saved(item):
+    """저장 중에 멈춘 항목이 저장소에 이미 저장되었으면 그 대화 ID (같은 페르소나의 대화에서 job 필드로 찾음)."""
+    from utils import query_dialogues, persona_filters
+    marker = {"id": item["job_id"], "item": item["idx"]}
+    for record in query_dialogues(persona_filters(item["persona"])):
+        if record.get("job") == marker:
+            return record["id"]
+    return None
+
+def run_worker(queue, job_id=None, concurrency=4, on_progress=None, generate=None, save=None,
+               lease_seconds=LEASE_SECONDS, max_items=None, owner=None, should_stop=None):
+    """
+    큐의 항목을 빌려 동시에 concurrency개씩 생성하고 저장합니다. 빌릴 항목이 없으면 끝납니다
+    (재시도 대기 중인 항목이 있으면 그 시각까지 기다림).
+
+    - job_id: 이 작업의 항목만 (None이면 모든 작업)
+    - on_progress(event): 항목 하나가 끝날 때마다 {"job_id", "idx", "persona", "status", "error", "output_id"}
+      status는 done, recovered(이미 저장되어 있던 항목), retry, failed, lost(임대를 잃어 버린 결과)
+    - generate/save: 기본값은 utils.generate_conversation / utils.save_conversation_json
+    - max_items: 이 작업자가 빌릴 최대 항목 수, should_stop(): True를 돌려주면 새 항목을 더 빌리지 않음
+
+    저장은 호출한 스레드에서 한 건씩 수행합니다 (generate_batch와 같은 방식).
+    멈추거나 예외로 끝나면 생성 중이던 항목은 대기 상태로 돌려놓습니다.
+    """
+    from batch_generation import _run_one
+    from near_duplicates import NearDuplicateError
+    if generate is None or save is None:
+        from utils import generate_conversation, save_conversation_json
+        generate = generate or generate_conversation
+        save = save or save_conversation_json
+
+    owner = owner or worker_id()
+    concurrency = max(1, int(concurrency))
+    report = {"owner": owner, "leased": 0, "done": 0, "recovered": 0, "retry": 0, "failed": [], "lost": 0}
+    started = time.perf_counter()
+
+    def emit(item, status, error=None, output_id=None):
+        if status == "failed":
+            report["failed"].append({"job_id": item["job_id"], "idx": item["idx"], "persona": item["persona"], "error": error})
+        else:
+            report[status] += 1
+        if on_progress is not None:
+            on_progress({"job_id": item["job_id"], "idx": item["idx"], "persona": item["persona"],
+                         "status": status, "error": error, "output_id": output_id})
+
+    def failed(item, error, retry=True):
+        # 새 상태 pending → 재시도 대기, None → 그 사이 임대를 잃음
+        status = queue.fail(owner, (item["job_id"], item["idx"]), error, retry=retry)
+        emit(item, {"pending": "retry", "failed": "failed"}.get(status, "lost"), error)
+
+    def checkpoint(item, result):
+        key = (item["job_id"], item["idx"])
+        if result["error"] is not None:
+            failed(item, result["error"])
+            return
+        if not queue.mark_saving(owner, key):
+            emit(item, "lost")
+            return
+        record = dict(result["result"], job={"id": item["job_id"], "item": item["idx"]})
+        try:
+            output_id = save(record)
+        except NearDuplicateError as e:
+            failed(item, f"{type(e).__name__}: {e}", retry=False)
+            return
+        except Exception as e:
+            failed(item, f"저장 실패 - {type(e).__name__}: {e}")
+            return
+        queue.complete(key, output_id)
+        emit(item, "done", output_id=output_id)
+
+    running = {}
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="dialogue-job") as pool:
+            while True:
+                stopping = (should_stop is not None and should_stop()) or (
+                    max_items is not None and report["leased"] >= max_items
+                )
+                if not stopping and len(running) < concurrency:
+                    want = concurrency - len(running)
+                    if max_items is not None:
+                        want = min(want, max_items - report["leased"])
+                    for item in queue.lease(owner, want, job_id, lease_seconds):
+                        report["leased"] += 1
+                        if item["recovering"]:
+                            output_id = find_saved(item)
+                            if output_id is not None:
+                                queue.complete((item["job_id"], item["idx"]), output_id)
+                                emit(item, "recovered", output_id=output_id)
+                                continue
+                        future = pool.submit(
+                            _run_one, generate, item["idx"], item["persona"], item["variant"],
+                            item["use_cache"], time.perf_counter()
+                        )
+                        running[future] = item
+                if not running:
+                    retry_at = None if stopping else queue.next_available(job_id)
+                    if retry_at is None:
+                        break
+                    time.sleep(min(max(0.0, retry_at - time.time()), lease_seconds / 3) + 0.05)
+                    continue
+                finished, _ = wait(running, timeout=lease_seconds / 3, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    checkpoint(running.pop(future), future.result())
+                queue.renew(owner, [(it["job_id"], it["idx"]) for it in running.values()], lease_seconds)
+    finally:
+        if running:
+            queue.release(owner)
+
+    report["elapsed"] = time.perf_counter() - started
+    return report
+
+def _print_jobs(queue):
+    jobs = queue.jobs()
+    if not jobs:
+        print("작업이 없습니다.")
+    for job in jobs:
+        counts = job["counts"]
+        created = time.strftime("%Y-%m-%d %H:%M", time.localtime(job["created_at"]))
+        print(
+            f"{job['id']}  {created}  {job['label'] or '-'}  완료 {counts['done']}/{job['total']}, "
+            f"대기 {counts['pending']}, 진행 중 {counts['leased'] + counts['saving']}, 실패 {counts['failed']}"
+        )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="대량 생성 작업 큐")
+    parser.add_argument("--path", default=JOBS_PATH, help="작업 큐 DB 경로")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="작업별 진행 상황")
+    work = sub.add_parser("work", help="작업자 실행")
+    work.add_argument("--job", help="이 작업의 항목만 처리 (기본: 모든 작업)")
+    work.add_argument("--concurrency", type=int, default=4, help="동시 API 요청 수")
+    work.add_argument("--max-items", type=int, help="이 작업자가 처리할 최대 항목 수")
+    retry = sub.add_parser("retry", help="실패한 항목을 다시 대기 상태로")
+    retry.add_argument("job")
+    args = parser.parse_args(argv)
+
+    queue = JobQueue(args.path)
+    if args.command == "status":
+        _print_jobs(queue)
+        return 0
+    if args.command == "retry":
+        print(f"{queue.retry_failed(args.job)}개 항목을 다시 대기 상태로 바꿨습니다.")
+        return 0
+
+    def on_progress(event):
+        p = event["persona"]
+        detail = f" ({event['error']})" if event["error"] else ""
+        print(
+            f"[{event['job_id']}#{event['idx']}] {p.get('age')} / {p.get('gender')} / {p.get('middle_category')} / "
+            f"KTAS {p.get('ktas_level')}: {event['status']}{detail}",
+            file=sys.stderr
+        )
+
+    report = run_worker(queue, job_id=args.job, concurrency=args.concurrency, on_progress=on_progress, max_items=args.max_items)
+    print(
+        f"작업자 {report['owner']}: 완료 {report['done']}, 복구 {report['recovered']}, 재시도 대기 {report['retry']}, "
+        f"실패 {len(report['failed'])}, 임대 잃음 {report['lost']}, 소요 {report['elapsed']:.1f}초",
+        file=sys.stderr
+    )
+    return 1 if report["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
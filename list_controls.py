@@ -0,0 +1,198 @@
+import math
+import streamlit as st
+from category_table import EXCEL_PATH, load_hierarchy
+from dialogue_export import FORMATS as EXPORT_FORMATS
+from dialogue_search import FACETS as SEARCH_FACETS, highlight_turns
+
+FILTER_ALL = "전체"
+EVAL_STATUS = {"전체": None, "미평가": False, "평가 완료": True}
+PRESCREEN_STATUS = {"전체": None, "통과": True, "문제 있음": False}
+
+def _hierarchy():
+    try:
+        return load_hierarchy(EXCEL_PATH)
+    except Exception:
+        return {}
+
+def _pick(value):
+    return None if value == FILTER_ALL else value
+
+def filter_controls(key_prefix, with_persona=True):
+    """
+    목록 조회 조건 위젯을 그리고 저장소 query()에 넘길 filters dict를 돌려줍니다.
+    """
+    filters = {}
+    with st.expander("조회 조건", expanded=False):
+        if with_persona:
+            hierarchy = _hierarchy()
+            c1, c2, c3 = st.columns(3)
+            with c1:
+                age = st.selectbox("나이", [FILTER_ALL, "15세 미만", "15세 이상"], key=f"{key_prefix}_f_age")
+            with c2:
+                gender = st.selectbox("성별", [FILTER_ALL, "남성", "여성"], key=f"{key_prefix}_f_gender")
+            with c3:
+                levels = st.multiselect("KTAS 레벨", [1, 2, 3, 4, 5], key=f"{key_prefix}_f_ktas")
+
+            main_options = sorted({m for age_map in hierarchy.values() for m in age_map})
+            if _pick(age):
+                main_options = sorted(hierarchy.get(age, {}).keys())
+            c4, c5 = st.columns(2)
+            with c4:
+                main_category = st.selectbox("대분류", [FILTER_ALL] + main_options, key=f"{key_prefix}_f_main")
+            middle_options = sorted({
+                mid
+                for age_val, age_map in hierarchy.items() if not _pick(age) or age_val == age
+                for main_val, mids in age_map.items() if main_val == main_category
+                for mid in mids
+            })
+            with c5:
+                middle_category = st.selectbox("중분류", [FILTER_ALL] + middle_options, key=f"{key_prefix}_f_mid")
+
+            filters.update({
+                "age": _pick(age),
+                "gender": _pick(gender),
+                "main_category": _pick(main_category),
+                "middle_category": _pick(middle_category),
+                "ktas_level": levels,
+            })
+
+        c6, c7, c8, c9 = st.columns([2, 2, 1, 1])
+        with c6:
+            status = st.radio(
+                "평가 여부", list(EVAL_STATUS), horizontal=True, key=f"{key_prefix}_f_evaluated",
+                help="사람 평가만 셉니다 (LLM 자동 평가만 있으면 미평가)."
+            )
+        with c7:
+            evaluator = st.text_input("평가자", key=f"{key_prefix}_f_evaluator").strip()
+        with c8:
+            review = st.checkbox(
+                "검토 필요만", key=f"{key_prefix}_f_review",
+                help="LLM 자동 평가의 확신도가 낮은데 사람 평가가 없거나, 사람 평가와 점수 차이가 큰 대화"
+            )
+        with c9:
+            prescreen = st.selectbox(
+                "사전 검사", list(PRESCREEN_STATUS), key=f"{key_prefix}_f_prescreen",
+                help="모델 없이 규칙으로 찾은 결함(형식, 화자/턴 순서, 한국어 여부, KTAS 레벨 대비 길이 등)"
+            )
+        filters["evaluated"] = EVAL_STATUS[status]
+        filters["evaluator"] = evaluator or None
+        filters["review"] = True if review else None
+        filters["prescreen"] = PRESCREEN_STATUS[prescreen]
+    return filters
+
+def page_controls(total, key_prefix, default_size=20):
+    """
+    페이지 크기/번호 위젯을 그리고 (limit, offset)을 돌려줍니다.
+    """
+    c1, c2, c3 = st.columns([1, 1, 2])
+    sizes = [10, 20, 50, 100]
+    with c1:
+        page_size = st.selectbox("페이지 크기", sizes, index=sizes.index(default_size), key=f"{key_prefix}_page_size")
+    pages = max(1, math.ceil(total / page_size))
+    # 조회 조건이 바뀌어 페이지 수가 줄어든 경우 마지막 페이지로 맞춤
+    if st.session_state.get(f"{key_prefix}_page_no", 1) > pages:
+        st.session_state[f"{key_prefix}_page_no"] = pages
+    with c2:
+        page = st.number_input("페이지", min_value=1, max_value=pages, step=1, key=f"{key_prefix}_page_no")
+    offset = (int(page) - 1) * page_size
+    with c3:
+        st.markdown(f"<br>총 **{total}**개 중 {min(offset + 1, total)}–{min(offset + page_size, total)}", unsafe_allow_html=True)
+    return page_size, offset
+
+def near_duplicate_controls(index, key_prefix):
+    """
+    '거의 같은 대화 묶기'를 켜면 묶음 목록을 보여 주고 id → (묶음 대표 id, 묶음 크기)를 돌려줍니다. 끄면 None.
+    """
+    if not st.checkbox("거의 같은 대화 묶기", key=f"{key_prefix}_near_dup", help="발화 내용이 거의 같은 대화끼리 묶음 번호를 표시합니다."):
+        return None
+    clusters = index.clusters()
+    if not clusters:
+        st.info("거의 같은 대화가 없습니다.")
+        return {}
+    with st.expander(f"거의 같은 대화 묶음 {len(clusters):,}개 (대화 {sum(len(m) for m in clusters):,}개)", expanded=False):
+        st.dataframe(
+            [
+                {
+                    "묶음": members[0] + 1,
+                    "대화 수": len(members),
+                    "대화 번호": ", ".join(str(key + 1) for key in members[:20]) + (" …" if len(members) > 20 else "")
+                }
+                for members in clusters
+            ],
+            use_container_width=True,
+            hide_index=True
+        )
+    return index.groups()
+
+def near_duplicate_label(groups, dialogue_id):
+    if not groups or dialogue_id not in groups:
+        return ""
+    root, size = groups[dialogue_id]
+    return f"{root + 1}번 묶음 ({size}개)"
+
+def export_controls(key_prefix, export, file_stem):
+    """
+    내보내기 형식 선택과 다운로드 버튼. 파일은 버튼을 누를 때 export(형식) → 경로로 만들어지므로
+    다시 그릴 때마다 전체 데이터를 직렬화하지 않습니다.
+    """
+    fmt = st.selectbox(
+        "내보내기 형식",
+        list(EXPORT_FORMATS),
+        key=f"{key_prefix}_export_format",
+        help="JSONL: 저장된 대화 구조 그대로, Parquet: 턴 하나가 한 행인 학습용 표"
+    )
+
+    def data():
+        with open(export(fmt), "rb") as f:
+            return f.read()
+
+    st.download_button(
+        f"{fmt} 파일로 내보내기",
+        data,
+        file_name=f"{file_stem}.{EXPORT_FORMATS[fmt]['ext']}",
+        mime=EXPORT_FORMATS[fmt]["mime"],
+        on_click="ignore",
+        use_container_width=True
+    )
+
+SEARCH_SPEAKERS = {"전체": None, "간호사": "I", "환자": "CHATGPT"}
+FACET_LABELS = {"ktas_level": "KTAS", "middle_category": "중분류"}
+
+def search_controls(index, key_prefix, filters, count):
+    """
+    발화 검색창을 그리고, 검색어가 있으면 일치하는 대화 ID를 filters["ids"]에 넣어 돌려줍니다.
+    반환: (filters, 검색어, 화자) — 검색어가 없으면 filters는 그대로.
+    count는 목록과 같은 저장소의 count(filters). 색인은 페르소나 조건만 적용하므로, 평가/검토/사전 검사 조건이
+    있으면 결과 수는 count로 목록과 같은 조건에서 다시 세고, 분류별 수는 페르소나 조건 기준이라고 표시합니다.
+    """
+    c1, c2 = st.columns([3, 1])
+    with c1:
+        query = st.text_input(
+            "발화 검색", key=f"{key_prefix}_search",
+            placeholder="예) 흉통 어지러", help="띄어쓰기로 나눈 단어가 모두 들어 있는 대화 (공백/대소문자 무시)"
+        ).strip()
+    with c2:
+        who = st.selectbox("말한 사람", list(SEARCH_SPEAKERS), key=f"{key_prefix}_search_speaker")
+    speaker = SEARCH_SPEAKERS[who]
+    result = index.search(query, filters, speaker=speaker)
+    if result is None:
+        return filters, "", None
+    searched = dict(filters, ids=result["ids"])
+    facets = [
+        f"{label} " + ", ".join(f"{value} {n:,}" for value, n in sorted(result["facets"].get(name, {}).items())[:8])
+        for name, label in FACET_LABELS.items() if len(result["facets"].get(name, {})) > 1
+    ]
+    elapsed = f"{result['elapsed'] * 1000:.0f}ms"
+    if any(value is not None and value != [] for key, value in filters.items() if key not in SEARCH_FACETS):
+        summary = f"검색 결과 {count(searched):,}개 (발화 일치 {result['count']:,}개 중 조회 조건에 맞는 대화, {elapsed})"
+        facets = [f"페르소나 조건 기준 {facet}" for facet in facets[:1]] + facets[1:]
+    else:
+        summary = f"검색 결과 {result['count']:,}개 ({elapsed})"
+    st.caption(" · ".join([summary] + facets))
+    return searched, query, speaker
+
+def search_match_label(record, query, speaker=None, limit=3):
+    """목록 표의 '검색 일치 발화' 칸: 일치하는 발화 최대 limit개를 【】로 강조해 한 줄로."""
+    found = highlight_turns(record, query, speaker=speaker)
+    parts = [f"[{i + 1}] {who}: {text}" if who else f"[{i + 1}] {text}" for i, who, text in found[:limit]]
+    return " / ".join(parts) + (f" 외 {len(found) - limit}개" if len(found) > limit else "")
@@ -0,0 +1,297 @@
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "openai")
+
+class BackendError(Exception):
+    pass
+
+class RateLimitError(BackendError):
+    """429 (요청 한도 초과). 잠시 후 다시 시도하면 성공할 수 있는 오류입니다."""
+
+# ---------- 토큰 사용량 ----------
+def normalize_usage(usage):
+    """
+    백엔드 응답의 usage를 {"prompt_tokens", "cached_tokens", "completion_tokens"}로 맞춥니다.
+    cached_tokens는 prompt_tokens 중 제공자의 프롬프트 캐시에서 처리된 토큰 수입니다.
+    """
+    usage = usage or {}
+    details = usage.get("prompt_tokens_details") or {}
+    return {
+        "prompt_tokens": int(usage.get("prompt_tokens") or 0),
+        "cached_tokens": int(details.get("cached_tokens") or usage.get("cached_tokens") or 0),
+        "completion_tokens": int(usage.get("completion_tokens") or 0),
+    }
+
+_usage = Counter()
+_usage_lock = threading.Lock()
+
+def record_usage(usage):
+    with _usage_lock:
+        _usage["requests"] += 1
+        _usage.update(usage)
+
+def usage_stats():
+    """지금까지의 요청 수와 prompt/cached/completion 토큰 합계, 캐시된 입력 토큰 비율(cached_rate)."""
+    with _usage_lock:
+        stats = dict(_usage)
+    prompt = stats.get("prompt_tokens", 0)
+    stats["cached_rate"] = stats.get("cached_tokens", 0) / prompt if prompt else 0.0
+    return stats
+
+class OpenAIBackend:
+    """
+    openai.ChatCompletion 백엔드. API 키는 첫 요청 시점에
+    생성자 인자 → 환경변수 OPENAI_API_KEY → st.secrets["OPENAI_API_KEY"] 순서로 찾습니다.
+    """
+    name = "openai"
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key
+        self._lock = threading.Lock()
+        self._openai = None
+
+    def _client(self):
+        with self._lock:
+            if self._openai is None:
+                import openai
+                key = self.api_key or os.environ.get("OPENAI_API_KEY")
+                if not key:
+                    import streamlit as st
+                    key = st.secrets["OPENAI_API_KEY"]
+                openai.api_key = key
+                self._openai = openai
+        return self._openai
+
+    def complete(self, messages, model, temperature):
+        openai = self._client()
+        try:
+            response = openai.ChatCompletion.create(
+                model=model,
+                messages=messages,
+                temperature=temperature
+            )
+        except openai.error.RateLimitError as e:
+            raise RateLimitError(str(e)) from e
+        except openai.error.OpenAIError as e:
+            raise BackendError(str(e)) from e
+        return {
+            "content": response.choices[0].message.content,
+            "usage": normalize_usage(response.get("usage")),
+        }
+
+    def stream(self, messages, model, temperature, on_usage=None):
+        """
+        응답 텍스트 조각을 도착하는 대로 내보냅니다. 소비를 멈추고 close()하면 연결을 닫습니다.
+        끝까지 받으면 마지막 조각의 usage로 on_usage(usage)를 호출합니다.
+        """
+        openai = self._client()
+        try:
+            response = openai.ChatCompletion.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+        except openai.error.RateLimitError as e:
+            raise RateLimitError(str(e)) from e
+        except openai.error.OpenAIError as e:
+            raise BackendError(str(e)) from e
+        try:
+            for chunk in response:
+                if chunk.get("usage") and on_usage:
+                    on_usage(normalize_usage(chunk["usage"]))
+                if not chunk.choices:
+                    continue
+                content = chunk.choices[0].get("delta", {}).get("content")
+                if content:
+                    yield content
+        finally:
+            close = getattr(response, "close", None)
+            if close is not None:
+                close()
+
+# ---------- 로컬 대체 백엔드 ----------
+_PERSONA_RE = re.compile(r"-Patient:\s*(?P<age>[^/\n]+?)\s*/\s*(?P<gender>[^/\n]+?)\s*/\s*(?P<main>[^/\n]+?)\s*/\s*(?P<middle>[^\n]+)")
+_KTAS_RE = re.compile(r"-KTAS expected level:\s*(?P<level>\d)")
+# llm_judge의 채점 요청 (문항 수와 척도)
+_JUDGE_RE = re.compile(r"-Rubric questions:\s*(?P<count>\d+)")
+_JUDGE_SCALE_RE = re.compile(r"-Scale:\s*(?P<scale>[^\n]+)")
+
+_FAKE_QA = [
+    ("언제부터 증상이 시작되었나요?", ["오늘 아침부터요.", "어젯밤부터 시작됐어요.", "두 시간 전부터요."]),
+    ("통증은 0에서 10 중에 몇 점 정도인가요?", ["7점 정도예요.", "4점 정도요.", "9점이요. 너무 아파요."]),
+    ("다른 동반 증상이 있으신가요?", ["속이 메스꺼워요.", "식은땀이 나요.", "특별히 없어요."]),
+    ("과거에 앓은 질환이 있나요?", ["고혈압이 있어요.", "당뇨가 있어요.", "없어요."]),
+    ("현재 복용 중인 약이 있나요?", ["혈압약을 먹고 있어요.", "먹는 약은 없어요.", "진통제를 먹었어요."]),
+    ("약물 알레르기가 있으신가요?", ["페니실린 알레르기가 있어요.", "없어요."]),
+    ("최근에 다치신 적이 있나요?", ["없어요.", "어제 넘어졌어요."]),
+    ("활력징후를 측정하겠습니다. 혈압 150/90, 맥박 110회입니다. 어지러우신가요?", ["조금 어지러워요.", "괜찮아요."]),
+]
+
+def _fake_dialogue(rng, persona):
+    age = persona.get("age", "15세 이상")
+    gender = persona.get("gender", "남성")
+    middle = persona.get("middle_category", "통증")
+    level = int(persona.get("ktas_level", 3))
+    years = rng.randint(3, 14) if age == "15세 미만" else rng.randint(15, 85)
+
+    turns = [
+        ("I", f"{rng.randint(1, 99)}번 환자분 들어오세요."),
+        ("CHATGPT", f"저는 {years}세 {gender}입니다."),
+        ("I", "어디가 불편하신가요?"),
+        ("CHATGPT", f"{middle} 때문에 왔어요."),
+    ]
+    # KTAS 레벨이 높을수록(경증일수록) 문진이 짧음
+    n_questions = max(2, min(len(_FAKE_QA), 9 - level + rng.randint(0, 2)))
+    for question, answers in rng.sample(_FAKE_QA, n_questions):
+        turns.append(("I", question))
+        turns.append(("CHATGPT", rng.choice(answers)))
+    return [
+        {"turn": i // 2 + 1, "speaker": speaker, "utterance": utterance}
+        for i, (speaker, utterance) in enumerate(turns)
+    ]
+
+def _fake_judgement(rng, count, scale):
+    # 대체로 긍정적이고, 가끔 확신도가 낮은 문항이 섞인 채점 결과
+    return {"ratings": [
+        {
+            "question": i + 1,
+            "rating": rng.choices(scale, weights=[6, 3, 1][:len(scale)])[0],
+            "confidence": round(rng.uniform(0.7, 1.0) if rng.random() > 0.03 else rng.uniform(0.3, 0.6), 2),
+            "reason": "대체 백엔드의 임의 채점입니다.",
+        }
+        for i in range(count)
+    ]}
+
+class FakeBackend:
+    """
+    네트워크 없이 동작하는 로컬 대체 백엔드.
+    프롬프트에서 페르소나를 읽어 스키마에 맞는 한국어 문진 대화를 돌려주며(채점 요청이면 임의의 채점 결과),
+    지연 시간(latency ± jitter초), 일반 오류 비율(error_rate), 429 비율(rate_limit_rate),
+    잘못된 speaker가 섞인 출력 비율(invalid_rate)을 설정할 수 있습니다.
+    이전 요청과 같은 system 메시지는 제공자 프롬프트 캐시에 적중한 것처럼 cached_tokens로 집계합니다.
+    """
+    name = "fake"
+    stream_chunk_chars = 16
+
+    def __init__(self, latency=0.5, jitter=0.2, error_rate=0.0, rate_limit_rate=0.0, invalid_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.invalid_rate = invalid_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._seen_prefixes = set()
+        self.calls = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            latency=float(os.environ.get("FAKE_LLM_LATENCY", "0.5")),
+            jitter=float(os.environ.get("FAKE_LLM_JITTER", "0.2")),
+            error_rate=float(os.environ.get("FAKE_LLM_ERROR_RATE", "0")),
+            rate_limit_rate=float(os.environ.get("FAKE_LLM_RATE_LIMIT_RATE", "0")),
+            invalid_rate=float(os.environ.get("FAKE_LLM_INVALID_RATE", "0")),
+        )
+
+    def _persona(self, messages):
+        # 페르소나는 user 메시지(build_persona_message)에서만 읽음: system 프롬프트의 "<age> / <gender> ..." 틀은 건너뜀
+        # (재시도 요청이 뒤에 붙으므로 페르소나가 들어 있는 마지막 user 메시지)
+        text = next((m.get("content", "") for m in reversed(messages)
+                     if m.get("role") == "user" and _PERSONA_RE.search(m.get("content", ""))), "")
+        persona = {}
+        m = _PERSONA_RE.search(text)
+        if m:
+            persona.update(age=m["age"], gender=m["gender"], main_category=m["main"], middle_category=m["middle"].strip())
+        m = _KTAS_RE.search(text)
+        if m:
+            persona["ktas_level"] = int(m["level"])
+        return persona
+
+    def _start(self, messages):
+        prefix = messages[0].get("content", "") if messages and messages[0].get("role") == "system" else ""
+        with self._lock:
+            self.calls += 1
+            roll = self._rng.random()
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+            seed = self._rng.random()
+            prefix_cached = prefix in self._seen_prefixes
+            self._seen_prefixes.add(prefix)
+        return roll, delay, seed, prefix_cached
+
+    def _respond(self, messages, roll, seed, prefix_cached):
+        if roll < self.rate_limit_rate:
+            raise RateLimitError("Rate limit reached (fake backend)")
+        if roll < self.rate_limit_rate + self.error_rate:
+            raise BackendError("Injected error (fake backend)")
+
+        prompt_hash = hashlib.sha256(json.dumps(messages, ensure_ascii=False).encode("utf-8")).hexdigest()
+        rng = random.Random(f"{prompt_hash}:{seed}")
+        system = messages[0].get("content", "") if messages else ""
+        judge = _JUDGE_RE.search(system)
+        if judge:
+            scale = [s.strip() for s in _JUDGE_SCALE_RE.search(system)["scale"].split("/")]
+            content = json.dumps(_fake_judgement(rng, int(judge["count"]), scale), ensure_ascii=False)
+        else:
+            dialogue = _fake_dialogue(rng, self._persona(messages))
+            if roll < self.rate_limit_rate + self.error_rate + self.invalid_rate:
+                dialogue[len(dialogue) // 2]["speaker"] = "Nurse"
+            content = json.dumps(dialogue, ensure_ascii=False, indent=1)
+        prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 3
+        return {
+            "content": content,
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "cached_tokens": len(messages[0].get("content", "")) // 3 if prefix_cached else 0,
+                "completion_tokens": len(content) // 2,
+            },
+        }
+
+    def complete(self, messages, model, temperature):
+        roll, delay, seed, prefix_cached = self._start(messages)
+        # 캐시된 접두부만큼 첫 토큰까지의 지연이 줄어드는 것을 흉내 냄
+        time.sleep(delay * (0.8 if prefix_cached else 1.0))
+        return self._respond(messages, roll, seed, prefix_cached)
+
+    def stream(self, messages, model, temperature, on_usage=None):
+        # 첫 조각까지 지연의 30%(접두부 캐시 적중 시 10%), 나머지는 조각마다 나눠서 대기
+        roll, delay, seed, prefix_cached = self._start(messages)
+        time.sleep(delay * (0.1 if prefix_cached else 0.3))
+        response = self._respond(messages, roll, seed, prefix_cached)
+        content = response["content"]
+        chunks = [content[i:i + self.stream_chunk_chars] for i in range(0, len(content), self.stream_chunk_chars)]
+        for chunk in chunks:
+            time.sleep(delay * 0.7 / len(chunks))
+            yield chunk
+        if on_usage:
+            on_usage(response["usage"])
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend():
+    """환경변수 LLM_BACKEND("openai" 또는 "fake")에 맞는 백엔드를 처음 사용할 때 만듭니다."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if LLM_BACKEND == "openai":
+                _backend = OpenAIBackend()
+            elif LLM_BACKEND == "fake":
+                _backend = FakeBackend.from_env()
+            else:
+                raise ValueError(f"알 수 없는 LLM 백엔드입니다: {LLM_BACKEND}")
+        return _backend
+
+def set_backend(backend):
+    global _backend
+    with _backend_lock:
+        _backend = backend
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+CACHE_DIR = os.environ.get("LLM_CACHE_DIR", "data/llm_cache")
+CACHE_DISABLED = os.environ.get("LLM_CACHE_DISABLED", "") not in ("", "0", "false")
+
+class ResponseCache:
+    """
+    LLM 응답을 디스크에 저장하는 캐시.
+
+    키는 요청을 결정하는 값(프롬프트, 모델, temperature, variant 등)의 해시이며,
+    항목 하나가 {directory}/{key[:2]}/{key}.json 파일 하나입니다.
+    max_age_seconds보다 오래된 항목은 읽을 때 버리고, 항목 수/용량이 한도를 넘으면
+    가장 오래 사용하지 않은 것부터 지웁니다.
+    stats()의 항목 수/용량은 메모리의 값: 처음 한 번만 디렉터리를 훑고 이후 put/삭제 때 갱신하며,
+    evict() 때마다 실제 디렉터리 기준으로 다시 맞춥니다 (다른 프로세스의 쓰기는 그때 반영).
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_entries=20000, max_bytes=512 * 1024 * 1024,
+                 max_age_seconds=30 * 24 * 3600, evict_every=100):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.evict_every = evict_every
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._entry_count = None
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(**parts):
+        payload = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                item = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self._count(False)
+            return None
+
+        if time.time() - item.get("created", 0) > self.max_age_seconds:
+            self._remove(path)
+            self._count(False)
+            return None
+
+        # 최근 사용 시각 갱신 (용량 초과 시 오래 안 쓴 항목부터 삭제)
+        os.utime(path)
+        self._count(True)
+        return item["value"]
+
+    def put(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"created": time.time(), "value": value}, f, ensure_ascii=False)
+        size = os.path.getsize(tmp_path)
+        try:
+            old_size = os.path.getsize(path)
+        except FileNotFoundError:
+            old_size = None
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._entry_count is not None:
+                self._entry_count += old_size is None
+                self._total_bytes += size - (old_size or 0)
+            self._puts += 1
+            due = self._puts % self.evict_every == 0
+        if due:
+            self.evict()
+
+    def _remove(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            if self._entry_count is not None:
+                self._entry_count -= 1
+                self._total_bytes -= size
+
+    def _entries(self):
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".json"):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        entries = sorted(self._entries())
+        now = time.time()
+        total_bytes = sum(size for _, size, _ in entries)
+        removed = 0
+        for i, (mtime, size, path) in enumerate(entries):
+            over_limit = len(entries) - i > self.max_entries or total_bytes > self.max_bytes
+            # mtime(마지막 사용 시각) 오름차순이므로 한도 이내이고 만료되지 않은 항목을 만나면 멈춤
+            if not over_limit and now - mtime <= self.max_age_seconds:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+            removed += 1
+        with self._lock:
+            self._entry_count, self._total_bytes = len(entries) - removed, total_bytes
+        return removed
+
+    def clear(self):
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._entry_count, self._total_bytes = 0, 0
+
+    def stats(self):
+        """적중/미스 수와 항목 수/용량. 디렉터리는 이 객체가 처음 부를 때만 훑습니다 (화면을 다시 그릴 때마다 부름)."""
+        if self._entry_count is None:
+            entries = self._entries()
+            with self._lock:
+                if self._entry_count is None:
+                    self._entry_count, self._total_bytes = len(entries), sum(size for _, size, _ in entries)
+        with self._lock:
+            hits, misses = self.hits, self.misses
+            entries, total_bytes = self._entry_count, self._total_bytes
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "entries": entries,
+            "bytes": total_bytes,
+        }
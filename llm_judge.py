@@ -0,0 +1,232 @@
+"""
+저장된 대화를 평가 문항(rubric.py)에 따라 LLM이 일괄 채점합니다 (LLM-as-judge).
+
+  - 사람 평가 폼과 같은 문항 10개, 같은 그렇다/보통이다/그렇지 않다 척도로 문항마다 평가와 확신도(0~1)를 받음
+  - 결과는 사람 평가와 같은 형식(문항별 선택값, question/realism 점수)으로 JUDGE_EVALUATOR 평가자 이름으로 저장하고
+    judge(모델), confidence(가장 낮은 문항 확신도), review, low_confidence, reasons를 함께 기록
+  - 확신도가 REVIEW_CONFIDENCE 미만인 문항이 있으면 review=True → 조회 조건 '검토 필요'(dialogue_store.needs_review)에 걸림
+  - 같은 대화/문항/모델의 채점은 응답 캐시에서 바로 돌려줌
+  - 여러 대화를 동시에 채점하고, 저장은 호출한 스레드에서 한 건씩 (generate_batch와 같은 방식)
+"""
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from rubric import APPROPRIATENESS_QUESTIONS, REALISM_QUESTIONS, RATING_OPTIONS, calculate_score, ratings_map
+from llm_cache import ResponseCache, CACHE_DISABLED
+from llm_backend import get_backend
+from utils import _complete, _add_usage, response_cache
+
+JUDGE_MODEL = os.environ.get("LLM_JUDGE_MODEL", "gpt-4.1")
+JUDGE_TEMPERATURE = 0.0
+# 사람 평가자와 구분되는 평가자 ID (모델이 바뀌면 다른 평가자로 저장)
+JUDGE_EVALUATOR = os.environ.get("LLM_JUDGE_EVALUATOR", f"llm-judge/{JUDGE_MODEL}")
+REVIEW_CONFIDENCE = float(os.environ.get("LLM_JUDGE_REVIEW_CONFIDENCE", "0.6"))
+MAX_JUDGE_RETRIES = 1
+DEFAULT_CONCURRENCY = 4
+MAX_CONCURRENCY = 32
+
+QUESTIONS = [("적절성", q, h) for q, h in APPROPRIATENESS_QUESTIONS] + [("현실성", q, h) for q, h in REALISM_QUESTIONS]
+
+class JudgeError(Exception):
+    """채점 응답이 형식에 맞지 않는 경우."""
+
+def _rubric_text():
+    lines = []
+    for i, (group, question, help_text) in enumerate(QUESTIONS, start=1):
+        lines.append(f"{i}. [{group}] {question}")
+        lines.extend(f"   {line.strip()}" for line in help_text.splitlines() if line.strip())
+    return "\n".join(lines)
+
+# 모든 채점 요청에 똑같이 들어가는 규칙과 문항 (대화는 뒤의 user 메시지로 따로 보내 접두부 캐시가 적중)
+JUDGE_SYSTEM_PROMPT = f"""You are an experienced emergency room triage nurse who reviews multi-turn intake conversations between an emergency room nurse (speaker "I") and a patient (speaker "CHATGPT").
+Rate the conversation on each rubric question below.
+
+-Rubric questions: {len(QUESTIONS)}
+-Scale: {" / ".join(RATING_OPTIONS)}
+
+1. Rate every question in order, using exactly one of the scale values as "rating".
+2. "confidence" is a number from 0 to 1: how certain you are of the rating given only this conversation.
+3. "reason" is one short Korean sentence pointing to the turns that support the rating.
+4. Respond with only a JSON object of the following form:
+{{"ratings": [{{"question": 1, "rating": "{RATING_OPTIONS[0]}", "confidence": 0.9, "reason": "..."}}, ...]}}
+
+--- [Rubric] ---
+{_rubric_text()}
+"""
+
+def dialogue_transcript(dialogue):
+    if isinstance(dialogue, list):
+        lines = []
+        for turn in dialogue:
+            if isinstance(turn, dict):
+                lines.append(f"[{turn.get('turn', '')}] {turn.get('speaker', '')}: {turn.get('utterance', turn.get('content', ''))}")
+            else:
+                lines.append(str(turn))
+        return "\n".join(lines)
+    return dialogue if isinstance(dialogue, str) else json.dumps(dialogue, ensure_ascii=False)
+
+def build_judge_messages(dialogue):
+    return [
+        {"role": "system", "content": JUDGE_SYSTEM_PROMPT},
+        {"role": "user", "content": dialogue_transcript(dialogue)},
+    ]
+
+def parse_judgement(content):
+    """채점 응답을 문항 순서대로 [{"rating", "confidence", "reason"}]로 바꿉니다. 형식이 틀리면 JudgeError."""
+    start, end = content.find("{"), content.rfind("}")
+    try:
+        data = json.loads(content[start:end + 1]) if start != -1 else None
+    except ValueError as e:
+        raise JudgeError(f"JSON 객체가 아닙니다: {e}")
+    ratings = data.get("ratings") if isinstance(data, dict) else None
+    if not isinstance(ratings, list) or len(ratings) != len(QUESTIONS):
+        raise JudgeError(f"ratings에 문항 {len(QUESTIONS)}개의 평가가 있어야 합니다.")
+    items = []
+    for i, item in enumerate(ratings, start=1):
+        rating = item.get("rating") if isinstance(item, dict) else None
+        if rating not in RATING_OPTIONS:
+            raise JudgeError(f"{i}번 문항의 rating은 {', '.join(RATING_OPTIONS)} 중 하나여야 합니다: {rating!r}")
+        try:
+            confidence = min(1.0, max(0.0, float(item.get("confidence"))))
+        except (TypeError, ValueError):
+            confidence = 0.0
+        items.append({"rating": rating, "confidence": confidence, "reason": str(item.get("reason") or "")})
+    return items
+
+def to_evaluation(dialogue_id, items):
+    """채점 결과를 사람 평가와 같은 형식의 평가 dict로 바꿉니다."""
+    n = len(APPROPRIATENESS_QUESTIONS)
+    appropriate = [it["rating"] for it in items[:n]]
+    realism = [it["rating"] for it in items[n:]]
+    ratings = ratings_map(dialogue_id, appropriate, realism)
+    keys = list(ratings)
+    low = [key for key, it in zip(keys, items) if it["confidence"] < REVIEW_CONFIDENCE]
+    evaluation = {
+        "question": calculate_score(appropriate),
+        "realism": calculate_score(realism),
+        "evaluator": JUDGE_EVALUATOR,
+        "judge": JUDGE_MODEL,
+        "confidence": min(it["confidence"] for it in items),
+        "review": bool(low),
+        "low_confidence": low,
+        "reasons": {key: it["reason"] for key, it in zip(keys, items)},
+    }
+    evaluation.update(ratings)
+    return evaluation
+
+def _request(messages, usage):
+    # 형식이 틀린 응답은 오류를 알려 MAX_JUDGE_RETRIES번까지 다시 요청
+    base = list(messages)
+    for attempt in range(MAX_JUDGE_RETRIES + 1):
+        response = _complete(messages, model=JUDGE_MODEL, temperature=JUDGE_TEMPERATURE)
+        _add_usage(usage, response["usage"])
+        try:
+            return parse_judgement(response["content"]), response["content"]
+        except JudgeError as e:
+            if attempt == MAX_JUDGE_RETRIES:
+                raise
+            messages = base + [
+                {"role": "assistant", "content": response["content"]},
+                {"role": "user", "content": f"The previous response was invalid: {e} Respond again with only the JSON object."},
+            ]
+
+def judge_dialogue(record, use_cache=True):
+    """
+    레코드({"id", "dialogue", ...}) 하나를 채점해 (평가 dict, {"cache_hit", "usage"})를 돌려줍니다.
+    use_cache=False면 캐시를 읽지 않고 새로 채점해 덮어씁니다.
+    """
+    messages = build_judge_messages(record.get("dialogue"))
+    cache_key = ResponseCache.make_key(
+        backend=get_backend().name, messages=messages, model=JUDGE_MODEL, temperature=JUDGE_TEMPERATURE
+    )
+    meta = {"cache_hit": False, "usage": {}}
+    items = None
+    if use_cache and not CACHE_DISABLED:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            try:
+                items = parse_judgement(cached)
+                meta["cache_hit"] = True
+            except JudgeError:
+                items = None
+    if items is None:
+        items, content = _request(messages, meta["usage"])
+        if not CACHE_DISABLED:
+            response_cache.put(cache_key, content)
+    return to_evaluation(record["id"], items), meta
+
+def pending(query, filters=None, limit=None, force=False, chunk_size=500):
+    """
+    query(filters, limit=, offset=)로 저장소를 chunk_size개씩 훑으며 아직 자동 평가가 없는 레코드를
+    limit개까지 모읍니다. force=True면 이미 자동 평가한 레코드도 포함합니다.
+    """
+    records, offset = [], 0
+    while limit is None or len(records) < limit:
+        chunk = query(filters, limit=chunk_size, offset=offset)
+        if not chunk:
+            break
+        offset += len(chunk)
+        records.extend(rec for rec in chunk if force or JUDGE_EVALUATOR not in (rec.get("evaluations") or {}))
+    return records if limit is None else records[:limit]
+
+def _run_one(index, record, use_cache):
+    started = time.perf_counter()
+    try:
+        evaluation, meta = judge_dialogue(record, use_cache=use_cache)
+        error = None
+    except Exception as e:
+        evaluation, meta = None, {"cache_hit": False, "usage": {}}
+        error = f"{type(e).__name__}: {e}"
+    return {
+        "index": index,
+        "id": record["id"],
+        "evaluation": evaluation,
+        "cache_hit": meta["cache_hit"],
+        "usage": meta["usage"],
+        "error": error,
+        "elapsed": time.perf_counter() - started,
+    }
+
+def judge_batch(records, save, concurrency=DEFAULT_CONCURRENCY, on_progress=None, use_cache=True):
+    """
+    여러 레코드를 동시에 채점하고, 끝난 순서대로 save(dialogue_id, evaluation)로 저장합니다.
+
+    - concurrency: 동시에 진행할 API 요청 수 (1 ~ MAX_CONCURRENCY)
+    - on_progress(done, total, item): 항목 하나가 끝날 때마다 호출
+    - use_cache: False면 응답 캐시를 읽지 않고 새로 채점
+
+    개별 항목의 실패는 배치를 멈추지 않고 item["error"]에 기록됩니다.
+    """
+    records = list(records)
+    total = len(records)
+    concurrency = max(1, min(int(concurrency), MAX_CONCURRENCY))
+    items = [None] * total
+    done = 0
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="dialogue-judge") as pool:
+        futures = [pool.submit(_run_one, i, rec, use_cache) for i, rec in enumerate(records)]
+        for future in as_completed(futures):
+            item = future.result()
+            if item["error"] is None:
+                try:
+                    save(item["id"], item["evaluation"])
+                except Exception as e:
+                    item["error"] = f"저장 실패 - {type(e).__name__}: {e}"
+            items[item["index"]] = item
+            done += 1
+            if on_progress is not None:
+                on_progress(done, total, item)
+
+    failed = [it for it in items if it["error"] is not None]
+    return {
+        "total": total,
+        "succeeded": total - len(failed),
+        "failed": failed,
+        "review": sum(1 for it in items if it["error"] is None and it["evaluation"]["review"]),
+        "cache_hits": sum(1 for it in items if it["cache_hit"]),
+        "items": items,
+        "elapsed": time.perf_counter() - started,
+    }
@@ -0,0 +1,209 @@
+"""
+저장된 대화의 발화 문자 n-gram에 대한 MinHash/LSH 색인으로 거의 같은 대화를 찾습니다.
+
+  - 대화마다 NUM_PERM개의 MinHash 서명을 만들고, BANDS개 밴드로 나눠 버킷에 넣음
+  - 추가/조회는 밴드 버킷만 보므로 저장된 대화 수와 관계없이 거의 일정한 시간
+  - 후보는 서명 일치율(자카드 유사도 추정치)이 threshold 이상일 때만 거의 같은 대화로 봄
+  - numpy는 처음 서명을 만들 때 불러옴 (utils를 불러오는 것만으로는 불러오지 않음)
+"""
+import os
+import threading
+
+from dialogue_store import read_records
+
+NGRAM = 3
+NUM_PERM = 64
+BANDS = 16
+THRESHOLD = float(os.environ.get("NEAR_DUPLICATE_THRESHOLD", "0.8"))
+# flag: 저장하되 비슷한 대화를 기록, reject: 저장하지 않음, off: 검사하지 않음
+POLICY = os.environ.get("NEAR_DUPLICATE_POLICY", "flag")
+
+_ROWS = NUM_PERM // BANDS
+_hash_params = None
+
+class NearDuplicateError(Exception):
+    """POLICY가 reject일 때 거의 같은 대화가 이미 저장되어 있는 경우."""
+
+    def __init__(self, matches):
+        best = matches[0]
+        super().__init__(f"대화 {best['id'] + 1}과(와) 거의 같은 대화입니다 (유사도 {best['similarity']:.2f}).")
+        self.matches = matches
+
+def dialogue_text(dialogue):
+    """대화(턴 목록, dict 또는 문자열)에서 발화만 이어 붙인 문자열."""
+    if isinstance(dialogue, str):
+        return dialogue
+    if isinstance(dialogue, dict):
+        dialogue = dialogue.get("dialogue", list(dialogue.values()))
+    parts = []
+    for turn in dialogue if isinstance(dialogue, list) else [dialogue]:
+        if isinstance(turn, dict):
+            text = turn.get("utterance") or turn.get("content") or turn.get("text")
+            parts.append(str(text) if text is not None else " ".join(str(v) for v in turn.values()))
+        elif turn is not None:
+            parts.append(str(turn))
+    return "\n".join(parts)
+
+def _params():
+    global _hash_params
+    if _hash_params is None:
+        import numpy as np
+        # 고정 시드: 프로세스가 달라도 같은 대화는 같은 서명
+        rng = np.random.default_rng(20240901)
+        _hash_params = (
+            np.uint64(1_000_003),
+            rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) | np.uint64(1),
+            rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64),
+        )
+    return _hash_params
+
+def minhash(text):
+    """공백을 뺀 문자 NGRAM-gram 집합의 MinHash 서명 (uint32 NUM_PERM개). n-gram이 없으면 None."""
+    import numpy as np
+
+    shingle_base, a, b = _params()
+    codes = np.frombuffer("".join(text.split()).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    n = len(codes) - NGRAM + 1
+    if n <= 0:
+        return None
+    shingles = codes[:n].copy()
+    for k in range(1, NGRAM):
+        shingles = shingles * shingle_base + codes[k:n + k]
+    shingles = np.unique(shingles)
+    # multiply-shift 해시: (a*x + b) mod 2^64의 상위 32비트
+    return ((a[:, None] * shingles[None, :] + b[:, None]) >> np.uint64(32)).min(axis=1).astype(np.uint32)
+
+def similarity(a, b):
+    return float((a == b).sum()) / NUM_PERM
+
+class MinHashIndex:
+    """키 → 서명과 밴드별 버킷. 스레드 안전하지 않으므로 DialogueIndex가 잠금을 겁니다."""
+
+    def __init__(self):
+        self.signatures = {}
+        self._buckets = [{} for _ in range(BANDS)]
+
+    def _bands(self, signature):
+        return [signature[i * _ROWS:(i + 1) * _ROWS].tobytes() for i in range(BANDS)]
+
+    def add(self, key, signature):
+        self.remove(key)
+        self.signatures[key] = signature
+        for bucket, band in zip(self._buckets, self._bands(signature)):
+            bucket.setdefault(band, set()).add(key)
+
+    def remove(self, key):
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+        for bucket, band in zip(self._buckets, self._bands(signature)):
+            members = bucket.get(band)
+            if members is not None:
+                members.discard(key)
+                if not members:
+                    del bucket[band]
+
+    def query(self, signature, threshold=THRESHOLD, exclude=None):
+        """threshold 이상으로 비슷한 키들의 [(키, 유사도)] (유사도 내림차순)."""
+        candidates = set()
+        for bucket, band in zip(self._buckets, self._bands(signature)):
+            candidates |= bucket.get(band, set())
+        candidates.discard(exclude)
+        matches = [(key, similarity(signature, self.signatures[key])) for key in candidates]
+        return sorted([m for m in matches if m[1] >= threshold], key=lambda m: (-m[1], m[0]))
+
+    def clusters(self, threshold=THRESHOLD):
+        """
+        거의 같은 대화끼리 묶은 [[키, ...], ...] (두 개 이상인 묶음만, 큰 묶음 먼저).
+        버킷마다 첫 키와 나머지를 비교해 union-find로 합치므로 버킷이 커도 비교 횟수는 선형입니다.
+        """
+        parent = {}
+
+        def find(key):
+            while parent.get(key, key) != key:
+                parent[key] = parent.get(parent[key], parent[key])
+                key = parent[key]
+            return key
+
+        for bucket in self._buckets:
+            for members in bucket.values():
+                if len(members) < 2:
+                    continue
+                members = sorted(members)
+                head = members[0]
+                for key in members[1:]:
+                    if find(key) != find(head) and similarity(self.signatures[head], self.signatures[key]) >= threshold:
+                        a, b = sorted((find(head), find(key)))
+                        parent[b] = a
+        groups = {}
+        for key in parent:
+            groups.setdefault(find(key), []).append(key)
+        result = [sorted(set(members) | {root}) for root, members in groups.items()]
+        return sorted(result, key=lambda members: (-len(members), members[0]))
+
+class DialogueIndex:
+    """
+    대화 저장소에 대한 MinHashIndex. 저장소 version이 바뀌면 store.changes(cursor)로 마지막으로 본 뒤
+    추가/삭제된 ID만 받아 새 대화만 서명을 만들고 사라진 대화는 빼므로, 한 번 만든 뒤에는 저장소 전체를 훑지 않습니다.
+    같은 프로세스에서 저장한 대화는 add()로 바로 반영합니다 (이후 changes()에 나와도 다시 계산하지 않음).
+    """
+
+    def __init__(self, store, threshold=THRESHOLD):
+        self._store = store
+        self.threshold = threshold
+        self._index = MinHashIndex()
+        self._lock = threading.Lock()
+        self._version = None
+        self._cursor = None
+        self._changes = 0
+        self._clusters = (None, [])
+
+    def _sync(self):
+        version = self._store.version()
+        if version == self._version:
+            return
+        changes = self._store.changes(self._cursor)
+        if changes["reset"]:
+            self._index = MinHashIndex()
+        for key in changes["deleted"]:
+            self._index.remove(key)
+        missing = [key for key in changes["added"] if key not in self._index.signatures]
+        for record in read_records(self._store, missing):
+            self._add(record["id"], record.get("dialogue"))
+        self._changes += len(changes["deleted"]) + len(missing)
+        self._cursor = changes["cursor"]
+        self._version = version
+
+    def _add(self, key, dialogue):
+        signature = minhash(dialogue_text(dialogue))
+        if signature is not None:
+            self._index.add(key, signature)
+
+    def find(self, dialogue, limit=5):
+        """이미 저장된 대화 중 dialogue와 거의 같은 대화의 [{"id", "similarity"}]."""
+        signature = minhash(dialogue_text(dialogue))
+        if signature is None:
+            return []
+        with self._lock:
+            self._sync()
+            matches = self._index.query(signature, self.threshold)[:limit]
+        return [{"id": key, "similarity": round(sim, 3)} for key, sim in matches]
+
+    def add(self, key, dialogue):
+        """방금 저장한 대화를 색인에 넣습니다 (저장소를 다시 훑지 않음)."""
+        with self._lock:
+            if key not in self._index.signatures:
+                self._add(key, dialogue)
+                self._changes += 1
+
+    def clusters(self):
+        """거의 같은 대화 묶음 [[id, ...], ...]. 대화가 추가/삭제되지 않았으면 이전 결과를 돌려줍니다."""
+        with self._lock:
+            self._sync()
+            if self._clusters[0] != self._changes:
+                self._clusters = (self._changes, self._index.clusters(self.threshold))
+            return self._clusters[1]
+
+    def groups(self):
+        """id → (묶음의 대표 id, 묶음 크기). 묶이지 않은 대화는 없음."""
+        return {key: (members[0], len(members)) for members in self.clusters() for key in members}
@@ -1,42 +1,21 @@
-import os
-import pandas as pd
 import streamlit as st
-from utils import generate_conversation, save_conversation_json, delete_last_conversation
-
-EXCEL_PATH = "./data/GT_KTAS카테고리_분류.xlsx"
-
-@st.cache_data(show_spinner=False)
-def load_category_table(path: str) -> pd.DataFrame:
-    if not os.path.exists(path):
-        raise FileNotFoundError(f"엑셀 파일을 찾을 수 없습니다: {path}")
-
-    df = pd.read_excel(path, usecols=["나이", "대분류", "중분류"])
-    df = df.astype(str).apply(lambda s: s.str.strip())
-
-    return df
-
-@st.cache_data(show_spinner=False)
-def build_hierarchy(df: pd.DataFrame):
-    """
-    { "15세 이상": {"물질오용": [...], "정신건강": [...]}, "15세 미만": {...} }
-    """
-    tree = {}
-    for age_val, dfa in df.groupby("나이"):
-        if age_val not in ["15세 이상", "15세 미만"]:
-            continue
-        main_map = {}
-        for main_val, dfm in dfa.groupby("대분류"):
-            mids = sorted(dfm["중분류"].dropna().unique().tolist())
-            main_map[main_val] = mids
-        tree[age_val] = main_map
-    return tree
+from category_table import EXCEL_PATH, load_hierarchy
+from utils import (
+    generate_conversation, generate_conversation_stream, save_conversation_json,
+    delete_last_conversation, next_variant, response_cache, load_all_dialogues
+)
+from near_duplicates import NearDuplicateError
+from dialogue_validation import DialogueValidationError, validation_stats
+from llm_backend import usage_stats
+from batch_generation import generate_batch, assign_variants, DEFAULT_CONCURRENCY, MAX_CONCURRENCY
+from job_queue import JobQueue, run_worker
 
 def persona_input_tab():
     st.header("[환자 페르소나 설정 및 대화 생성]")
 
     try:
-        cat_df = load_category_table(EXCEL_PATH)
-        hierarchy = build_hierarchy(cat_df)
+        # 엑셀 대신 컴파일된 계층 구조 파일을 읽음 (엑셀이 바뀌었을 때만 다시 컴파일)
+        hierarchy = load_hierarchy(EXCEL_PATH)
     except Exception as e:
         st.error(f"카테고리 엑셀 로드 중 오류: {e}")
         return
@@ -57,6 +36,18 @@ def persona_input_tab():
         middle_category = st.selectbox("중분류 (주증상)", middle_options, key="mid_sel")
 
     ktas_level = st.radio("KTAS 레벨", [1, 2, 3, 4, 5], horizontal=True, key="ktas_sel")
+    use_cache = st.checkbox(
+        "응답 캐시 사용",
+        value=True,
+        key="use_cache",
+        help="같은 페르소나를 저장 전에 다시 생성하거나 마지막 대화를 삭제한 뒤 다시 생성하면 API를 호출하지 않고 캐시된 응답을 사용합니다."
+    )
+    streaming = st.checkbox(
+        "스트리밍 생성",
+        value=True,
+        key="use_streaming",
+        help="대화가 생성되는 대로 한 턴씩 표시하고, 출력 형식이 잘못되면 즉시 중단합니다."
+    )
 
     col1, col2 = st.columns([1, 1])
     with col1:
@@ -68,11 +59,40 @@ def persona_input_tab():
                 "middle_category": middle_category,
                 "ktas_level": ktas_level
             }
-            conversation_json = generate_conversation(persona)
-            st.session_state.last_generated = conversation_json
-            st.json(conversation_json)
-            save_conversation_json(conversation_json)
-            st.success("대화가 생성되어 저장되었습니다.")
+            variant = next_variant(persona)
+            on_turn = None
+            if streaming:
+                live = st.container(border=True)
+
+                def on_turn(turn):
+                    live.markdown(f"**{turn['turn']}. {turn['speaker']}**: {turn['utterance']}")
+
+            try:
+                if streaming:
+                    conversation_json = generate_conversation_stream(persona, variant=variant, use_cache=use_cache, on_turn=on_turn)
+                else:
+                    conversation_json = generate_conversation(persona, variant=variant, use_cache=use_cache)
+            except DialogueValidationError as e:
+                conversation_json = None
+                st.error(f"형식에 맞는 대화를 생성하지 못했습니다: {e}")
+            if conversation_json is not None:
+                retries = conversation_json.get("generation", {}).get("retries", 0)
+                if retries:
+                    st.warning(f"출력 형식 오류로 {retries}회 다시 요청했습니다.")
+                st.session_state.last_generated = conversation_json
+                st.json(conversation_json)
+                try:
+                    save_conversation_json(conversation_json)
+                except NearDuplicateError as e:
+                    st.warning(f"이미 저장된 대화와 거의 같아 저장하지 않았습니다: {e}")
+                else:
+                    st.success("대화가 생성되어 저장되었습니다.")
+                    similar = conversation_json.get("near_duplicates")
+                    if similar:
+                        st.warning(
+                            "이미 저장된 대화와 거의 같습니다: "
+                            + ", ".join(f"대화 {m['id'] + 1} (유사도 {m['similarity']:.2f})" for m in similar)
+                        )
     with col2:
         if st.button("대화 삭제", use_container_width=True):
             delete_last_conversation()
@@ -80,3 +100,155 @@ def persona_input_tab():
             if "last_generated" in st.session_state:
                 del st.session_state["last_generated"]
 
+    stats = response_cache.stats()
+    st.caption(f"응답 캐시: 적중 {stats['hits']} / 미스 {stats['misses']} · 저장된 응답 {stats['entries']}개")
+    vstats = validation_stats()
+    if vstats.get("total"):
+        st.caption(
+            f"응답 검증: {vstats['total']}건 중 로컬 보정 {vstats.get('repaired', 0)}건 ({vstats['repair_rate']:.0%}), "
+            f"재요청 후 통과 {vstats.get('retried', 0)}건, 실패 {vstats.get('failed', 0)}건, 총 재요청 {vstats.get('retries', 0)}회"
+        )
+    ustats = usage_stats()
+    if ustats.get("requests"):
+        st.caption(
+            f"토큰: 요청 {ustats['requests']}건 · 입력 {ustats.get('prompt_tokens', 0):,} "
+            f"(프롬프트 캐시 {ustats.get('cached_tokens', 0):,}, {ustats['cached_rate']:.0%}) · "
+            f"출력 {ustats.get('completion_tokens', 0):,}"
+        )
+
+    st.divider()
+    batch_generation_panel(hierarchy, age, main_category, use_cache)
+
+def batch_generation_panel(hierarchy, age, main_category, use_cache=True):
+    with st.expander("일괄 대화 생성", expanded=False):
+        st.caption(f"선택한 나이({age})와 대분류({main_category})의 중분류 × 성별 × KTAS 레벨 조합으로 대화를 한 번에 생성합니다.")
+
+        middle_options = hierarchy.get(age, {}).get(main_category, [])
+        middles = st.multiselect("중분류", middle_options, default=middle_options, key="batch_mid_sel")
+        genders = st.multiselect("성별", ["남성", "여성"], default=["남성", "여성"], key="batch_gender_sel")
+        levels = st.multiselect("KTAS 레벨", [1, 2, 3, 4, 5], default=[1, 2, 3, 4, 5], key="batch_ktas_sel")
+        repeat = st.number_input("조합당 생성 개수", min_value=1, max_value=20, value=1, step=1, key="batch_repeat")
+        concurrency = st.slider("동시 요청 수", min_value=1, max_value=MAX_CONCURRENCY, value=DEFAULT_CONCURRENCY, key="batch_concurrency")
+        use_queue = st.checkbox(
+            "작업 큐에 기록하고 실행", value=True, key="batch_use_queue",
+            help="항목별 진행 상황을 저장해 두므로 세션이 끊기거나 요청 한도에 걸려도 아래 '이어서 실행'으로 남은 항목만 처리합니다."
+        )
+
+        personas = [
+            {
+                "age": age,
+                "gender": gender,
+                "main_category": main_category,
+                "middle_category": middle,
+                "ktas_level": level
+            }
+            for middle in middles
+            for gender in genders
+            for level in levels
+            for _ in range(int(repeat))
+        ]
+        st.write(f"생성 예정: **{len(personas)}개**")
+
+        if st.button("일괄 생성 시작", type="primary", disabled=not personas, key="batch_start"):
+            if use_queue:
+                queue = JobQueue()
+                job_id = queue.create_job(
+                    personas, assign_variants(personas, load_all_dialogues()),
+                    label=f"{age} / {main_category}", use_cache=use_cache
+                )
+                _run_job(queue, job_id, concurrency)
+            else:
+                progress = st.progress(0.0, text="생성 대기 중...")
+
+                def on_progress(done, total, item):
+                    status = "실패" if item["error"] else "완료"
+                    p = item["persona"]
+                    progress.progress(
+                        done / total,
+                        text=f"{done}/{total} {status}: {p['gender']} / {p['middle_category']} / KTAS {p['ktas_level']}"
+                    )
+
+                report = generate_batch(personas, concurrency=concurrency, on_progress=on_progress, use_cache=use_cache)
+
+                st.success(f"{report['succeeded']}/{report['total']}개 대화가 생성되어 저장되었습니다. (소요 시간 {report['elapsed']:.1f}초)")
+                similar = sum(1 for it in report["items"] if it["result"] and it["result"].get("near_duplicates"))
+                if similar:
+                    st.info(f"{similar}개 대화는 이미 저장된 대화와 거의 같습니다. 전체 대화 목록에서 '거의 같은 대화 묶기'로 확인할 수 있습니다.")
+                if report["failed"]:
+                    st.warning(f"{len(report['failed'])}개 항목이 실패했습니다.")
+                    st.dataframe(
+                        [
+                            {
+                                "성별": it["persona"]["gender"],
+                                "중분류": it["persona"]["middle_category"],
+                                "KTAS 레벨": it["persona"]["ktas_level"],
+                                "오류": it["error"]
+                            }
+                            for it in report["failed"]
+                        ],
+                        use_container_width=True
+                    )
+
+        job_queue_panel(concurrency)
+
+def _run_job(queue, job_id, concurrency):
+    job = queue.job(job_id)
+    done = job["counts"]["done"]
+    progress = st.progress(done / job["total"], text=f"작업 {job_id}: {done}/{job['total']}")
+
+    def on_progress(event):
+        nonlocal done
+        done += event["status"] in ("done", "recovered")
+        p = event["persona"]
+        progress.progress(
+            done / job["total"],
+            text=f"작업 {job_id}: {done}/{job['total']} {event['status']}: {p['gender']} / {p['middle_category']} / KTAS {p['ktas_level']}"
+        )
+
+    report = run_worker(queue, job_id=job_id, concurrency=concurrency, on_progress=on_progress)
+    counts = queue.job(job_id)["counts"]
+    st.success(
+        f"작업 {job_id}: {counts['done']}/{job['total']}개 완료 "
+        f"(이번 실행 {report['done'] + report['recovered']}개, 소요 시간 {report['elapsed']:.1f}초)"
+    )
+    if report["failed"]:
+        st.warning(f"{len(report['failed'])}개 항목이 실패했습니다. 아래 작업 목록에서 다시 시도할 수 있습니다.")
+
+def job_queue_panel(concurrency):
+    """완료되지 않은 작업 목록과 이어서 실행/실패 항목 다시 시도 버튼."""
+    queue = JobQueue()
+    unfinished = [job for job in queue.jobs() if job["counts"]["done"] < job["total"]]
+    if not unfinished:
+        return
+    st.markdown("**완료되지 않은 작업**")
+    for job in unfinished:
+        counts = job["counts"]
+        c1, c2, c3 = st.columns([3, 1, 1])
+        with c1:
+            st.caption(
+                f"{job['id']} · {job['label'] or '-'} · 완료 {counts['done']}/{job['total']}, 대기 {counts['pending']}, "
+                f"진행 중 {counts['leased'] + counts['saving']}, 실패 {counts['failed']}"
+            )
+        with c2:
+            resume = st.button("이어서 실행", key=f"job_resume_{job['id']}", use_container_width=True)
+        with c3:
+            retry = st.button("실패 항목 다시 시도", key=f"job_retry_{job['id']}", disabled=not counts["failed"], use_container_width=True)
+        if retry:
+            queue.retry_failed(job["id"])
+        if resume or retry:
+            _run_job(queue, job["id"], concurrency)
+        if counts["failed"]:
+            with st.expander(f"{job['id']} 실패 항목 {counts['failed']}개", expanded=False):
+                st.dataframe(
+                    [
+                        {
+                            "성별": it["persona"].get("gender"),
+                            "중분류": it["persona"].get("middle_category"),
+                            "KTAS 레벨": it["persona"].get("ktas_level"),
+                            "시도": it["attempts"],
+                            "오류": it["last_error"]
+                        }
+                        for it in queue.items(job["id"], status="failed")
+                    ],
+                    use_container_width=True
+                )
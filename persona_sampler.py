@@ -0,0 +1,92 @@
+import random
+from collections import Counter
+
+GENDERS = ["남성", "여성"]
+KTAS_LEVELS = [1, 2, 3, 4, 5]
+PLAN_MODES = ["grid", "quota", "weighted"]
+
+def cell_key(persona):
+    return (
+        str(persona.get("age", "")),
+        str(persona.get("gender", "")),
+        str(persona.get("main_category", "")),
+        str(persona.get("middle_category", "")),
+        str(persona.get("ktas_level", "")),
+    )
+
+def expand_cells(hierarchy, ages=None, genders=None, levels=None, main_categories=None):
+    """
+    나이 → 대분류 → 중분류 트리를 성별 × KTAS 레벨과 곱해 페르소나 셀 목록으로 펼칩니다.
+    """
+    genders = genders or GENDERS
+    levels = levels or KTAS_LEVELS
+    cells = []
+    for age, main_map in hierarchy.items():
+        if ages and age not in ages:
+            continue
+        for main_category, middles in main_map.items():
+            if main_categories and main_category not in main_categories:
+                continue
+            for middle_category in middles:
+                for gender in genders:
+                    for level in levels:
+                        cells.append({
+                            "age": age,
+                            "gender": gender,
+                            "main_category": main_category,
+                            "middle_category": middle_category,
+                            "ktas_level": level
+                        })
+    return cells
+
+def count_existing(dialogues):
+    return Counter(cell_key(entry.get("persona", {})) for entry in dialogues)
+
+def cell_weight(persona, weights):
+    """
+    weights 예: {"ktas_level": {"1": 3, "2": 2}, "age": {"15세 미만": 0.5}}
+    지정하지 않은 값의 가중치는 1입니다.
+    """
+    w = 1.0
+    for field, table in (weights or {}).items():
+        w *= float(table.get(str(persona.get(field, "")), 1.0))
+    return w
+
+def build_plan(cells, mode="quota", quota=1, samples=None, weights=None, existing=None, seed=None):
+    """
+    생성 계획(페르소나 리스트)을 만듭니다.
+
+    - grid: 모든 셀을 1개씩 (quota=1과 동일)
+    - quota: 모든 셀을 quota개까지
+    - weighted: 셀별 가중치에 따라 samples개를 뽑되, 셀당 quota개를 넘기지 않음
+
+    existing(셀별 기존 대화 수)이 주어지면 이미 채워진 만큼은 계획에서 제외합니다.
+    """
+    if mode not in PLAN_MODES:
+        raise ValueError(f"알 수 없는 모드입니다: {mode} (가능: {PLAN_MODES})")
+    if mode == "grid":
+        quota = 1
+    existing = existing or Counter()
+
+    remaining = [(cell, quota - existing[cell_key(cell)]) for cell in cells]
+    remaining = [(cell, n) for cell, n in remaining if n > 0]
+
+    if mode in ("grid", "quota"):
+        return [dict(cell) for cell, n in remaining for _ in range(n)]
+
+    if samples is None:
+        raise ValueError("weighted 모드에는 samples 값이 필요합니다.")
+    rng = random.Random(seed)
+    pool = [[cell, n, cell_weight(cell, weights)] for cell, n in remaining]
+    pool = [slot for slot in pool if slot[2] > 0]
+    plan = []
+    while pool and len(plan) < samples:
+        slot = rng.choices(pool, weights=[s[2] for s in pool])[0]
+        plan.append(dict(slot[0]))
+        slot[1] -= 1
+        if slot[1] <= 0:
+            pool.remove(slot)
+    return plan
+
+def summarize_plan(plan, field="ktas_level"):
+    return dict(sorted(Counter(str(p.get(field, "")) for p in plan).items()))
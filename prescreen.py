@@ -0,0 +1,258 @@
+"""
+모델 없이 규칙만으로 대화의 결함을 찾는 사전 검사 (사람/LLM 평가 전에 거르기 위함).
+
+  - 여러 대화를 한 번에 검사: 턴을 평평한 numpy 배열로 펼쳐 턴 번호/화자 규칙을 배열 연산으로,
+    발화 글자 종류(한글/로마자)와 물음표 수는 모든 발화를 이어 붙인 코드 포인트 배열로,
+    한 번에 여러 항목을 묻는 질문은 물음표가 하나인 간호사 발화만 이어 붙여 항목별 정규식으로 셈
+  - 결과 {"version", "score"(0~100), "passed", "flags": {규칙: 해당 개수}}는 레코드의 prescreen 필드로 저장
+    (대화를 만드는 쪽에서 검사: utils.save_conversation_json, dialogue_ingest.ingest. 결과가 없는 예전 대화나
+    규칙이 바뀐 뒤의 대화는 --update로 다시 검사해 저장소에 기록)
+  - FAILING_FLAGS 중 하나라도 걸리거나 점수가 PASS_SCORE 미만이면 통과하지 못함
+
+    python prescreen.py [--source generated|own]   # 저장소 전체 검사 요약
+    python prescreen.py --update [--source ...]      # 결과가 없거나 이전 버전인 대화를 검사해 기록
+    python prescreen.py --check                      # 규칙 예시(통과/걸려야 하는 대화) 확인
+"""
+import argparse
+import re
+
+from dialogue_validation import SPEAKERS, OPENING_PHRASE
+
+# 규칙이나 점수 계산이 바뀌면 올림 (이전 버전 결과는 다시 계산)
+PRESCREEN_VERSION = 1
+PASS_SCORE = 60
+# KTAS 레벨별 최소 턴(I/CHATGPT 한 쌍) 수. 위급할수록 확인할 위험 신호가 많음
+MIN_TURNS = {1: 6, 2: 6, 3: 5, 4: 4, 5: 3}
+DEFAULT_MIN_TURNS = 3
+# 한글 비율이 이보다 낮은 발화(글자 4개 이상)는 한국어가 아닌 발화로 봄
+# (숫자와 대문자 약어 COPD/NRS/CT 등은 한국어 발화에도 흔하므로 세지 않음)
+MIN_HANGUL_RATIO = 0.5
+
+FLAG_LABELS = {
+    "format": "턴 목록 형식이 아님",
+    "empty_utterance": "빈 발화",
+    "speaker": "I/CHATGPT 외의 화자",
+    "turn_order": "턴 번호 역행/누락",
+    "unpaired": "I/CHATGPT 쌍이 맞지 않음",
+    "no_opening": "\"환자 분 들어오세요\"로 시작하지 않음",
+    "non_korean": "한국어가 아닌 발화",
+    "multi_question": "한 번에 여러 항목을 질문",
+    "too_short": "KTAS 레벨에 비해 짧은 대화",
+}
+# 규칙별 감점 (개수와 관계없이 한 번), multi_question만 발화마다 감점 (최대 3번)
+PENALTIES = {
+    "format": 100, "empty_utterance": 20, "speaker": 30, "turn_order": 20, "unpaired": 20,
+    "no_opening": 10, "non_korean": 25, "multi_question": 10, "too_short": 25,
+}
+FAILING_FLAGS = {"format", "empty_utterance", "speaker", "turn_order", "unpaired", "non_korean", "too_short"}
+
+# 간호사 발화 하나에 두 개 이상 나오면 여러 항목을 한 번에 묻는 것으로 봄 (프롬프트 규칙 7)
+MEDICAL_ITEMS = {
+    "활력징후": r"활력\s*징후|바이탈",
+    "혈압": r"혈압(?!약)",
+    "맥박": r"맥박|심박",
+    "체온": r"체온|발열",
+    "호흡": r"호흡수|산소\s*포화도",
+    "과거력": r"과거\s*(?:력|병력)|지병|앓(?:은|으신)",
+    "약물": r"복용|드시는\s*약|먹는\s*약|약물(?!\s*(?:알레르기|알러지))",
+    "알레르기": r"(?:약물\s*)?(?:알레르기|알러지)",
+    "외상": r"다치|외상|부딪",
+    "통증 정도": r"NRS|몇\s*점",
+    "발병 시점": r"언제부터",
+    "동반 증상": r"동반|다른\s*증상",
+    "임신": r"임신",
+    "음주/흡연": r"음주|흡연|담배",
+}
+_ITEM_RES = [re.compile(pattern) for pattern in MEDICAL_ITEMS.values()]
+
+def _turn_number(value):
+    if type(value) is int:
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return -1
+
+def _ktas(record):
+    try:
+        return int((record.get("persona") or {}).get("ktas_level"))
+    except (TypeError, ValueError):
+        return None
+
+def prescreen_many(records):
+    """레코드 목록을 한 번에 검사해 같은 순서의 결과 목록을 돌려줍니다."""
+    import numpy as np
+
+    n = len(records)
+    is_turns = np.zeros(n, dtype=bool)
+    dlg, turn, speaker, texts = [], [], [], []
+    speaker_codes = {s: i for i, s in enumerate(SPEAKERS)}
+    for i, record in enumerate(records):
+        turns = record.get("dialogue")
+        if not isinstance(turns, list) or not turns or not all(isinstance(t, dict) for t in turns):
+            continue
+        is_turns[i] = True
+        dlg.extend([i] * len(turns))
+        turn.extend([_turn_number(t.get("turn")) for t in turns])
+        speaker.extend([speaker_codes.get(t.get("speaker"), -1) for t in turns])
+        texts.extend([t.get("utterance") if isinstance(t.get("utterance"), str) else "" for t in turns])
+
+    dlg = np.array(dlg, dtype=np.int64)
+    turn = np.array(turn, dtype=np.int64)
+    speaker = np.array(speaker, dtype=np.int64)
+    m = len(texts)
+
+    def per_dialogue(mask):
+        return np.bincount(dlg, weights=mask, minlength=n).astype(np.int64)
+
+    # 턴 규칙: k번째 발화는 turn k//2+1, 화자는 I, CHATGPT 순서
+    lengths = np.bincount(dlg, minlength=n)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    pos = np.arange(m) - starts[dlg]
+    flags = {
+        "speaker": per_dialogue(speaker < 0),
+        "turn_order": per_dialogue(turn != pos // 2 + 1),
+        "unpaired": per_dialogue((speaker >= 0) & (speaker != pos % 2)),
+    }
+
+    # 발화 글자 종류: 모든 발화를 이어 붙인 코드 포인트 배열에서 발화별 합계
+    text_lengths = np.fromiter((len(t) + 1 for t in texts), dtype=np.int64, count=m)
+    codes = np.frombuffer("\n".join(texts).encode("utf-32-le"), dtype=np.uint32) if m else np.zeros(0, dtype=np.uint32)
+    owner = np.repeat(np.arange(m), text_lengths)[:len(codes)]
+
+    def per_utterance(mask):
+        return np.bincount(owner, weights=mask, minlength=m)
+
+    hangul = per_utterance(((codes >= 0xAC00) & (codes <= 0xD7A3)) | ((codes >= 0x3131) & (codes <= 0x318E)))
+    lower = (codes >= ord("a")) & (codes <= ord("z"))
+    # 로마자는 소문자와 소문자 앞의 대문자(단어 첫 글자)만: 대문자만 이어진 약어는 빼고 셈
+    capital = (codes >= ord("A")) & (codes <= ord("Z")) & np.append(lower[1:], False)
+    latin = per_utterance(lower | capital)
+    other = per_utterance(((codes >= 0x3040) & (codes <= 0x30FF)) | ((codes >= 0x4E00) & (codes <= 0x9FFF)))
+    letters = hangul + latin + other
+    questions = per_utterance(codes == ord("?"))
+    blank = per_utterance(codes > 0x20) == 0
+
+    # 여러 항목 질문: 물음표가 하나인 간호사 발화만 이어 붙여 항목별 정규식으로 찾은 (발화, 항목) 쌍의 종류 수
+    nurse = speaker == 0
+    candidates = np.flatnonzero(nurse & (questions == 1))
+    joined = "\n".join(texts[k] for k in candidates)
+    candidate_starts = np.concatenate(([0], np.cumsum(text_lengths[candidates])[:-1]))
+    items = np.zeros(m, dtype=np.int64)
+    for pattern in _ITEM_RES:
+        positions = np.fromiter((match.start() for match in pattern.finditer(joined)), dtype=np.int64)
+        found = np.unique(np.searchsorted(candidate_starts, positions, side="right") - 1)
+        items[candidates[found]] += 1
+    flags["empty_utterance"] = per_dialogue(blank)
+    flags["non_korean"] = per_dialogue((letters >= 4) & (hangul < letters * MIN_HANGUL_RATIO))
+    flags["multi_question"] = per_dialogue(nurse & ((questions >= 2) | ((items >= 2) & (questions >= 1))))
+
+    first = starts[is_turns] if m else np.zeros(0, dtype=np.int64)
+    no_opening = np.zeros(n, dtype=np.int64)
+    no_opening[is_turns] = [
+        0 if speaker[k] == 0 and OPENING_PHRASE in texts[k] else 1 for k in first
+    ]
+    flags["no_opening"] = no_opening
+    min_turns = np.array([MIN_TURNS.get(_ktas(record), DEFAULT_MIN_TURNS) for record in records], dtype=np.int64)
+    flags["too_short"] = (is_turns & ((lengths + 1) // 2 < min_turns)).astype(np.int64)
+
+    results = []
+    for i in range(n):
+        if not is_turns[i]:
+            found = {"format": 1}
+        else:
+            found = {name: int(values[i]) for name, values in flags.items() if values[i]}
+        penalty = sum(PENALTIES[name] * (min(count, 3) if name == "multi_question" else 1) for name, count in found.items())
+        score = max(0, 100 - penalty)
+        results.append({
+            "version": PRESCREEN_VERSION,
+            "score": score,
+            "passed": score >= PASS_SCORE and not FAILING_FLAGS & found.keys(),
+            "flags": found,
+        })
+    return results
+
+def prescreen(record):
+    return prescreen_many([record])[0]
+
+def is_current(record):
+    return (record.get("prescreen") or {}).get("version") == PRESCREEN_VERSION
+
+def update_store(store, chunk_size=2000):
+    """결과가 없거나 이전 버전인 저장소의 대화를 청크마다 검사해 store.update_prescreen으로 기록하고, 기록한 대화 수를 돌려줍니다."""
+    updated = 0
+    for chunk in store.iter_query(chunk_size=chunk_size):
+        stale = [record for record in chunk if not is_current(record)]
+        if stale:
+            updated += store.update_prescreen({record["id"]: result for record, result in zip(stale, prescreen_many(stale))})
+    return updated
+
+def describe(result):
+    """UI용 한 줄 요약 (예: "72점 · 한 번에 여러 항목을 질문 2")."""
+    parts = [f"{result['score']}점"]
+    parts += [f"{FLAG_LABELS.get(name, name)}" + (f" {count}" if count > 1 else "") for name, count in result["flags"].items()]
+    return " · ".join(parts)
+
+def summarize(results):
+    """결과 목록의 {"total", "passed", "flags": {규칙: 걸린 대화 수}}."""
+    summary = {"total": len(results), "passed": 0, "flags": {name: 0 for name in FLAG_LABELS}}
+    for result in results:
+        summary["passed"] += result["passed"]
+        for name in result["flags"]:
+            summary["flags"][name] += 1
+    return summary
+
+def _turns(*utterances):
+    return [{"turn": i // 2 + 1, "speaker": SPEAKERS[i % 2], "utterance": text} for i, text in enumerate(utterances)]
+
+# --check로 확인하는 예시: (설명, 대화, 걸려야 하는 규칙 목록). 빈 목록이면 아무 규칙에도 걸리지 않아야 함
+CHECK_CASES = [
+    ("약어와 숫자가 섞인 답", _turns(
+        "3번 환자분 들어오세요.", "저는 67세 남성입니다.", "과거 병력이 있나요?", "과거력: COPD.",
+        "통증은 몇 점인가요?", "NRS 7점이요.", "검사 결과 들으셨나요?", "CT랑 ECG 찍었어요. BP 150/90이래요.",
+    ), []),
+    ("약물 알레르기 질문", _turns(
+        "12번 환자분 들어오세요.", "저는 30세 여성입니다.", "약물 알레르기가 있으신가요?", "페니실린 알레르기가 있어요.",
+        "복용 중인 약이 있나요?", "아스피린 100mg 먹고 있어요.",
+    ), []),
+    ("영어 발화", _turns(
+        "5번 환자분 들어오세요.", "I have had chest pain since this morning.", "어디가 아프신가요?", "가슴이요.",
+        "언제부터 아프셨나요?", "오늘 아침부터요.",
+    ), ["non_korean"]),
+    ("혈압과 과거력을 한 번에 질문", _turns(
+        "7번 환자분 들어오세요.", "저는 45세 남성입니다.", "혈압이랑 과거력 알려주시겠어요?", "130에 80이고 고혈압이 있어요.",
+        "언제부터 아프셨나요?", "어제부터요.",
+    ), ["multi_question"]),
+]
+
+def check():
+    """CHECK_CASES와 생성 프롬프트(utils.SYSTEM_PROMPT)의 예시 대화를 검사해 기대와 다른 예시의 설명 목록을 돌려줍니다."""
+    import json
+    from dialogue_validation import normalize_turns
+    from utils import SYSTEM_PROMPT
+
+    example, _ = normalize_turns(json.loads(SYSTEM_PROMPT.split("--- [Example - Output JSON] ---", 1)[1]))
+    cases = CHECK_CASES + [("생성 프롬프트의 예시 대화", example, [])]
+    results = prescreen_many([{"dialogue": turns} for _, turns, _ in cases])
+    return [f"{name}: {describe(result)}" for (name, _, expected), result in zip(cases, results)
+            if set(result["flags"]) != set(expected)]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="저장된 대화 전체 사전 검사 요약")
+    parser.add_argument("--source", choices=["generated", "own"], default="generated")
+    parser.add_argument("--update", action="store_true", help="결과가 없거나 이전 버전인 대화를 검사해 저장소에 기록")
+    parser.add_argument("--check", action="store_true", help="규칙 예시(통과/걸려야 하는 대화)만 검사")
+    args = parser.parse_args()
+    if args.check:
+        wrong = check()
+        print("\n".join(wrong) if wrong else f"예시 {len(CHECK_CASES) + 1}개 모두 기대한 결과")
+        raise SystemExit(1 if wrong else 0)
+    from bulk_judge import open_source
+    store = open_source(args.source)
+    if args.update:
+        print(f"대화 {update_store(store)}개의 사전 검사 결과를 기록했습니다.")
+    results = [result for chunk in store.iter_query() for result in prescreen_many(chunk)]
+    summary = summarize(results)
+    print(f"대화 {summary['total']}개 중 통과 {summary['passed']}개")
+    for name, count in summary["flags"].items():
+        print(f"  {FLAG_LABELS[name]}: {count}")
@@ -0,0 +1,482 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dialogue_store import normalize_evaluations, next_evaluation, dialogue_hash, REVIEW_SCORE_GAP
+
+# 삭제 기록(deleted_dialogues)은 최근 이만큼만 남김. 그보다 오래된 cursor로 changes()를 부르면 처음부터 다시 (reset)
+DELETED_LOG_KEEP = 10000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dialogues (
+    id INTEGER PRIMARY KEY,
+    age TEXT,
+    gender TEXT,
+    main_category TEXT,
+    middle_category TEXT,
+    ktas_level INTEGER,
+    evaluator TEXT,
+    question_score INTEGER,
+    realism_score INTEGER,
+    record TEXT NOT NULL,
+    evaluation TEXT,
+    content_hash TEXT,
+    prescreen_score INTEGER,
+    prescreen_passed INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_dialogues_category ON dialogues(main_category, middle_category);
+CREATE INDEX IF NOT EXISTS idx_dialogues_ktas ON dialogues(ktas_level, age, evaluator);
+CREATE INDEX IF NOT EXISTS idx_dialogues_age ON dialogues(age);
+CREATE INDEX IF NOT EXISTS idx_dialogues_gender ON dialogues(gender);
+CREATE INDEX IF NOT EXISTS idx_dialogues_evaluator ON dialogues(evaluator);
+CREATE INDEX IF NOT EXISTS idx_dialogues_scores ON dialogues(question_score, realism_score);
+CREATE INDEX IF NOT EXISTS idx_dialogues_content_hash ON dialogues(content_hash);
+CREATE INDEX IF NOT EXISTS idx_dialogues_prescreen ON dialogues(prescreen_passed);
+CREATE TABLE IF NOT EXISTS evaluations (
+    dialogue_id INTEGER NOT NULL REFERENCES dialogues(id) ON DELETE CASCADE,
+    evaluator TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    updated_at REAL,
+    question_score INTEGER,
+    realism_score INTEGER,
+    evaluation TEXT NOT NULL,
+    PRIMARY KEY (dialogue_id, evaluator)
+);
+CREATE INDEX IF NOT EXISTS idx_evaluations_evaluator ON evaluations(evaluator);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', '0');
+-- 다음에 쓸 대화 ID. 끝에 있던 대화를 지워도 줄지 않으므로 ID를 다시 쓰지 않음
+INSERT OR IGNORE INTO meta (key, value) VALUES ('next_id', (SELECT COALESCE(MAX(id), 0) + 1 FROM dialogues));
+CREATE TRIGGER IF NOT EXISTS trg_dialogues_next_id AFTER INSERT ON dialogues BEGIN
+    UPDATE meta SET value = MAX(CAST(value AS INTEGER), NEW.id + 1) WHERE key = 'next_id';
+END;
+-- changes()용: 지운 대화 ID 기록과 DB 파일을 새로 만들 때마다 바뀌는 식별자
+CREATE TABLE IF NOT EXISTS deleted_dialogues (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS trg_dialogues_deleted AFTER DELETE ON dialogues BEGIN
+    INSERT INTO deleted_dialogues (id) VALUES (OLD.id);
+END;
+INSERT OR IGNORE INTO meta (key, value) VALUES ('token', lower(hex(randomblob(16))));
+-- 이 seq 이하의 삭제 기록은 지웠음
+INSERT OR IGNORE INTO meta (key, value) VALUES ('deleted_floor', '0');
+CREATE TRIGGER IF NOT EXISTS trg_dialogues_insert AFTER INSERT ON dialogues BEGIN
+    UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version';
+END;
+CREATE TRIGGER IF NOT EXISTS trg_dialogues_update AFTER UPDATE ON dialogues BEGIN
+    UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version';
+END;
+CREATE TRIGGER IF NOT EXISTS trg_dialogues_delete AFTER DELETE ON dialogues BEGIN
+    UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version';
+END;
+CREATE TRIGGER IF NOT EXISTS trg_evaluations_insert AFTER INSERT ON evaluations BEGIN
+    UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version';
+END;
+CREATE TRIGGER IF NOT EXISTS trg_evaluations_update AFTER UPDATE ON evaluations BEGIN
+    UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version';
+END;
+"""
+
+# evaluations 테이블이 생기기 전의 DB: dialogues.evaluation을 그 평가자의 평가(버전 0)로 옮김
+MIGRATE_EVALUATIONS_SQL = """
+INSERT OR IGNORE INTO evaluations (dialogue_id, evaluator, version, updated_at, question_score, realism_score, evaluation)
+SELECT id, COALESCE(evaluator, ''), 0, NULL, question_score, realism_score, evaluation
+FROM dialogues WHERE evaluation IS NOT NULL AND evaluation != '{}'
+"""
+
+UPSERT_EVALUATION_SQL = """
+INSERT INTO evaluations (dialogue_id, evaluator, version, updated_at, question_score, realism_score, evaluation)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (dialogue_id, evaluator) DO UPDATE SET
+    version = excluded.version,
+    updated_at = excluded.updated_at,
+    question_score = excluded.question_score,
+    realism_score = excluded.realism_score,
+    evaluation = excluded.evaluation
+"""
+
+PERSONA_COLUMNS = ["age", "gender", "main_category", "middle_category"]
+
+# dialogue_store.needs_review()와 같은 조건: 자동 평가(evaluation에 judge 필드)가 검토를 요청했는데 사람 평가가 없거나,
+# 사람 평가와 점수가 REVIEW_SCORE_GAP 이상 다름
+_HUMAN = "h.dialogue_id = j.dialogue_id AND h.evaluator != '' AND json_extract(h.evaluation, '$.judge') IS NULL"
+REVIEW_SQL = f"""EXISTS (
+    SELECT 1 FROM evaluations j
+    WHERE j.dialogue_id = dialogues.id AND j.evaluator != '' AND json_extract(j.evaluation, '$.judge') IS NOT NULL AND (
+        (json_extract(j.evaluation, '$.review') AND NOT EXISTS (SELECT 1 FROM evaluations h WHERE {_HUMAN}))
+        OR EXISTS (
+            SELECT 1 FROM evaluations h WHERE {_HUMAN} AND (
+                ABS(h.question_score - j.question_score) >= {REVIEW_SCORE_GAP}
+                OR ABS(h.realism_score - j.realism_score) >= {REVIEW_SCORE_GAP}
+            )
+        )
+    )
+)"""
+
+def _ktas(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def _row_values(record):
+    persona = record.get("persona") or {}
+    evaluation = record.get("evaluation")
+    body = {k: v for k, v in record.items() if k not in ("id", "evaluation", "evaluations")}
+    return (
+        persona.get("age"),
+        persona.get("gender"),
+        persona.get("main_category"),
+        persona.get("middle_category"),
+        _ktas(persona.get("ktas_level")),
+        (evaluation or {}).get("evaluator") or None,
+        (evaluation or {}).get("question"),
+        (evaluation or {}).get("realism"),
+        json.dumps(body, ensure_ascii=False),
+        json.dumps(evaluation, ensure_ascii=False) if evaluation is not None else None,
+        record.get("content_hash") or dialogue_hash(record.get("dialogue")),
+        (record.get("prescreen") or {}).get("score"),
+        _flag((record.get("prescreen") or {}).get("passed")),
+    )
+
+def _flag(value):
+    return None if value is None else int(bool(value))
+
+def _evaluation_values(dialogue_id, evaluation):
+    return (
+        dialogue_id,
+        evaluation.get("evaluator") or "",
+        evaluation.get("version", 1),
+        evaluation.get("updated_at"),
+        evaluation.get("question"),
+        evaluation.get("realism"),
+        json.dumps(evaluation, ensure_ascii=False),
+    )
+
+def _load_evaluation(version, evaluation):
+    # 버전은 컬럼 값이 기준 (예전 DB에서 옮겨 온 평가에는 JSON 안에 버전이 없음)
+    return dict(json.loads(evaluation), version=version)
+
+def _from_row(row):
+    rid, record, evaluation = row
+    rec = json.loads(record)
+    rec["id"] = rid
+    if evaluation is not None:
+        rec["evaluation"] = json.loads(evaluation)
+    return rec
+
+def _insert_records(conn, records):
+    records = [normalize_evaluations(rec) for rec in records]
+    conn.executemany(INSERT_SQL, [(rec["id"],) + _row_values(rec) for rec in records])
+    conn.executemany(UPSERT_EVALUATION_SQL, [
+        _evaluation_values(rec["id"], evaluation)
+        for rec in records for evaluation in rec["evaluations"].values()
+    ])
+def _trim_deleted(conn):
+    floor = conn.execute("SELECT COALESCE(MAX(seq), 0) - ? FROM deleted_dialogues", (DELETED_LOG_KEEP,)).fetchone()[0]
+    if floor > 0 and conn.execute("SELECT 1 FROM deleted_dialogues WHERE seq <= ? LIMIT 1", (floor,)).fetchone():
+        conn.execute("DELETE FROM deleted_dialogues WHERE seq <= ?", (floor,))
+        conn.execute("UPDATE meta SET value = MAX(CAST(value AS INTEGER), ?) WHERE key = 'deleted_floor'", (floor,))
+
+def _where(filters):
+    clauses, params = [], []
+    for key, value in (filters or {}).items():
+        if value is None or value == []:
+            continue
+        if key == "ids":
+            # ID가 많아도 변수 하나로 넘김 (SQLite 변수 개수 한도)
+            clauses.append("id IN (SELECT value FROM json_each(?))")
+            params.append(json.dumps(sorted(value)))
+        elif key in PERSONA_COLUMNS:
+            clauses.append(f"{key} = ?")
+            params.append(str(value))
+        elif key == "ktas_level":
+            levels = value if isinstance(value, (list, tuple, set)) else [value]
+            clauses.append(f"ktas_level IN ({', '.join('?' for _ in levels)})")
+            params.extend(_ktas(v) for v in levels)
+        elif key == "evaluator":
+            clauses.append("EXISTS (SELECT 1 FROM evaluations e WHERE e.dialogue_id = dialogues.id AND e.evaluator = ?)")
+            params.append(value)
+        elif key == "evaluated":
+            # 사람 평가만 셈 (LLM 자동 평가만 있으면 미평가)
+            exists = (
+                "EXISTS (SELECT 1 FROM evaluations e WHERE e.dialogue_id = dialogues.id AND e.evaluator != '' "
+                "AND json_extract(e.evaluation, '$.judge') IS NULL)"
+            )
+            clauses.append(exists if value else f"NOT {exists}")
+        elif key == "review":
+            clauses.append(REVIEW_SQL if value else f"NOT {REVIEW_SQL}")
+        elif key == "prescreen":
+            clauses.append("prescreen_passed = ?" if value else "COALESCE(prescreen_passed, 0) = ?")
+            params.append(int(bool(value)))
+        else:
+            raise ValueError(f"알 수 없는 필터입니다: {key}")
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+INSERT_SQL = """
+INSERT INTO dialogues (id, age, gender, main_category, middle_category, ktas_level,
+                       evaluator, question_score, realism_score, record, evaluation, content_hash,
+                       prescreen_score, prescreen_passed)
+VALUES (COALESCE(?, (SELECT CAST(value AS INTEGER) FROM meta WHERE key = 'next_id')), ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+class SqliteDialogueStore:
+    """
+    페르소나/평가 필드를 색인 컬럼으로 가진 SQLite 대화 저장소.
+    JsonlDialogueStore와 같은 메서드를 제공하며, 필터링과 페이지 조회는 SQL로 처리합니다.
+    평가는 (대화, 평가자)마다 한 행인 evaluations 테이블에 버전과 함께 저장하고,
+    dialogues.evaluation에는 가장 최근 평가를 둡니다. 평가 저장은 BEGIN IMMEDIATE 트랜잭션 안에서
+    버전을 확인한 뒤 그 행만 바꿉니다.
+    """
+
+    def __init__(self, path, import_from=None):
+        self.path = path
+        self._import_from = import_from
+        self._lock = threading.RLock()
+        self._ready = False
+
+    def _setup(self):
+        # 스키마 생성/마이그레이션/가져오기는 처음 접근할 때 한 번 (저장소를 만들기만 해서는 파일을 건드리지 않음)
+        with self._lock:
+            if self._ready:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with self._open() as conn:
+                conn.executescript(SCHEMA)
+                if not conn.execute("SELECT 1 FROM meta WHERE key = 'evaluations_migrated'").fetchone():
+                    conn.execute(MIGRATE_EVALUATIONS_SQL)
+                    conn.execute("INSERT INTO meta (key, value) VALUES ('evaluations_migrated', '1')")
+            if self._import_from is not None:
+                self._import_once(self._import_from)
+            self._ready = True
+
+    @contextmanager
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _connect(self):
+        if not self._ready:
+            self._setup()
+        return self._open()
+
+    def _import_once(self, source):
+        with self._lock, self._open() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'imported'").fetchone():
+                return
+            _insert_records(conn, source.load())
+            conn.execute("INSERT INTO meta (key, value) VALUES ('imported', ?)", (source.path,))
+
+    def _attach_evaluations(self, conn, records):
+        if not records:
+            return records
+        by_id = {rec["id"]: rec for rec in records}
+        for rec in records:
+            rec["evaluations"] = {}
+        # 해당 ID의 평가만 읽음. ID 목록은 JSON 배열 하나로 넘김 (몇 개든 SQLite 변수 개수 한도에 걸리지 않음)
+        sql = (
+            "SELECT dialogue_id, evaluator, version, evaluation FROM evaluations "
+            "WHERE dialogue_id IN (SELECT value FROM json_each(?)) ORDER BY updated_at"
+        )
+        for rid, evaluator, version, evaluation in conn.execute(sql, (json.dumps(list(by_id)),)):
+            by_id[rid]["evaluations"][evaluator] = _load_evaluation(version, evaluation)
+        for rec in records:
+            if "evaluation" in rec and rec["evaluations"]:
+                latest = rec["evaluation"].get("evaluator") or ""
+                rec["evaluation"] = rec["evaluations"].get(latest, rec["evaluation"])
+        return records
+
+    # ---------- 공개 API ----------
+    def load(self):
+        return self.query()
+
+    def ids(self):
+        with self._connect() as conn:
+            return [r[0] for r in conn.execute("SELECT id FROM dialogues ORDER BY id")]
+
+    def get(self, dialogue_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT id, record, evaluation FROM dialogues WHERE id = ?", (dialogue_id,)).fetchone()
+            return self._attach_evaluations(conn, [_from_row(row)])[0] if row else None
+
+    def query(self, filters=None, limit=None, offset=0):
+        where, params = _where(filters)
+        sql = f"SELECT id, record, evaluation FROM dialogues{where} ORDER BY id LIMIT ? OFFSET ?"
+        with self._connect() as conn:
+            rows = conn.execute(sql, params + [-1 if limit is None else limit, offset]).fetchall()
+            return self._attach_evaluations(conn, [_from_row(r) for r in rows])
+
+    def iter_query(self, filters=None, chunk_size=500):
+        """
+        query()와 같은 순서의 결과를 chunk_size개씩 나눠 냅니다. OFFSET 대신 마지막 ID 다음부터 읽으므로
+        뒤쪽 청크도 앞쪽만큼 빠릅니다. (평가도 청크의 ID만 읽음)
+        """
+        where, params = _where(filters)
+        where = f"{where} AND id > ?" if where else " WHERE id > ?"
+        last = -1
+        while True:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    f"SELECT id, record, evaluation FROM dialogues{where} ORDER BY id LIMIT ?", params + [last, chunk_size]
+                ).fetchall()
+                records = self._attach_evaluations(conn, [_from_row(r) for r in rows])
+            if not records:
+                return
+            yield records
+            last = records[-1]["id"]
+
+    def count(self, filters=None):
+        where, params = _where(filters)
+        with self._connect() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM dialogues{where}", params).fetchone()[0]
+
+    def version(self):
+        """저장소 내용이 바뀔 때마다 달라지는 값 (트리거가 meta.version을 올림)."""
+        with self._connect() as conn:
+            return conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    def changes(self, cursor=None):
+        """
+        cursor 이후 추가/삭제된 대화 ID: {"cursor", "reset", "added", "deleted"} (JsonlDialogueStore.changes와 같음).
+        ID는 다시 쓰지 않고 커밋 순서대로 커지므로 추가는 마지막으로 본 ID보다 큰 ID, 삭제는 deleted_dialogues 기록으로 찾습니다.
+        삭제 기록은 최근 DELETED_LOG_KEEP개만 남기므로, 그보다 뒤처진 cursor는 reset으로 돌려줍니다.
+        """
+        with self._connect() as conn:
+            # 읽는 동안 한 시점의 내용만 보도록 읽기 트랜잭션 안에서
+            conn.execute("BEGIN")
+            token = conn.execute("SELECT value FROM meta WHERE key = 'token'").fetchone()[0]
+            last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM deleted_dialogues").fetchone()[0]
+            floor = int(conn.execute("SELECT value FROM meta WHERE key = 'deleted_floor'").fetchone()[0])
+            # 다른 DB 파일이거나, 그 뒤의 삭제 기록이 이미 지워졌으면 처음부터
+            if cursor is None or cursor[0] != token or cursor[2] < floor:
+                added = [r[0] for r in conn.execute("SELECT id FROM dialogues ORDER BY id")]
+                last_id = max(added, default=0)
+                return {"cursor": (token, last_id, last_seq), "reset": True, "added": added, "deleted": []}
+            _, last_id, seq = cursor
+            added = [r[0] for r in conn.execute("SELECT id FROM dialogues WHERE id > ? ORDER BY id", (last_id,))]
+            deleted = [r[0] for r in conn.execute(
+                "SELECT id FROM deleted_dialogues WHERE seq > ? AND seq <= ? ORDER BY seq", (seq, last_seq)
+            )]
+            return {"cursor": (token, max(added, default=last_id), last_seq), "reset": False, "added": added, "deleted": deleted}
+
+    def evaluations(self):
+        """
+        평가가 있는 레코드의 [{"id", "rev", "persona", "evaluations"}] 목록.
+        rev는 (평가자, 버전) 목록이라 평가가 바뀐 레코드만 다시 계산할 수 있습니다.
+        """
+        sql = (
+            "SELECT d.id, d.age, d.gender, d.main_category, d.middle_category, d.ktas_level, "
+            "e.evaluator, e.version, e.evaluation "
+            "FROM evaluations e JOIN dialogues d ON d.id = e.dialogue_id ORDER BY d.id, e.evaluator"
+        )
+        with self._connect() as conn:
+            rows = conn.execute(sql).fetchall()
+        result = {}
+        for rid, age, gender, main, middle, level, evaluator, version, evaluation in rows:
+            item = result.get(rid)
+            if item is None:
+                persona = {"age": age, "gender": gender, "main_category": main, "middle_category": middle, "ktas_level": level}
+                item = result[rid] = {"id": rid, "rev": (), "persona": persona, "evaluations": []}
+            item["rev"] += ((evaluator, version),)
+            item["evaluations"].append(_load_evaluation(version, evaluation))
+        return list(result.values())
+
+    def content_hashes(self):
+        with self._lock, self._connect() as conn:
+            return {h for (h,) in conn.execute("SELECT content_hash FROM dialogues")}
+
+    def add(self, record):
+        record = normalize_evaluations(record)
+        with self._lock, self._connect() as conn:
+            cur = conn.execute(INSERT_SQL, (None,) + _row_values(record))
+            rid = cur.lastrowid
+            conn.executemany(UPSERT_EVALUATION_SQL, [_evaluation_values(rid, e) for e in record["evaluations"].values()])
+            return rid
+
+    def add_many(self, records):
+        records = [normalize_evaluations(rec) for rec in records]
+        with self._lock, self._connect() as conn:
+            ids = [conn.execute(INSERT_SQL, (None,) + _row_values(rec)).lastrowid for rec in records]
+            conn.executemany(UPSERT_EVALUATION_SQL, [
+                _evaluation_values(rid, evaluation)
+                for rid, rec in zip(ids, records) for evaluation in rec["evaluations"].values()
+            ])
+            return ids
+
+    def update_evaluation(self, dialogue_id, evaluation, expected_version=None):
+        """
+        evaluation["evaluator"]의 평가를 추가/갱신하고 새 버전 번호를 돌려줍니다 (대화가 없으면 None).
+        다른 평가자의 평가는 그대로 남습니다. expected_version이 현재 버전과 다르면 EvaluationConflict.
+        """
+        evaluator = evaluation.get("evaluator") or ""
+        with self._lock, self._connect() as conn:
+            # 버전 확인부터 쓰기까지 다른 프로세스의 쓰기를 막음
+            conn.execute("BEGIN IMMEDIATE")
+            if not conn.execute("SELECT 1 FROM dialogues WHERE id = ?", (dialogue_id,)).fetchone():
+                return None
+            row = conn.execute(
+                "SELECT version, evaluation FROM evaluations WHERE dialogue_id = ? AND evaluator = ?",
+                (dialogue_id, evaluator)
+            ).fetchone()
+            current = {"evaluations": {evaluator: _load_evaluation(*row)}} if row else {}
+            entry = next_evaluation(current, evaluation, expected_version, dialogue_id)
+            conn.execute(UPSERT_EVALUATION_SQL, _evaluation_values(dialogue_id, entry))
+            conn.execute(
+                "UPDATE dialogues SET evaluator = ?, question_score = ?, realism_score = ?, evaluation = ? WHERE id = ?",
+                (
+                    evaluator or None,
+                    entry.get("question"),
+                    entry.get("realism"),
+                    json.dumps(entry, ensure_ascii=False),
+                    dialogue_id,
+                ),
+            )
+            return entry["version"]
+
+    def update_prescreen(self, results):
+        """{대화 ID: 사전 검사 결과}를 기록하고 기록한 대화 수를 돌려줍니다 (그사이 지워진 대화는 건너뜀)."""
+        with self._lock, self._connect() as conn:
+            cur = conn.executemany(
+                "UPDATE dialogues SET prescreen_score = ?, prescreen_passed = ?, "
+                "record = json_set(record, '$.prescreen', json(?)) WHERE id = ?",
+                [(r.get("score"), _flag(r.get("passed")), json.dumps(r, ensure_ascii=False), rid) for rid, r in results.items()]
+            )
+            return cur.rowcount
+
+    def delete(self, dialogue_id):
+        return self.delete_many([dialogue_id]) > 0
+
+    def delete_many(self, dialogue_ids):
+        with self._lock, self._connect() as conn:
+            cur = conn.executemany("DELETE FROM dialogues WHERE id = ?", [(rid,) for rid in dialogue_ids])
+            _trim_deleted(conn)
+            return cur.rowcount
+
+    def delete_last(self):
+        with self._lock, self._connect() as conn:
+            cur = conn.execute("DELETE FROM dialogues WHERE id = (SELECT MAX(id) FROM dialogues)")
+            _trim_deleted(conn)
+            return cur.rowcount > 0
+
+    def replace_all(self, records):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM dialogues")
+            _trim_deleted(conn)
+            # 새 레코드도 이전에 쓴 적 없는 ID부터 매김
+            start = int(conn.execute("SELECT value FROM meta WHERE key = 'next_id'").fetchone()[0])
+            _insert_records(conn, [dict(rec, id=start + i) for i, rec in enumerate(records)])
+
+    def compact(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
@@ -0,0 +1,278 @@
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+TELEMETRY_LOG_PATH = os.environ.get("TELEMETRY_LOG_PATH", "data/telemetry.jsonl")
+TELEMETRY_DISABLED = os.environ.get("TELEMETRY_DISABLED", "") not in ("", "0", "false")
+WINDOW = 2000
+# 로그가 이 크기를 넘으면 {로그}.1로 넘기고 새 파일에 씀 (이전 .1은 버림)
+TELEMETRY_LOG_MAX_BYTES = int(os.environ.get("TELEMETRY_LOG_MAX_BYTES", 32 * 1024 * 1024))
+
+# 모델별 100만 토큰당 가격 (USD): 입력, 캐시된 입력, 출력
+PRICES = {
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+}
+
+WALL_TIME_BUCKETS = [0.5, 1, 2, 5, 10, 20, 30, 60, 120]
+QUEUE_WAIT_BUCKETS = [0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 300]
+TOKEN_BUCKETS = [250, 500, 1000, 2000, 4000, 8000, 16000]
+
+OUTCOMES = ["ok", "cache_hit", "validation_failed", "rate_limited", "error"]
+
+def estimate_cost(model, usage):
+    """usage(prompt/cached/completion 토큰)의 예상 비용(USD). 가격표에 없는 모델은 0."""
+    prices = PRICES.get(model)
+    if prices is None or not usage:
+        return 0.0
+    input_price, cached_price, output_price = prices
+    cached = usage.get("cached_tokens", 0)
+    uncached = max(0, usage.get("prompt_tokens", 0) - cached)
+    return (uncached * input_price + cached * cached_price + usage.get("completion_tokens", 0) * output_price) / 1e6
+
+class Histogram:
+    """Prometheus 방식의 누적 버킷 히스토그램."""
+
+    def __init__(self, buckets):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def cumulative(self):
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + [float("inf")], self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+class Telemetry:
+    """
+    생성 호출 이벤트를 모읍니다.
+      - 최근 window건은 메모리(deque)에 보관해 대시보드에서 분포/분류별 집계에 사용
+      - 누적 카운터와 히스토그램은 Prometheus 텍스트로 내보냄
+      - log_path가 있으면 이벤트를 JSONL로 한 줄씩 덧붙이고, max_log_bytes를 넘으면 {log_path}.1로 넘김
+    """
+
+    def __init__(self, log_path=TELEMETRY_LOG_PATH, window=WINDOW, max_log_bytes=TELEMETRY_LOG_MAX_BYTES):
+        self.log_path = log_path
+        self.max_log_bytes = max_log_bytes
+        self.recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._reset_aggregates()
+
+    def _reset_aggregates(self):
+        self.outcomes = Counter()
+        self.tokens = Counter()
+        self.cost = 0.0
+        self.retries = 0
+        self.rate_limit_retries = 0
+        self.wall_time = Histogram(WALL_TIME_BUCKETS)
+        self.queue_wait = Histogram(QUEUE_WAIT_BUCKETS)
+        self.total_tokens = Histogram(TOKEN_BUCKETS)
+
+    def record(self, event):
+        line = json.dumps(event, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.recent.append(event)
+            self.outcomes[event["outcome"]] += 1
+            for key in ("prompt_tokens", "cached_tokens", "completion_tokens"):
+                self.tokens[key] += event.get(key, 0)
+            self.cost += event.get("cost", 0.0)
+            self.retries += event.get("retries", 0)
+            self.rate_limit_retries += event.get("rate_limit_retries", 0)
+            if event["outcome"] != "cache_hit":
+                self.wall_time.observe(event["wall_time"])
+                self.total_tokens.observe(event.get("prompt_tokens", 0) + event.get("completion_tokens", 0))
+            if event.get("queue_wait") is not None:
+                self.queue_wait.observe(event["queue_wait"])
+            if self.log_path:
+                os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(line)
+                    size = f.tell()
+                if size > self.max_log_bytes:
+                    os.replace(self.log_path, f"{self.log_path}.1")
+
+    def events(self):
+        with self._lock:
+            return list(self.recent)
+
+    def clear(self):
+        with self._lock:
+            self.recent.clear()
+            self._reset_aggregates()
+
+    def prometheus_text(self):
+        with self._lock:
+            lines = [
+                "# HELP dialogue_generation_total Generation calls by outcome.",
+                "# TYPE dialogue_generation_total counter",
+            ]
+            for outcome in OUTCOMES:
+                lines.append(f'dialogue_generation_total{{outcome="{outcome}"}} {self.outcomes[outcome]}')
+            lines += [
+                "# HELP dialogue_generation_tokens_total Tokens used by generation calls.",
+                "# TYPE dialogue_generation_tokens_total counter",
+            ]
+            for key in ("prompt_tokens", "cached_tokens", "completion_tokens"):
+                lines.append(f'dialogue_generation_tokens_total{{type="{key[:-len("_tokens")]}"}} {self.tokens[key]}')
+            lines += [
+                "# HELP dialogue_generation_cost_usd_total Estimated generation cost in USD.",
+                "# TYPE dialogue_generation_cost_usd_total counter",
+                f"dialogue_generation_cost_usd_total {self.cost:.6f}",
+                "# HELP dialogue_generation_retries_total Validation retries sent to the model.",
+                "# TYPE dialogue_generation_retries_total counter",
+                f"dialogue_generation_retries_total {self.retries}",
+                "# HELP dialogue_generation_rate_limit_retries_total Requests retried after HTTP 429.",
+                "# TYPE dialogue_generation_rate_limit_retries_total counter",
+                f"dialogue_generation_rate_limit_retries_total {self.rate_limit_retries}",
+            ]
+            for name, help_text, hist in [
+                ("dialogue_generation_wall_seconds", "Wall time of generation calls (cache hits excluded).", self.wall_time),
+                ("dialogue_generation_queue_wait_seconds", "Time from batch submission to start of generation.", self.queue_wait),
+                ("dialogue_generation_request_tokens", "Prompt plus completion tokens per generation call.", self.total_tokens),
+            ]:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for bound, count in hist.cumulative():
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f'{name}_bucket{{le="{le}"}} {count}')
+                lines.append(f"{name}_sum {hist.sum:.6f}")
+                lines.append(f"{name}_count {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+def _read_lines(path, limit=None, block_size=1 << 16):
+    """파일의 마지막 limit줄(limit이 없으면 전체)을 bytes 목록으로. limit이 있으면 끝에서부터 블록 단위로 읽습니다."""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return []
+    with f:
+        if limit is None:
+            data, end = f.read(), 0
+        else:
+            end = f.seek(0, os.SEEK_END)
+            data = b""
+            while end > 0 and data.count(b"\n") <= limit:
+                start = max(0, end - block_size)
+                f.seek(start)
+                data = f.read(end - start) + data
+                end = start
+    lines = data.splitlines()
+    if end > 0:
+        # 파일 처음까지 읽지 않았으면 첫 줄은 중간부터 읽은 줄
+        lines = lines[1:]
+    lines = [line for line in lines if line.strip()]
+    return lines if limit is None else lines[max(0, len(lines) - limit):]
+
+def load_log(path=TELEMETRY_LOG_PATH, limit=None):
+    """
+    JSONL 로그(와 넘겨 둔 {path}.1)에서 이벤트를 읽습니다. limit이 있으면 마지막 limit건만,
+    파일 끝에서부터 읽으므로 로그 크기와 관계없이 limit건만큼만 읽고 해석합니다.
+    """
+    lines = _read_lines(path, limit)
+    if limit is None or len(lines) < limit:
+        lines = _read_lines(f"{path}.1", None if limit is None else limit - len(lines)) + lines
+    events = []
+    for line in lines:
+        try:
+            events.append(json.loads(line))
+        except ValueError:
+            continue
+    return events
+
+def aggregate(events):
+    """이벤트 목록으로 집계만 하는 Telemetry를 만듭니다 (로그 파일에서 Prometheus 텍스트를 다시 만들 때)."""
+    result = Telemetry(log_path=None, window=max(1, len(events)))
+    for event in events:
+        result.record(event)
+    return result
+
+telemetry = Telemetry(log_path=None if TELEMETRY_DISABLED else TELEMETRY_LOG_PATH)
+
+# ---------- 호출 단위 추적 ----------
+_local = threading.local()
+
+def set_queue_wait(seconds):
+    """배치 작업 스레드에서 다음 생성 호출의 대기 시간(제출 → 시작)을 지정합니다."""
+    _local.queue_wait = seconds
+
+def note_rate_limit():
+    event = getattr(_local, "event", None)
+    if event is not None:
+        event["rate_limit_retries"] += 1
+
+@contextmanager
+def track(persona, backend, model, mode):
+    """
+    생성 호출 하나를 감싸 이벤트를 기록합니다. 블록 안에서 돌려받은 dict의
+    generation(usage, retries)과 cache_hit를 채우면 함께 기록되며, 예외는 outcome으로 분류한 뒤 그대로 올립니다.
+    """
+    from dialogue_validation import DialogueValidationError
+    from llm_backend import RateLimitError
+
+    event = {
+        "ts": time.time(),
+        "backend": backend,
+        "model": model,
+        "mode": mode,
+        "age": persona.get("age"),
+        "gender": persona.get("gender"),
+        "main_category": persona.get("main_category"),
+        "middle_category": persona.get("middle_category"),
+        "ktas_level": persona.get("ktas_level"),
+        "queue_wait": getattr(_local, "queue_wait", None),
+        "rate_limit_retries": 0,
+    }
+    _local.queue_wait = None
+    _local.event = event
+    call = {"generation": {"repaired": False, "retries": 0, "usage": {}}, "cache_hit": False}
+    started = time.perf_counter()
+    try:
+        yield call
+        event["outcome"] = "cache_hit" if call["cache_hit"] else "ok"
+    except DialogueValidationError as e:
+        event["outcome"] = "validation_failed"
+        event["error"] = str(e)[:200]
+        raise
+    except RateLimitError as e:
+        event["outcome"] = "rate_limited"
+        event["error"] = str(e)[:200]
+        raise
+    except Exception as e:
+        event["outcome"] = "error"
+        event["error"] = f"{type(e).__name__}: {e}"[:200]
+        raise
+    finally:
+        _local.event = None
+        usage = call["generation"]["usage"]
+        event.update(
+            wall_time=time.perf_counter() - started,
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            cached_tokens=usage.get("cached_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+            cost=estimate_cost(model, usage),
+            retries=call["generation"]["retries"],
+        )
+        telemetry.record(event)
@@ -0,0 +1,109 @@
+import json
+import streamlit as st
+import pandas as pd
+from telemetry import TELEMETRY_LOG_PATH, WINDOW, WALL_TIME_BUCKETS, load_log, aggregate, telemetry
+
+GROUP_COLUMNS = {
+    "대분류": ["main_category"],
+    "중분류": ["main_category", "middle_category"],
+    "KTAS 레벨": ["ktas_level"],
+    "나이 / 성별": ["age", "gender"],
+}
+
+def _events(limit):
+    # 프로세스를 다시 시작해도 볼 수 있도록 JSONL 로그를 우선 사용
+    events = load_log(TELEMETRY_LOG_PATH, limit=limit)
+    return events or telemetry.events()[-limit:]
+
+def _summary_by(df, columns):
+    generated = df[df["outcome"] != "cache_hit"]
+    if generated.empty:
+        return pd.DataFrame()
+    grouped = generated.groupby(columns, dropna=False)
+    summary = pd.DataFrame({
+        "호출 수": grouped.size(),
+        "평균 시간(초)": grouped["wall_time"].mean(),
+        "p95 시간(초)": grouped["wall_time"].quantile(0.95),
+        "평균 토큰": grouped["total_tokens"].mean(),
+        "예상 비용(USD)": grouped["cost"].sum(),
+        "재요청": grouped["retries"].sum(),
+        "실패율": grouped["failed"].mean(),
+    })
+    return summary.sort_values("평균 시간(초)", ascending=False).reset_index()
+
+def telemetry_dashboard_tab():
+    st.header("[생성 지표]")
+
+    limit = st.number_input("최근 호출 수", min_value=100, max_value=50000, value=WINDOW, step=100, key="telemetry_limit")
+    events = _events(int(limit))
+    if not events:
+        st.info("아직 기록된 생성 호출이 없습니다.")
+        return
+
+    df = pd.DataFrame(events)
+    df["total_tokens"] = df["prompt_tokens"] + df["completion_tokens"]
+    df["failed"] = ~df["outcome"].isin(["ok", "cache_hit"])
+    generated = df[df["outcome"] != "cache_hit"]
+
+    col1, col2, col3, col4, col5, col6 = st.columns(6)
+    col1.metric("호출 수", f"{len(df):,}")
+    col2.metric("실패율", f"{df['failed'].mean():.1%}")
+    col3.metric("캐시 적중률", f"{(df['outcome'] == 'cache_hit').mean():.1%}")
+    if generated.empty:
+        col4.metric("p50 / p95 (초)", "-")
+    else:
+        col4.metric("p50 / p95 (초)", f"{generated['wall_time'].quantile(0.5):.1f} / {generated['wall_time'].quantile(0.95):.1f}")
+    col5.metric("토큰 (입력/출력)", f"{df['prompt_tokens'].sum():,} / {df['completion_tokens'].sum():,}")
+    col6.metric("예상 비용", f"${df['cost'].sum():,.2f}")
+
+    prompt_tokens = df["prompt_tokens"].sum()
+    if prompt_tokens:
+        st.caption(f"입력 토큰 중 프롬프트 캐시 비율 {df['cached_tokens'].sum() / prompt_tokens:.0%}")
+    queue_wait = df["queue_wait"].dropna()
+    if not queue_wait.empty:
+        st.caption(f"배치 대기 시간 p50 {queue_wait.quantile(0.5):.2f}초 / p95 {queue_wait.quantile(0.95):.2f}초")
+
+    if not generated.empty:
+        st.subheader("호출 시간 분포")
+        bins = [0] + WALL_TIME_BUCKETS + [float("inf")]
+        labels = [f"≤{b:g}초" for b in WALL_TIME_BUCKETS] + [f">{WALL_TIME_BUCKETS[-1]:g}초"]
+        hist = pd.cut(generated["wall_time"], bins=bins, labels=labels).value_counts(sort=False)
+        st.bar_chart(hist)
+
+    st.subheader("결과별 호출 수")
+    st.bar_chart(df["outcome"].value_counts())
+
+    st.subheader("분류별 지표")
+    group_by = st.selectbox("분류 기준", list(GROUP_COLUMNS), key="telemetry_group_by")
+    summary = _summary_by(df, GROUP_COLUMNS[group_by])
+    if summary.empty:
+        st.info("캐시 적중을 제외한 호출이 없습니다.")
+    else:
+        st.dataframe(summary, use_container_width=True, hide_index=True)
+
+    errors = df[df["failed"]]
+    if not errors.empty:
+        with st.expander(f"최근 실패 {len(errors)}건"):
+            st.dataframe(
+                errors[["outcome", "main_category", "middle_category", "ktas_level", "error"]].tail(50),
+                use_container_width=True,
+                hide_index=True
+            )
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            "Prometheus 텍스트 다운로드",
+            data=aggregate(events).prometheus_text(),
+            file_name="dialogue_generation.prom",
+            mime="text/plain",
+            use_container_width=True
+        )
+    with col2:
+        st.download_button(
+            "JSONL 로그 다운로드",
+            data="".join(json.dumps(e, ensure_ascii=False) + "\n" for e in events),
+            file_name="telemetry.jsonl",
+            mime="application/json",
+            use_container_width=True
+        )
@@ -1,17 +1,74 @@
-import openai
+import itertools
 import json
-import os
-import streamlit as st
+import time
+from dialogue_store import open_store
+from dialogue_cache import SharedStoreCache
+from dialogue_export import export
+from near_duplicates import DialogueIndex, NearDuplicateError, POLICY as NEAR_DUPLICATE_POLICY
+from dialogue_search import SearchIndex
+from prescreen import prescreen
+from llm_cache import ResponseCache, CACHE_DISABLED
+from llm_backend import get_backend, RateLimitError, record_usage
+from telemetry import track, note_rate_limit
+from dialogue_stream import TurnStreamParser, StreamAbort
+from dialogue_validation import (
+    DialogueValidationError, MAX_REPAIR_RETRIES, validate_and_repair, retry_instruction, record_outcome
+)
 
-DATA_PATH = "data/dialogues.json"
-openai.api_key = st.secrets["OPENAI_API_KEY"]
+DATA_PATH = "data/dialogues.jsonl"
+DB_PATH = "data/dialogues.db"
+LEGACY_DATA_PATH = "data/dialogues.json"
+MODEL = "gpt-4.1"
+TEMPERATURE = 0.7
+RATE_LIMIT_RETRIES = 3
+RATE_LIMIT_BACKOFF = 2.0
 
-def generate_conversation(persona):
-  system_prompt = f"""You are a GPT that helps you create a multi-Turn conversation between the emergency room nurse and the patient. Create a conversation according to the following seven rules:
+# 예전 JSON 배열 파일(LEGACY_DATA_PATH)이 있으면 처음 접근할 때 JSONL로 옮겨집니다.
+# DIALOGUE_STORE_BACKEND=sqlite 이면 DB_PATH의 SQLite 저장소를 사용합니다.
+# 모든 세션이 읽기 캐시 하나를 공유 (저장소 version이 바뀌면 비움)
+_store = SharedStoreCache(open_store(DATA_PATH, db_path=DB_PATH, legacy_path=LEGACY_DATA_PATH))
+response_cache = ResponseCache()
+# 거의 같은 대화 색인: 저장할 때마다 새 대화만 추가
+near_duplicates = DialogueIndex(_store)
+# 발화 검색 색인: 목록 탭에서 처음 검색할 때 만들고 이후 바뀐 대화만 반영
+search_index = SearchIndex(_store)
 
-1. ** You have to create a conversation based on the patient's persona. Persona, a patient to reflect it, is as follows:
-   -Patient: {persona['age']} / {persona['gender']} / {persona['main_category']} / {persona['middle_category']}
-   -KTAS expected level: {persona['ktas_level']}
+def _complete(messages, model=None, temperature=None):
+    # 429는 지수 백오프로 몇 번 더 시도하고, 그 외 오류는 그대로 올립니다.
+    model = model or MODEL
+    temperature = TEMPERATURE if temperature is None else temperature
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        try:
+            return get_backend().complete(messages, model=model, temperature=temperature)
+        except RateLimitError:
+            if attempt == RATE_LIMIT_RETRIES:
+                raise
+            note_rate_limit()
+            time.sleep(RATE_LIMIT_BACKOFF * (2 ** attempt))
+
+def _open_stream(messages, on_usage=None):
+    # 429는 첫 조각을 받기 전에만 발생하므로 그 시점까지만 재시도합니다.
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        stream = get_backend().stream(messages, model=MODEL, temperature=TEMPERATURE, on_usage=on_usage)
+        try:
+            first = next(stream)
+        except StopIteration:
+            return iter(()), stream
+        except RateLimitError:
+            if attempt == RATE_LIMIT_RETRIES:
+                raise
+            note_rate_limit()
+            time.sleep(RATE_LIMIT_BACKOFF * (2 ** attempt))
+            continue
+        return itertools.chain([first], stream), stream
+
+# 모든 요청에 똑같이 들어가는 규칙과 예시. 페르소나는 뒤의 짧은 user 메시지로 따로 보내므로
+# 요청마다 접두부가 같아 제공자의 프롬프트 캐시가 적중할 수 있습니다.
+SYSTEM_PROMPT = """You are a GPT that helps you create a multi-Turn conversation between the emergency room nurse and the patient. Create a conversation according to the following seven rules:
+
+1. ** You have to create a conversation based on the patient's persona. The persona is given in the user message in the following form:
+   -Patient: <age> / <gender> / <main category> / <middle category>
+   -KTAS expected level: <1-5>
    ** At this time, the KTAS level is integer from 1 to 5, the lower the emergency.
    Examples of KTAS levels are as follows:
    -1: cardiac arrest due to heart disease, cardiac arrest due to respiratory failure, severe trauma (shock), shortness of breath, consciousness disorder
@@ -22,19 +79,19 @@ def generate_conversation(persona):
 
 3. Multi-Turn Dialogue should be created in JSON format. Each round of the conversation is written in the following structure:
    ```json
-   {{
+   {
      "turn": 1,
      "speaker": "<"I" or "CHATGPT">",
      "utterance": "<utterance in Korean>"
-   }}
+   }
    
 4. The first row must start in the form of (patient number is random):
 ```json
-{{
+{
   "turn": 1,
   "speaker": "I",
   "utterance": "환자 분 들어오세요."
-}}
+}
 ```
 
 5. One round-term conversation between speakers must share the same "turn". Each "turn" number must increase for each new pair.
@@ -44,85 +101,246 @@ def generate_conversation(persona):
 
 --- [Example - Output JSON] ---
 [
-{{
+{
 "turn": 1,
 "speaker": "I",
 "utterance": "12번 환자분 들어오세요."
-}},
-{{
+},
+{
 "turn": 1,
 "speaker": "CHATGPT",
 "utterance": "저는 55세 남성입니다."
-}},
-{{
+},
+{
 "turn": 2,
 "speaker": "I",
 "utterance": "어디가 불편하신가요?"
-}},
-{{
+},
+{
 "turn": 2,
 "speaker": "CHATGPT",
 "utterance": "숨쉬기가 힘듭니다."
-}},
-{{
+},
+{
 "turn": 3,
 "speaker": "I",
 "utterance": "과거 병력이 있나요?"
-}},
-{{
+},
+{
 "turn": 3,
 "speaker": "Chatgpt",
 "utterance": "과거력: COPD."
-}}
+}
 ]
 """
-  response = openai.ChatCompletion.create(
-        model="gpt-4.1",
-        messages=[{"role": "system", "content": system_prompt}],
-        temperature=0.7
-  )
 
-  generated = response.choices[0].message.content
-  conversation_json = json.loads(generated)
-  return {"persona": persona, "dialogue": conversation_json}
+def build_persona_message(persona):
+    return (
+        f"-Patient: {persona['age']} / {persona['gender']} / {persona['main_category']} / {persona['middle_category']}\n"
+        f"-KTAS expected level: {persona['ktas_level']}"
+    )
+
+def build_messages(persona):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": build_persona_message(persona)},
+    ]
+
+def _cache_key(messages, variant):
+    return ResponseCache.make_key(
+        backend=get_backend().name, messages=messages, model=MODEL, temperature=TEMPERATURE, variant=variant
+    )
+
+def _add_usage(total, usage):
+    record_usage(usage)
+    for key, value in usage.items():
+        total[key] = total.get(key, 0) + value
+
+def _generate_validated(messages, generated=None, issues=None, meta=None):
+    """
+    응답을 검증하고, 로컬에서 고칠 수 없는 위반이 있으면 잘못된 응답과 위반 목록을 함께 보내
+    MAX_REPAIR_RETRIES번까지 다시 요청합니다. (turns, {"repaired", "retries", "usage"}) 를 돌려줍니다.
+    generated/issues가 주어지면 그 응답(및 위반 목록)에서 시작합니다.
+    meta를 넘기면 실패하더라도 그때까지의 retries/usage가 그 dict에 남습니다.
+    """
+    meta = meta if meta is not None else {"repaired": False, "retries": 0, "usage": {}}
+    base = list(messages)
+    while True:
+        if issues is None:
+            if generated is None:
+                response = _complete(messages)
+                _add_usage(meta["usage"], response["usage"])
+                generated = response["content"]
+            try:
+                turns, repaired = validate_and_repair(generated)
+            except DialogueValidationError as e:
+                issues = e.issues
+            else:
+                meta["repaired"] = repaired
+                record_outcome(repaired, meta["retries"])
+                return turns, meta
+
+        if meta["retries"] >= MAX_REPAIR_RETRIES:
+            record_outcome(False, meta["retries"], failed=True)
+            raise DialogueValidationError(issues, generated)
+        # 재요청도 같은 system/persona 메시지로 시작하므로 접두부 캐시를 그대로 씁니다.
+        messages = base + [
+            {"role": "assistant", "content": generated or ""},
+            {"role": "user", "content": retry_instruction(issues)},
+        ]
+        meta["retries"] += 1
+        generated = None
+        issues = None
+
+def _cached_dialogue(cache_key, use_cache):
+    if not use_cache or CACHE_DISABLED:
+        return None
+    cached = response_cache.get(cache_key)
+    if cached is None:
+        return None
+    try:
+        return validate_and_repair(cached)[0]
+    except DialogueValidationError:
+        return None
+
+def generate_conversation(persona, variant=0, use_cache=True):
+  """
+  persona로 대화를 생성합니다.
+  같은 프롬프트/모델/temperature/variant 조합은 응답 캐시에서 바로 돌려주며,
+  새로운 대화가 필요하면 variant를 바꾸고, use_cache=False면 캐시를 읽지 않고 새로 생성해 덮어씁니다.
+  응답은 검증/보정을 거치며, 고칠 수 없으면 제한된 횟수만큼 다시 요청합니다 (실패 시 DialogueValidationError).
+  generation.usage에 요청별 prompt/cached/completion 토큰 합계가 담기고, 호출마다 telemetry 이벤트가 기록됩니다.
+  """
+  messages = build_messages(persona)
+  cache_key = _cache_key(messages, variant)
+  with track(persona, get_backend().name, MODEL, "complete") as call:
+    cached = _cached_dialogue(cache_key, use_cache)
+    if cached is not None:
+      call["cache_hit"] = True
+      return {"persona": persona, "dialogue": cached}
+
+    conversation_json, meta = _generate_validated(messages, meta=call["generation"])
+  # 검증을 통과한 대화만 캐시
+  if not CACHE_DISABLED:
+    response_cache.put(cache_key, json.dumps(conversation_json, ensure_ascii=False))
+  return {"persona": persona, "dialogue": conversation_json, "generation": meta}
+
+def generate_conversation_stream(persona, variant=0, use_cache=True, on_turn=None):
+    """
+    generate_conversation의 스트리밍 버전.
+    turn 객체가 완성될 때마다 on_turn(turn)을 호출하고, 출력이 명백히 잘못되면
+    (JSON이 아닌 머리말, 잘못된 speaker, turn 번호 역행 등) 요청을 즉시 끊은 뒤
+    중단 사유를 알려 다시 요청합니다. 캐시는 generate_conversation과 공유합니다.
+    """
+    messages = build_messages(persona)
+    cache_key = _cache_key(messages, variant)
+    with track(persona, get_backend().name, MODEL, "stream") as call:
+        cached = _cached_dialogue(cache_key, use_cache)
+        if cached is not None:
+            call["cache_hit"] = True
+            for turn in cached:
+                if on_turn:
+                    on_turn(turn)
+            return {"persona": persona, "dialogue": cached}
+
+        meta = call["generation"]
+        parser = TurnStreamParser()
+        aborted = None
+        chunks, stream = _open_stream(messages, on_usage=lambda u: _add_usage(meta["usage"], u))
+        try:
+            # 배열이 닫힌 뒤에도 끝까지 읽어야 마지막 조각의 토큰 사용량을 받을 수 있음
+            for chunk in chunks:
+                if parser.closed:
+                    continue
+                for turn in parser.feed(chunk):
+                    if on_turn:
+                        on_turn(turn)
+            if not parser.closed:
+                raise StreamAbort("응답이 JSON 배열을 닫기 전에 끝났습니다.")
+        except StreamAbort as e:
+            aborted = str(e)
+        finally:
+            # 조기 중단 시 남은 토큰을 더 받지 않도록 연결을 닫음
+            stream.close()
+
+        if aborted:
+            meta["stream_aborted"] = True
+            conversation_json, meta = _generate_validated(messages, generated=parser.text, issues=[aborted], meta=meta)
+        else:
+            conversation_json, meta = _generate_validated(
+                messages, generated=json.dumps(parser.turns, ensure_ascii=False), meta=meta
+            )
+
+    if not CACHE_DISABLED:
+        response_cache.put(cache_key, json.dumps(conversation_json, ensure_ascii=False))
+    return {"persona": persona, "dialogue": conversation_json, "generation": meta}
 
 def save_conversation_json(data):
-    os.makedirs("data", exist_ok=True)
-    all_data = []
-    if os.path.exists(DATA_PATH):
-        with open(DATA_PATH, "r", encoding="utf-8") as f:
-            all_data = json.load(f)
-    all_data.append(data)
-    with open(DATA_PATH, "w", encoding="utf-8") as f:
-        json.dump(all_data, f, ensure_ascii=False, indent=2)
+    """
+    대화를 사전 검사(prescreen)해 결과와 함께 저장하고 ID를 돌려줍니다. 거의 같은 대화가 이미 있으면 data["near_duplicates"]에
+    [{"id", "similarity"}]를 함께 기록하고, NEAR_DUPLICATE_POLICY=reject이면 저장하지 않고 NearDuplicateError.
+    """
+    data["prescreen"] = prescreen(data)
+    if NEAR_DUPLICATE_POLICY != "off":
+        matches = near_duplicates.find(data.get("dialogue"))
+        if matches:
+            if NEAR_DUPLICATE_POLICY == "reject":
+                raise NearDuplicateError(matches)
+            data["near_duplicates"] = matches
+    rid = _store.add(data)
+    if NEAR_DUPLICATE_POLICY != "off":
+        near_duplicates.add(rid, data.get("dialogue"))
+    return rid
 
 def load_all_dialogues():
-    if not os.path.exists(DATA_PATH):
-        return []
-    with open(DATA_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-def update_evaluation(idx, question, realism, evaluator, ratings: dict | None = None):
-    data = load_all_dialogues()
-    if 0 <= idx < len(data):
-        evaluation = {
-            "question": question,
-            "realism": realism,
-            "evaluator": evaluator
-        }
-        if ratings:
-            evaluation.update(ratings)
-        data[idx]["evaluation"] = evaluation
-        with open(DATA_PATH, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+    return _store.load()
+
+def query_dialogues(filters=None, limit=None, offset=0):
+    return _store.query(filters, limit=limit, offset=offset)
+
+def count_dialogues(filters=None):
+    return _store.count(filters)
+
+def export_dialogues(fmt, filters=None, to_row=None):
+    """조회 조건에 맞는 대화를 fmt 형식 파일로 내보내고 경로를 돌려줍니다 (저장소가 그대로면 이전 파일 재사용)."""
+    return export(_store, fmt, filters=filters, to_row=to_row, name="dialogues")
+
+def dialogues_version():
+    return _store.version()
+
+def load_evaluations():
+    return _store.evaluations()
+
+def persona_filters(persona):
+    return {key: persona.get(key) for key in ["age", "gender", "main_category", "middle_category", "ktas_level"]}
+
+def next_variant(persona):
+    """
+    같은 페르소나로 이미 저장된 대화 수를 variant로 사용합니다.
+    저장 전에 중단되었거나 마지막 대화를 삭제한 뒤 다시 생성하면 캐시된 응답을 재사용하고,
+    평소처럼 한 번 더 생성하면 새로운 variant가 됩니다.
+    """
+    return _store.count(persona_filters(persona))
+
+def update_evaluation(idx, question, realism, evaluator, ratings: dict | None = None, expected_version=None):
+    ids = _store.ids()
+    if 0 <= idx < len(ids):
+        return update_evaluation_by_id(ids[idx], question, realism, evaluator, ratings=ratings, expected_version=expected_version)
+
+def update_evaluation_by_id(dialogue_id, question, realism, evaluator, ratings: dict | None = None, expected_version=None):
+    """
+    평가자 한 명의 평가를 저장하고 새 버전을 돌려줍니다. 다른 평가자의 평가는 덮어쓰지 않습니다.
+    expected_version(폼을 불러올 때의 버전)이 현재 버전과 다르면 EvaluationConflict.
+    """
+    evaluation = {
+        "question": question,
+        "realism": realism,
+        "evaluator": evaluator
+    }
+    if ratings:
+        evaluation.update(ratings)
+    return _store.update_evaluation(dialogue_id, evaluation, expected_version=expected_version)
 
 
 def delete_last_conversation():
-    import os, json
-    if os.path.exists(DATA_PATH):
-        with open(DATA_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        if data:
-            data.pop()
-            with open(DATA_PATH, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
\ No newline at end of file
+    _store.delete_last()